@@ -14,6 +14,11 @@ TEST_SIZE = 0.2
 VALIDATION_SIZE = 0.2
 MIN_SAMPLES_FOR_PREDICTION = 20  # Minimum test sessions before enabling ML predictions
 CONFIDENCE_THRESHOLD = 0.6  # Minimum confidence score for predictions
+ONLINE_REFIT_INTERVAL = 1000  # New sessions between full refits of the online models
+ONLINE_DRIFT_TOLERANCE = 0.05  # Relative held-out error increase forcing an early refit
+BOOTSTRAP_RESAMPLES = 2000  # Resamples behind each wax confidence interval
+BOOTSTRAP_CONFIDENCE_LEVEL = 0.95  # Coverage of the bootstrap percentile intervals
+BOOTSTRAP_PARALLEL_MIN_SESSIONS = 50_000  # Bucket size from which resampling uses a process pool
 
 # Feature Engineering Categories
 TEMPERATURE_BINS = [-20, -10, -5, -2, 0, 2, 5, 10]  # Temperature ranges for binning (Celsius)
@@ -29,8 +34,22 @@ MIN_TEST_COURSE_LENGTH = 10.0  # Minimum course length in meters
 MAX_TEST_COURSE_LENGTH = 500.0  # Maximum course length in meters
 CONFIDENCE_RATING_MIN = 1
 CONFIDENCE_RATING_MAX = 5
+INGEST_CHUNK_SIZE = 10_000  # Rows read, generated and inserted per batch by bulk loads
+
+# Database Configuration (each can be overridden by an environment variable of the same name)
+DB_POOL_SIZE = 5  # Persistent connections per engine
+DB_MAX_OVERFLOW = 10  # Extra connections allowed under load
+DB_POOL_TIMEOUT = 30  # Seconds to wait for a free connection
+DB_POOL_RECYCLE = 1800  # Seconds before a pooled connection is replaced
+DB_POOL_PRE_PING = True  # Test connections on checkout to drop stale sockets
+DB_STATEMENT_TIMEOUT_MS = 0  # Server-side statement timeout (PostgreSQL, 0 = disabled)
+DB_PROFILE = False  # Record statement timings and call sites (app/data/database/profiling.py)
+DB_PROFILE_LOG = ""  # Append profiled statements to this JSON-lines file
+DB_N_PLUS_ONE_THRESHOLD = 10  # Repeats of one SELECT within a get_db() block flagged as N+1
 
 # Application Settings
 APP_NAME = "WAX-AI"
 APP_VERSION = "0.0.1"
 DEBUG = False
+FRONTEND_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Memory budget of the frontend result cache
+CHANGE_FEED_BATCH_SIZE = 1000  # change_log entries delivered per ChangeConsumer batch
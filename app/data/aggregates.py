@@ -0,0 +1,339 @@
+"""Incrementally maintained per-wax, per-condition result aggregates.
+
+The wax_condition_stats table holds wins, losses, margin sums and
+confidence-weighted counts per (wax, temperature bin, snow type, snow
+moisture). It is kept current in three ways:
+
+* ORM flushes through get_db()/get_session() apply deltas via session events
+  (track_aggregates), covering inserts, updates and deletes of TestSession.
+* Core bulk inserts (ingest, synthetic data) call apply_contributions().
+* rebuild_wax_condition_stats() recomputes everything in SQL for backfills,
+  and after bulk UPDATE/DELETE statements, which bypass the session events.
+
+Dashboard queries (wax_condition_summary) then read one row per wax and
+bucket instead of scanning test_sessions.
+"""
+
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING
+
+from sqlalchemy import case, delete, event, func, insert, inspect, literal, select, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import TEMPERATURE_BINS
+from app.data.data_types import TestSession, WaxConditionStat
+
+# Every get_db() user imports this module (for track_aggregates), so pandas,
+# numpy and app.data.conditions are imported inside the functions using them
+if TYPE_CHECKING:
+    import pandas as pd
+
+KEY_COLUMNS = ["wax_id", "temp_bin", "snow_type", "snow_moisture"]
+STAT_COLUMNS = [
+    "wins",
+    "losses",
+    "margin_sum",
+    "margin_sq_sum",
+    "weighted_wins",
+    "weighted_count",
+]
+
+# test_sessions columns needed to compute contributions
+SOURCE_COLUMNS = [
+    "temperature",
+    "snow_type",
+    "snow_moisture",
+    "test_wax_id",
+    "reference_wax_id",
+    "test_ski_won",
+    "distance_between_skis",
+    "confidence_rating",
+]
+
+# Stored in place of a missing snow_moisture, which is part of the primary key
+MISSING_CATEGORY = ""
+
+# session.info key for deltas collected between before_flush and after_flush
+_PENDING_KEY = "wax_condition_stats_pending"
+_ID_BATCH_SIZE = 5_000
+# Relationships whose assignment rewrites a source column during the flush
+_TRACKED_ATTRIBUTES = [*SOURCE_COLUMNS, "test_wax", "reference_wax"]
+
+
+def session_contributions(frame: "pd.DataFrame", sign: int = 1) -> "pd.DataFrame":
+    """Compute the aggregate deltas of a batch of test sessions.
+
+    Args:
+        frame: DataFrame with the SOURCE_COLUMNS of test_sessions (missing
+            nullable columns are treated as NULL)
+        sign: 1 to add the sessions, -1 to remove them
+
+    Returns:
+        DataFrame with KEY_COLUMNS and STAT_COLUMNS, one row per touched key
+    """
+    import pandas as pd
+
+    from app.data.conditions import temperature_bins
+
+    if frame.empty:
+        return pd.DataFrame(columns=KEY_COLUMNS + STAT_COLUMNS)
+
+    frame = frame.reindex(columns=SOURCE_COLUMNS)
+    temp_bin = temperature_bins(frame["temperature"]).astype("int64")
+    snow_type = frame["snow_type"].fillna(MISSING_CATEGORY).to_numpy()
+    snow_moisture = frame["snow_moisture"].fillna(MISSING_CATEGORY).to_numpy()
+    won = frame["test_ski_won"].to_numpy().astype(bool)
+    margin = frame["distance_between_skis"].to_numpy(dtype="float64")
+    weight = pd.to_numeric(frame["confidence_rating"]).fillna(0).to_numpy(dtype="float64")
+
+    sides = []
+    # The test wax wins when the test ski won; the reference wax sees the mirror image
+    for wax_column, side_won, side_margin in (
+        ("test_wax_id", won, margin),
+        ("reference_wax_id", ~won, -margin),
+    ):
+        sides.append(
+            pd.DataFrame(
+                {
+                    "wax_id": frame[wax_column].to_numpy(dtype="int64"),
+                    "temp_bin": temp_bin,
+                    "snow_type": snow_type,
+                    "snow_moisture": snow_moisture,
+                    "wins": side_won.astype("int64"),
+                    "losses": (~side_won).astype("int64"),
+                    "margin_sum": side_margin,
+                    "margin_sq_sum": side_margin**2,
+                    "weighted_wins": weight * side_won,
+                    "weighted_count": weight,
+                }
+            )
+        )
+    deltas = pd.concat(sides).groupby(KEY_COLUMNS, as_index=False, sort=False).sum()
+    if sign != 1:
+        deltas[STAT_COLUMNS] *= sign
+    return deltas
+
+
+def _upsert(connection: Connection):
+    """Dialect-specific INSERT that supports ON CONFLICT.
+
+    Raises:
+        ValueError: If the database backend has no ON CONFLICT support here
+    """
+    name = connection.dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise ValueError(f"Aggregate upserts are not supported for '{name}'")
+    return dialect_insert(WaxConditionStat.__table__)
+
+
+def apply_contributions(connection: Connection, deltas: "pd.DataFrame") -> int:
+    """Add aggregate deltas to wax_condition_stats, creating missing rows.
+
+    Args:
+        connection: Connection inside the transaction that changed test_sessions
+        deltas: Output of session_contributions()
+
+    Returns:
+        Number of aggregate rows touched
+    """
+    if deltas.empty:
+        return 0
+    statement = _upsert(connection)
+    table = WaxConditionStat.__table__
+    statement = statement.on_conflict_do_update(
+        index_elements=KEY_COLUMNS,
+        set_={
+            **{column: table.c[column] + statement.excluded[column] for column in STAT_COLUMNS},
+            "updated_at": statement.excluded.updated_at,
+        },
+    )
+    records = deltas[KEY_COLUMNS + STAT_COLUMNS].to_dict("records")
+    # Naive UTC, like the datetime.utcnow column defaults
+    now = datetime.now(UTC).replace(tzinfo=None)
+    for record in records:
+        record["updated_at"] = now
+    connection.execute(statement, records)
+    return len(records)
+
+
+def _load_source_rows(connection: Connection, session_ids: list[int]) -> "pd.DataFrame":
+    """Read the SOURCE_COLUMNS of test sessions as currently stored."""
+    import pandas as pd
+
+    table = TestSession.__table__
+    statement = select(*(table.c[column] for column in SOURCE_COLUMNS))
+    rows = []
+    # Batched to stay below the bound parameter limit of the backend
+    for start in range(0, len(session_ids), _ID_BATCH_SIZE):
+        batch = session_ids[start : start + _ID_BATCH_SIZE]
+        rows += connection.execute(statement.where(table.c.id.in_(batch))).all()
+    return pd.DataFrame(rows, columns=SOURCE_COLUMNS)
+
+
+def _changes_source(obj: TestSession) -> bool:
+    """Whether a pending update touches any column the aggregates depend on."""
+    attrs = inspect(obj).attrs
+    return any(attrs[name].history.has_changes() for name in _TRACKED_ATTRIBUTES)
+
+
+def _before_flush(session: Session, flush_context, instances):
+    """Subtract the stored state of test sessions about to be updated or deleted."""
+    updated = [
+        obj for obj in session.dirty if isinstance(obj, TestSession) and _changes_source(obj)
+    ]
+    deleted = [obj for obj in session.deleted if isinstance(obj, TestSession)]
+    stored_ids = [obj.id for obj in [*updated, *deleted] if obj.id is not None]
+    removed = None
+    if stored_ids:
+        removed = session_contributions(
+            _load_source_rows(session.connection(), stored_ids), sign=-1
+        )
+    # New and updated sessions are read back after the flush and added
+    added = [obj for obj in session.new if isinstance(obj, TestSession)]
+    session.info[_PENDING_KEY] = (removed, added + updated)
+
+
+def _after_flush(session: Session, flush_context):
+    """Apply the collected deltas once new and updated rows are written."""
+    removed, touched = session.info.pop(_PENDING_KEY, (None, []))
+    deltas = [] if removed is None else [removed]
+    ids = sorted({obj.id for obj in touched if obj.id is not None})
+    if ids:
+        deltas.append(session_contributions(_load_source_rows(session.connection(), ids)))
+    if deltas:
+        import pandas as pd
+
+        combined = pd.concat(deltas).groupby(KEY_COLUMNS, as_index=False, sort=False).sum()
+        # Rows whose removal and re-addition cancel out need no write
+        changed = combined[STAT_COLUMNS].ne(0).any(axis=1)
+        apply_contributions(session.connection(), combined[changed])
+
+
+def track_aggregates(target: Session | sessionmaker):
+    """Keep wax_condition_stats current for ORM changes made through target.
+
+    Args:
+        target: Session or sessionmaker whose flushes should update aggregates
+    """
+    if not event.contains(target, "before_flush", _before_flush):
+        event.listen(target, "before_flush", _before_flush)
+        event.listen(target, "after_flush", _after_flush)
+
+
+def _temperature_bin_expression(temperature):
+    """SQL equivalent of conditions.temperature_bins()."""
+    return case(
+        *((temperature < edge, index) for index, edge in enumerate(TEMPERATURE_BINS)),
+        else_=len(TEMPERATURE_BINS),
+    )
+
+
+def rebuild_wax_condition_stats(db: Session) -> int:
+    """Recompute wax_condition_stats from scratch with a single INSERT ... SELECT.
+
+    Args:
+        db: Database session (changes are committed by the caller)
+
+    Returns:
+        Number of aggregate rows written
+    """
+    sessions = TestSession.__table__.c
+    temp_bin = _temperature_bin_expression(sessions.temperature)
+    weight = func.coalesce(sessions.confidence_rating, 0)
+    sides = []
+    for wax_id, won, margin in (
+        (sessions.test_wax_id, sessions.test_ski_won, sessions.distance_between_skis),
+        (sessions.reference_wax_id, ~sessions.test_ski_won, -sessions.distance_between_skis),
+    ):
+        sides.append(
+            select(
+                wax_id.label("wax_id"),
+                temp_bin.label("temp_bin"),
+                func.coalesce(sessions.snow_type, MISSING_CATEGORY).label("snow_type"),
+                func.coalesce(sessions.snow_moisture, MISSING_CATEGORY).label("snow_moisture"),
+                case((won, 1), else_=0).label("wins"),
+                case((won, 0), else_=1).label("losses"),
+                margin.label("margin"),
+                case((won, weight), else_=0).label("weighted_win"),
+                weight.label("weight"),
+            )
+        )
+    side = union_all(*sides).subquery()
+    keys = [side.c[column] for column in KEY_COLUMNS]
+    aggregated = select(
+        *keys,
+        func.sum(side.c.wins),
+        func.sum(side.c.losses),
+        func.sum(side.c.margin),
+        func.sum(side.c.margin * side.c.margin),
+        func.sum(side.c.weighted_win),
+        func.sum(side.c.weight),
+        literal(datetime.now(UTC).replace(tzinfo=None)),
+    ).group_by(*keys)
+
+    table = WaxConditionStat.__table__
+    db.execute(delete(table))
+    db.execute(insert(table).from_select(KEY_COLUMNS + STAT_COLUMNS + ["updated_at"], aggregated))
+    return db.scalar(select(func.count()).select_from(table))
+
+
+def wax_condition_summary(
+    db: Session,
+    temperature: float | None = None,
+    snow_type: str | None = None,
+    snow_moisture: str | None = None,
+) -> "pd.DataFrame":
+    """Per-wax results in the given conditions, read from the aggregate table.
+
+    Args:
+        db: Database session
+        temperature: Only the temperature bin containing this value (all if None)
+        snow_type: Only this snow type (all if None)
+        snow_moisture: Only this snow moisture (all if None)
+
+    Returns:
+        DataFrame indexed by wax_id with tests, wins, losses, win_rate,
+        weighted_win_rate, mean_margin and margin_std, best waxes first
+    """
+    import numpy as np
+    import pandas as pd
+
+    from app.data.conditions import temperature_bins
+
+    stats = WaxConditionStat
+    statement = select(
+        stats.wax_id,
+        *(func.sum(getattr(stats, column)).label(column) for column in STAT_COLUMNS),
+    ).group_by(stats.wax_id)
+    if temperature is not None:
+        statement = statement.where(stats.temp_bin == int(temperature_bins([temperature])[0]))
+    if snow_type is not None:
+        statement = statement.where(stats.snow_type == snow_type)
+    if snow_moisture is not None:
+        statement = statement.where(stats.snow_moisture == snow_moisture)
+
+    frame = pd.DataFrame(db.execute(statement).all(), columns=["wax_id", *STAT_COLUMNS])
+    frame = frame.set_index("wax_id")
+    tests = frame["wins"] + frame["losses"]
+    frame = frame[tests > 0]
+    tests = tests[tests > 0]
+    summary = pd.DataFrame(
+        {
+            "tests": tests,
+            "wins": frame["wins"],
+            "losses": frame["losses"],
+            "win_rate": frame["wins"] / tests,
+            "weighted_win_rate": frame["weighted_wins"]
+            / frame["weighted_count"].replace(0, np.nan),
+            "mean_margin": frame["margin_sum"] / tests,
+            "margin_std": np.sqrt(
+                np.maximum(frame["margin_sq_sum"] / tests - (frame["margin_sum"] / tests) ** 2, 0)
+            ),
+        }
+    )
+    return summary.sort_values(["win_rate", "mean_margin"], ascending=False)
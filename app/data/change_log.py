@@ -0,0 +1,390 @@
+"""Change feed of the dataset tables with per-consumer offsets.
+
+Every insert, update and delete of a test_sessions, wax_products or
+ski_models row made through get_db()/get_session() appends a change_log
+entry in the same transaction (track_changes), so the log never disagrees
+with the data. Entries carry a monotonically increasing seq.
+
+A consumer must never see seq N+1 before N, so seq order has to match commit
+order. On PostgreSQL, entries are therefore written under a transaction-level
+advisory lock that is held until the transaction ends. To keep that window
+short, entries are collected in the session and written in before_commit, so
+ordinary writers serialize only on their final change_log insert and COMMIT.
+Such a lock is the last one a transaction takes and its holder only commits,
+so it cannot deadlock with row locks.
+
+Collected entries are capped at MAX_PENDING_ENTRIES to bound the memory of
+bulk loads (one transaction for millions of rows): beyond it they are
+written right away, and such a transaction holds the lock from then on.
+Other writers then wait for its commit, and PostgreSQL aborts one of two
+transactions that also wait on each other's row locks (a deadlock). Bulk
+loads only insert new rows, which other writers do not lock. SQLite
+serializes writers anyway.
+
+Bulk statements are covered as follows:
+
+* insert_records() (ingest, synthetic data) records the inserted ids itself.
+* Bulk UPDATE/DELETE through a session records the ids matched by the
+  statement's WHERE clause (or its primary key parameters).
+* Other bulk INSERTs through a session record a "bulk" entry without a
+  row_id: consumers should rescan that table (ChangeBatch.requires_rescan).
+
+Writes that bypass the session (raw connections, psql) are not logged.
+
+Consumers read the log in batches and store their position in
+consumer_offsets:
+
+    consumer = ChangeConsumer("search_index", tables=["wax_products"])
+    consumer.consume(lambda db, batch: reindex(batch.upserted_ids("wax_products")))
+
+Usage:
+    python -m app.data.change_log [--prune]
+"""
+
+import argparse
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from sqlalchemy import event, func, insert, select, text
+from sqlalchemy.orm import ORMExecuteState, Session, sessionmaker
+
+from app.config import CHANGE_FEED_BATCH_SIZE, INGEST_CHUNK_SIZE
+from app.data.data_types import ChangeLogEntry, ConsumerOffset
+from app.data.data_version import TRACKED_TABLES
+
+OPERATIONS = ("insert", "update", "delete", "bulk")
+
+# Execution option of bulk statements whose changes the caller records itself
+RECORDED_OPTION = "change_log_recorded"
+
+# pg_advisory_xact_lock key serializing change_log appends
+_ADVISORY_LOCK_KEY = 0x5741584C
+
+# session.info key for the entries to write when the transaction commits
+_PENDING_KEY = "change_log_pending"
+
+# Collected entries beyond which they are written before the commit (one ingest chunk)
+MAX_PENDING_ENTRIES = INGEST_CHUNK_SIZE
+
+
+def record_changes(
+    db: Session, table_name: str, row_ids: Iterable[int] | None, operation: str
+) -> int:
+    """Add change_log entries to the caller's transaction.
+
+    The entries are written when db commits (see track_changes, which must
+    watch db), or as soon as MAX_PENDING_ENTRIES are collected, and are
+    rolled back with db.
+
+    Args:
+        db: Session of the transaction that made the changes
+        table_name: Changed table, one of data_version.TRACKED_TABLES
+        row_ids: Ids of the changed rows; None for one "bulk" entry without ids
+        operation: "insert", "update" or "delete" (ignored when row_ids is None)
+
+    Returns:
+        Number of entries added
+
+    Raises:
+        ValueError: If operation is unknown
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown change operation '{operation}'")
+    # Naive UTC, like the datetime.utcnow column defaults
+    now = datetime.now(UTC).replace(tzinfo=None)
+    if row_ids is None:
+        records = [{"table_name": table_name, "row_id": None, "operation": "bulk"}]
+    else:
+        records = [
+            {"table_name": table_name, "row_id": int(row_id), "operation": operation}
+            for row_id in row_ids
+        ]
+    if not records:
+        return 0
+    for record in records:
+        record["changed_at"] = now
+    pending = db.info.setdefault(_PENDING_KEY, [])
+    pending.extend(records)
+    if len(pending) >= MAX_PENDING_ENTRIES:
+        _write_pending(db)
+    return len(records)
+
+
+def _write_pending(session: Session):
+    records = session.info.pop(_PENDING_KEY, None)
+    if not records:
+        return
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        # Held until the transaction ends, so seqs become visible in seq order
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+    connection.execute(insert(ChangeLogEntry.__table__), records)
+
+
+def _after_flush(session: Session, flush_context):
+    # new/dirty/deleted still describe the flushed changes at this point
+    changes: dict[tuple[str, str], list[int]] = {}
+    for operation, objects in (
+        ("insert", session.new),
+        ("update", [obj for obj in session.dirty if session.is_modified(obj)]),
+        ("delete", session.deleted),
+    ):
+        for obj in objects:
+            table_name = getattr(getattr(obj, "__table__", None), "name", None)
+            if table_name in TRACKED_TABLES:
+                changes.setdefault((table_name, operation), []).append(obj.id)
+    for (table_name, operation), row_ids in changes.items():
+        record_changes(session, table_name, sorted(row_ids), operation)
+
+
+def _do_orm_execute(state: ORMExecuteState):
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, "table", None)
+    if getattr(table, "name", None) not in TRACKED_TABLES:
+        return
+    if state.execution_options.get(RECORDED_OPTION):
+        return
+
+    if state.is_insert:
+        record_changes(state.session, table.name, None, "bulk")
+        return
+    operation = "update" if state.is_update else "delete"
+    parameters = state.parameters
+    if isinstance(parameters, list) and parameters and "id" in parameters[0]:
+        # Bulk UPDATE by primary key: one parameter set per row
+        row_ids = [params["id"] for params in parameters]
+    else:
+        # Rows are matched before the statement runs, so deleted ones are still there
+        matched = select(table.c.id)
+        if state.statement.whereclause is not None:
+            matched = matched.where(state.statement.whereclause)
+        row_ids = state.session.connection().execute(matched).scalars().all()
+    record_changes(state.session, table.name, row_ids, operation)
+
+
+def _before_commit(session: Session):
+    # Flush first: commit() flushes only after this hook, and the flush may add entries
+    session.flush()
+    _write_pending(session)
+
+
+def _after_rollback(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def track_changes(target: Session | sessionmaker):
+    """Log changes to the dataset tables made through target in change_log.
+
+    Args:
+        target: Session or sessionmaker to watch
+    """
+    if not event.contains(target, "after_flush", _after_flush):
+        event.listen(target, "after_flush", _after_flush)
+        event.listen(target, "do_orm_execute", _do_orm_execute)
+        event.listen(target, "before_commit", _before_commit)
+        event.listen(target, "after_rollback", _after_rollback)
+
+
+@dataclass(frozen=True, slots=True)
+class Change:
+    """One change_log entry."""
+
+    seq: int
+    table_name: str
+    row_id: int | None
+    operation: str
+    changed_at: datetime
+
+
+@dataclass
+class ChangeBatch:
+    """Consecutive changes delivered to a consumer, in seq order."""
+
+    consumer: str
+    changes: list[Change]
+
+    def __len__(self):
+        return len(self.changes)
+
+    @property
+    def last_seq(self) -> int | None:
+        return self.changes[-1].seq if self.changes else None
+
+    def latest(self, table_name: str) -> dict[int, str]:
+        """Last operation per changed row of a table (rows changed twice appear once)."""
+        return {
+            change.row_id: change.operation
+            for change in self.changes
+            if change.table_name == table_name and change.row_id is not None
+        }
+
+    def upserted_ids(self, table_name: str) -> list[int]:
+        """Rows of a table inserted or updated, and not deleted afterwards."""
+        return sorted(
+            id for id, operation in self.latest(table_name).items() if operation != "delete"
+        )
+
+    def deleted_ids(self, table_name: str) -> list[int]:
+        """Rows of a table deleted (last operation in the batch)."""
+        return sorted(
+            id for id, operation in self.latest(table_name).items() if operation == "delete"
+        )
+
+    def requires_rescan(self, table_name: str) -> bool:
+        """Whether a bulk statement changed rows of the table without logging their ids."""
+        return any(
+            change.table_name == table_name and change.operation == "bulk"
+            for change in self.changes
+        )
+
+
+class ChangeConsumer:
+    """Reads change_log in batches from its stored offset onwards.
+
+    Delivery is at-least-once: a batch whose processing fails is delivered
+    again. Derived data stored in the same database can be written in the
+    session passed to the consume() handler, which commits it together with
+    the new offset (exactly-once). A consumer name should be used by one
+    process at a time.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        tables: Iterable[str] | None = None,
+        batch_size: int = CHANGE_FEED_BATCH_SIZE,
+    ):
+        """
+        Args:
+            name: Consumer name, the key of its consumer_offsets row
+            tables: Only deliver changes of these tables (default: all)
+            batch_size: Maximum changes per batch
+        """
+        self.name = name
+        self.tables = sorted(tables) if tables is not None else None
+        self.batch_size = batch_size
+
+    def __repr__(self):
+        return f"<ChangeConsumer(name='{self.name}', tables={self.tables})>"
+
+    def offset(self, db: Session) -> int:
+        """Last seq processed (0 for a new consumer)."""
+        return (
+            db.scalar(select(ConsumerOffset.last_seq).where(ConsumerOffset.consumer == self.name))
+            or 0
+        )
+
+    def poll(self, db: Session) -> ChangeBatch:
+        """Fetch the next batch after the stored offset, without advancing it."""
+        statement = (
+            select(
+                ChangeLogEntry.seq,
+                ChangeLogEntry.table_name,
+                ChangeLogEntry.row_id,
+                ChangeLogEntry.operation,
+                ChangeLogEntry.changed_at,
+            )
+            .where(ChangeLogEntry.seq > self.offset(db))
+            .order_by(ChangeLogEntry.seq)
+            .limit(self.batch_size)
+        )
+        if self.tables is not None:
+            statement = statement.where(ChangeLogEntry.table_name.in_(self.tables))
+        return ChangeBatch(self.name, [Change(*row) for row in db.execute(statement)])
+
+    def seek(self, db: Session, seq: int):
+        """Store seq as the offset (0 replays the whole log); committed with db."""
+        stored = db.get(ConsumerOffset, self.name)
+        if stored is None:
+            db.add(ConsumerOffset(consumer=self.name, last_seq=seq))
+        else:
+            stored.last_seq = seq
+        db.flush()
+
+    def commit(self, db: Session, batch: ChangeBatch):
+        """Advance the offset past a processed batch; committed with db."""
+        if batch.last_seq is not None:
+            self.seek(db, batch.last_seq)
+
+    def consume(
+        self, handler: Callable[[Session, ChangeBatch], None], max_batches: int | None = None
+    ) -> int:
+        """Deliver pending changes to handler until the log is exhausted.
+
+        Each batch is handled in its own get_db() transaction, which also
+        stores the new offset.
+
+        Args:
+            handler: Function (db, batch) processing one batch
+            max_batches: Stop after this many batches (default: no limit)
+
+        Returns:
+            Number of changes delivered
+        """
+        from app.data.database.session import get_db
+
+        delivered = n_batches = 0
+        while max_batches is None or n_batches < max_batches:
+            with get_db() as db:
+                batch = self.poll(db)
+                if not batch:
+                    break
+                handler(db, batch)
+                self.commit(db, batch)
+            delivered += len(batch)
+            n_batches += 1
+        return delivered
+
+
+def latest_seq(db: Session) -> int:
+    """Highest seq in change_log (0 if empty)."""
+    return db.scalar(select(func.max(ChangeLogEntry.seq))) or 0
+
+
+def consumer_offsets(db: Session) -> dict[str, int]:
+    """Stored offset of every consumer."""
+    return dict(db.execute(select(ConsumerOffset.consumer, ConsumerOffset.last_seq)).all())
+
+
+def prune_change_log(db: Session) -> int:
+    """Delete entries every registered consumer has processed.
+
+    Without registered consumers nothing is deleted, so a consumer added
+    later can still replay the log.
+
+    Args:
+        db: Database session (changes are committed by the caller)
+
+    Returns:
+        Number of deleted entries
+    """
+    processed = db.scalar(select(func.min(ConsumerOffset.last_seq)))
+    if not processed:
+        return 0
+    table = ChangeLogEntry.__table__
+    return db.execute(table.delete().where(table.c.seq <= processed)).rowcount
+
+
+def main():
+    """CLI entry point: show consumer lag and optionally prune the log."""
+    from app.data.database.session import get_db
+
+    parser = argparse.ArgumentParser(description="WAX-AI change feed status")
+    parser.add_argument(
+        "--prune", action="store_true", help="Delete entries all consumers have processed"
+    )
+    args = parser.parse_args()
+
+    with get_db() as db:
+        head = latest_seq(db)
+        print(f"Latest seq: {head}")
+        for name, offset in sorted(consumer_offsets(db).items()):
+            print(f"  {name:<30} offset {offset:>10}  lag {head - offset:>10}")
+        if args.prune:
+            print(f"✓ Pruned {prune_change_log(db)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Vectorized encoding of weather and snow conditions.
+
+Shared by feature engineering, ratings and aggregates so that every component
+bins temperatures and encodes categories the same way.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from app.config import (
+    COURSE_PROFILE_CATEGORIES,
+    PRECIPITATION_CATEGORIES,
+    SNOW_MOISTURE_CATEGORIES,
+    SNOW_TYPE_CATEGORIES,
+    TEMPERATURE_BINS,
+    TRACK_CONDITION_CATEGORIES,
+)
+
+# Categorical test_sessions columns and their allowed values
+CATEGORY_COLUMNS = {
+    "snow_type": SNOW_TYPE_CATEGORIES,
+    "snow_moisture": SNOW_MOISTURE_CATEGORIES,
+    "track_condition": TRACK_CONDITION_CATEGORIES,
+    "precipitation": PRECIPITATION_CATEGORIES,
+    "course_profile": COURSE_PROFILE_CATEGORIES,
+}
+
+# Bin i covers [TEMPERATURE_BINS[i-1], TEMPERATURE_BINS[i]); the outer bins are open-ended
+N_TEMPERATURE_BINS = len(TEMPERATURE_BINS) + 1
+
+
+def temperature_bin_labels() -> list[str]:
+    """Return a human readable label for each temperature bin."""
+    edges = [None, *TEMPERATURE_BINS, None]
+    labels = []
+    for low, high in itertools.pairwise(edges):
+        if low is None:
+            labels.append(f"<{high}")
+        elif high is None:
+            labels.append(f">={low}")
+        else:
+            labels.append(f"{low}..{high}")
+    return labels
+
+
+def temperature_bins(temperature) -> np.ndarray:
+    """Map temperatures to bin indices in [0, N_TEMPERATURE_BINS).
+
+    Args:
+        temperature: Array-like of temperatures in Celsius
+
+    Returns:
+        int8 array of bin indices, -1 where the temperature is missing
+    """
+    values = np.asarray(temperature, dtype="float64")
+    bins = np.digitize(values, TEMPERATURE_BINS).astype("int8")
+    bins[np.isnan(values)] = -1
+    return bins
+
+
+def encode_categories(values, categories: list[str]) -> np.ndarray:
+    """Encode categorical values as indices into categories.
+
+    Args:
+        values: Array-like of category strings (may contain nulls)
+        categories: Allowed category values
+
+    Returns:
+        int8 array of category indices, -1 for null or unknown values
+    """
+    return pd.Categorical(values, categories=categories).codes.astype("int8")
+
+
+def one_hot(codes: np.ndarray, n_categories: int, dtype="float32") -> np.ndarray:
+    """One-hot encode integer codes; negative codes give an all-zero row.
+
+    Args:
+        codes: Integer array of category indices
+        n_categories: Number of output columns
+        dtype: Output dtype
+
+    Returns:
+        Array of shape (len(codes), n_categories)
+    """
+    codes = np.asarray(codes)
+    out = np.zeros((codes.shape[0], n_categories), dtype=dtype)
+    known = codes >= 0
+    out[np.flatnonzero(known), codes[known]] = 1
+    return out
@@ -1,8 +1,19 @@
 """SQLAlchemy database models."""
 
 from app.data.data_types.base import Base
+from app.data.data_types.change_log import ChangeLogEntry
+from app.data.data_types.consumer_offset import ConsumerOffset
 from app.data.data_types.ski_model import SkiModel
 from app.data.data_types.test_session import TestSession
+from app.data.data_types.wax_condition_stat import WaxConditionStat
 from app.data.data_types.wax_product import WaxProduct
 
-__all__ = ["Base", "SkiModel", "WaxProduct", "TestSession"]
+__all__ = [
+    "Base",
+    "SkiModel",
+    "WaxProduct",
+    "TestSession",
+    "WaxConditionStat",
+    "ChangeLogEntry",
+    "ConsumerOffset",
+]
@@ -0,0 +1,35 @@
+"""Append-only log of row changes to the dataset tables."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String
+
+from app.data.data_types.base import Base
+
+
+class ChangeLogEntry(Base):
+    """One inserted, updated or deleted row (see app.data.change_log).
+
+    seq grows monotonically in commit order, so a consumer that has
+    processed everything up to some seq only needs the entries after it.
+    """
+
+    __tablename__ = "change_log"
+    __table_args__ = (
+        # Consumers interested in a subset of the tables
+        Index("ix_change_log_table_seq", "table_name", "seq"),
+        # Never reuse the seq of pruned entries
+        {"sqlite_autoincrement": True},
+    )
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer, nullable=True)  # NULL: bulk statement, rows unknown
+    operation = Column(String(10), nullable=False)  # "insert", "update", "delete" or "bulk"
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f"<ChangeLogEntry(seq={self.seq}, {self.operation} "
+            f"{self.table_name}.id={self.row_id})>"
+        )
@@ -0,0 +1,20 @@
+"""Position of each change feed consumer in the change log."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String
+
+from app.data.data_types.base import Base
+
+
+class ConsumerOffset(Base):
+    """Last change_log seq a consumer has processed."""
+
+    __tablename__ = "consumer_offsets"
+
+    consumer = Column(String(100), primary_key=True)
+    last_seq = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ConsumerOffset(consumer='{self.consumer}', last_seq={self.last_seq})>"
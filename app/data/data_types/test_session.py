@@ -2,7 +2,7 @@
 
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 
 from app.data.data_types.base import Base
@@ -12,9 +12,20 @@ class TestSession(Base):
     """Comparative ski test session data."""
 
     __tablename__ = "test_sessions"
+    __table_args__ = (
+        # Sessions for a wax (as test or reference) within a date range
+        Index("ix_test_sessions_test_wax_date", "test_wax_id", "test_date"),
+        Index("ix_test_sessions_reference_wax_date", "reference_wax_id", "test_date"),
+        # Sessions in a temperature range for a snow moisture
+        Index("ix_test_sessions_moisture_temperature", "snow_moisture", "temperature"),
+        # Sessions at a location within a date range
+        Index("ix_test_sessions_location_date", "location", "test_date"),
+        # Keyset pagination of session history by (test_date, id)
+        Index("ix_test_sessions_date_id", "test_date", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
-    test_date = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    test_date = Column(DateTime, nullable=False, default=datetime.utcnow)
     location = Column(String(200), nullable=False)
 
     # Weather conditions (embedded)
@@ -0,0 +1,38 @@
+"""Per-wax, per-condition aggregate of test session results."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
+
+from app.data.data_types.base import Base
+
+
+class WaxConditionStat(Base):
+    """Running totals of a wax's results in one condition bucket.
+
+    Maintained incrementally from test_sessions (see app.data.aggregates).
+    Every session contributes to both its test wax and its reference wax,
+    with the margin taken from that wax's point of view.
+    """
+
+    __tablename__ = "wax_condition_stats"
+
+    wax_id = Column(Integer, ForeignKey("wax_products.id"), primary_key=True)
+    temp_bin = Column(Integer, primary_key=True)  # Index into TEMPERATURE_BINS buckets
+    snow_type = Column(String(50), primary_key=True)
+    snow_moisture = Column(String(50), primary_key=True)  # "" when not recorded
+
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    margin_sum = Column(Float, nullable=False, default=0.0)  # meters, positive = ahead
+    margin_sq_sum = Column(Float, nullable=False, default=0.0)
+    weighted_wins = Column(Float, nullable=False, default=0.0)  # confidence_rating weighted
+    weighted_count = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f"<WaxConditionStat(wax_id={self.wax_id}, temp_bin={self.temp_bin}, "
+            f"snow='{self.snow_type}/{self.snow_moisture}', wins={self.wins}, "
+            f"losses={self.losses})>"
+        )
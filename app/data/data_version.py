@@ -0,0 +1,82 @@
+"""Process-wide data version, bumped by commits that change the dataset.
+
+Sessions from get_db()/get_session() record which of TRACKED_TABLES their
+flushes and bulk statements touch, and increment the version once the
+transaction commits. Caches key their entries on data_version(), so results
+stay valid exactly until a write lands.
+
+The counter lives in this process: writes from other processes (a separate
+import job, psql) are not seen, and raw SQL passed as text() is not
+inspected.
+"""
+
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session, sessionmaker
+
+TRACKED_TABLES = frozenset({"test_sessions", "wax_products", "ski_models"})
+
+# session.info key for the tracked tables written in the current transaction
+_TOUCHED_KEY = "data_version_touched"
+
+_version = 0
+_lock = threading.Lock()
+
+
+def data_version() -> int:
+    """Current data version."""
+    return _version
+
+
+def bump_data_version() -> int:
+    """Increment the data version, e.g. after writes that bypass get_db().
+
+    Returns:
+        New version
+    """
+    global _version
+    with _lock:
+        _version += 1
+        return _version
+
+
+def _mark(session: Session, tables):
+    touched = {name for name in tables if name in TRACKED_TABLES}
+    if touched:
+        session.info.setdefault(_TOUCHED_KEY, set()).update(touched)
+
+
+def _after_flush(session: Session, flush_context):
+    # new/dirty/deleted still describe the flushed changes at this point
+    changed = [*session.new, *session.deleted]
+    changed += [obj for obj in session.dirty if session.is_modified(obj)]
+    _mark(session, {obj.__table__.name for obj in changed if hasattr(obj, "__table__")})
+
+
+def _do_orm_execute(state: ORMExecuteState):
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        _mark(state.session, {getattr(table, "name", None)})
+
+
+def _after_commit(session: Session):
+    if session.info.pop(_TOUCHED_KEY, None):
+        bump_data_version()
+
+
+def _after_rollback(session: Session):
+    session.info.pop(_TOUCHED_KEY, None)
+
+
+def track_data_version(target: Session | sessionmaker):
+    """Bump the data version when sessions from target commit dataset changes.
+
+    Args:
+        target: Session or sessionmaker to watch
+    """
+    if not event.contains(target, "after_commit", _after_commit):
+        event.listen(target, "after_flush", _after_flush)
+        event.listen(target, "do_orm_execute", _do_orm_execute)
+        event.listen(target, "after_commit", _after_commit)
+        event.listen(target, "after_rollback", _after_rollback)
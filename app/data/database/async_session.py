@@ -0,0 +1,284 @@
+"""Async database session management.
+
+Mirrors session.py on top of SQLAlchemy's AsyncEngine/AsyncSession so that a
+request handler can fan out independent queries concurrently. PostgreSQL URLs
+are served through asyncpg and SQLite URLs through aiosqlite.
+
+Writable async sessions run the same hooks as get_db() sessions (aggregates,
+data version, change feed) on their underlying sync Session.
+"""
+
+import asyncio
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import asynccontextmanager
+import os
+
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, selectinload
+
+from app.data.aggregates import track_aggregates
+from app.data.change_log import track_changes
+from app.data.data_types import SkiModel, TestSession, WaxProduct
+from app.data.data_version import track_data_version
+from app.data.database.connection import get_database_url, get_setting
+
+# Async driver used for each backend
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def to_async_url(connection_string: str) -> str:
+    """Rewrite a database URL to use the async driver of its backend.
+
+    Args:
+        connection_string: Sync URL, e.g. postgresql://user@host/db
+
+    Returns:
+        Async URL, e.g. postgresql+asyncpg://user@host/db
+
+    Raises:
+        ValueError: If the backend has no supported async driver
+    """
+    url = make_url(connection_string)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(
+        hide_password=False
+    )
+
+
+def create_async_db_engine(
+    connection_string: str | None = None, echo: bool = False, readonly: bool = False
+) -> AsyncEngine:
+    """Create an async SQLAlchemy engine with the same pool settings as the sync one.
+
+    Args:
+        connection_string: Optional sync or async connection string.
+            If not provided, reads from DATABASE_URL (or DATABASE_READ_URL).
+        echo: If True, log all SQL statements
+        readonly: If True, use the read replica URL when configured
+
+    Returns:
+        SQLAlchemy AsyncEngine instance
+    """
+    if connection_string is None:
+        connection_string = get_database_url(readonly=readonly)
+    url = make_url(to_async_url(connection_string))
+
+    kwargs = {"echo": echo, "pool_pre_ping": get_setting("DB_POOL_PRE_PING")}
+    if url.get_backend_name() != "sqlite":
+        kwargs.update(
+            pool_size=get_setting("DB_POOL_SIZE"),
+            max_overflow=get_setting("DB_MAX_OVERFLOW"),
+            pool_timeout=get_setting("DB_POOL_TIMEOUT"),
+            pool_recycle=get_setting("DB_POOL_RECYCLE"),
+        )
+    statement_timeout = get_setting("DB_STATEMENT_TIMEOUT_MS")
+    if url.get_backend_name() == "postgresql" and statement_timeout:
+        kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(statement_timeout)}}
+
+    return create_async_engine(url, **kwargs)
+
+
+# Global async engines and session factories (lazy loaded), keyed by readonly
+_async_engines: dict[bool, AsyncEngine] = {}
+_async_session_factories: dict[bool, async_sessionmaker] = {}
+# Process that created the async engines; a forked child starts over with its own
+_async_pid = os.getpid()
+
+
+def reset_async_engines_after_fork():
+    """Forget async engines and factories inherited from a parent process.
+
+    Like connection.reset_engines_after_fork, the inherited pools are
+    dropped without closing the parent's connections.
+    """
+    global _async_pid
+    if _async_pid == os.getpid():
+        return
+    for engine in _async_engines.values():
+        engine.sync_engine.dispose(close=False)
+    _async_engines.clear()
+    _async_session_factories.clear()
+    _async_pid = os.getpid()
+
+
+os.register_at_fork(after_in_child=reset_async_engines_after_fork)
+
+
+def get_async_engine(readonly: bool = False) -> AsyncEngine:
+    """Get or create the global async database engine.
+
+    Args:
+        readonly: If True, return the engine for the read replica
+
+    Returns:
+        SQLAlchemy AsyncEngine instance
+    """
+    reset_async_engines_after_fork()
+    if readonly not in _async_engines:
+        _async_engines[readonly] = create_async_db_engine(readonly=readonly)
+    return _async_engines[readonly]
+
+
+class TrackedSession(Session):
+    """Sync Session behind writable AsyncSessions, carrying the write hooks."""
+
+
+def get_async_session_factory(readonly: bool = False) -> async_sessionmaker:
+    """Get or create the async session factory.
+
+    Like session.get_session_factory(), writable sessions keep aggregates,
+    the data version and the change feed current (see TrackedSession).
+
+    Returns:
+        SQLAlchemy async_sessionmaker instance
+    """
+    reset_async_engines_after_fork()
+    if readonly not in _async_session_factories:
+        sync_session_class = Session
+        if not readonly:
+            sync_session_class = TrackedSession
+            track_aggregates(TrackedSession)
+            track_data_version(TrackedSession)
+            track_changes(TrackedSession)
+        _async_session_factories[readonly] = async_sessionmaker(
+            bind=get_async_engine(readonly=readonly),
+            autoflush=False,
+            expire_on_commit=False,
+            sync_session_class=sync_session_class,
+        )
+    return _async_session_factories[readonly]
+
+
+@asynccontextmanager
+async def get_async_db(readonly: bool = False) -> AsyncGenerator[AsyncSession]:
+    """Async context manager for database sessions.
+
+    Commits on success and rolls back on error, like get_db(). Relationships
+    are not lazy-loadable in async code, so load them eagerly in the query.
+
+    Args:
+        readonly: If True, use the read replica and roll back instead of committing
+
+    Yields:
+        SQLAlchemy AsyncSession instance
+
+    Example:
+        async with get_async_db() as db:
+            waxes = await get_wax_products(db)
+    """
+    db = get_async_session_factory(readonly=readonly)()
+    try:
+        yield db
+        if readonly:
+            await db.rollback()
+        else:
+            await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
+async def run_concurrently[T](
+    *queries: Callable[[AsyncSession], Awaitable[T]], readonly: bool = True
+) -> list[T]:
+    """Run independent queries concurrently, each in its own session.
+
+    An AsyncSession must not be shared between concurrent tasks, so every
+    query gets a session (and pooled connection) of its own.
+
+    Args:
+        *queries: Async callables taking a session, e.g. get_wax_products
+        readonly: If True, run against the read replica
+
+    Returns:
+        Results in the order of the queries
+
+    Example:
+        waxes, skis = await run_concurrently(get_wax_products, get_ski_models)
+    """
+
+    async def run(query):
+        async with get_async_db(readonly=readonly) as db:
+            return await query(db)
+
+    return await asyncio.gather(*(run(query) for query in queries))
+
+
+async def get_wax_products(db: AsyncSession) -> list[WaxProduct]:
+    """Get all wax products ordered by brand and name."""
+    result = await db.scalars(
+        select(WaxProduct).order_by(WaxProduct.brand, WaxProduct.product_name)
+    )
+    return list(result)
+
+
+async def get_ski_models(db: AsyncSession) -> list[SkiModel]:
+    """Get all ski models ordered by brand and model."""
+    result = await db.scalars(select(SkiModel).order_by(SkiModel.brand, SkiModel.model))
+    return list(result)
+
+
+def test_sessions_statement(
+    wax_id: int | None = None,
+    min_temperature: float | None = None,
+    max_temperature: float | None = None,
+    limit: int | None = None,
+):
+    """Build the SELECT used by get_test_sessions() (usable with sync sessions too).
+
+    Args:
+        wax_id: Only sessions where this wax was the test or reference wax
+        min_temperature: Only sessions at or above this temperature
+        max_temperature: Only sessions at or below this temperature
+        limit: Maximum number of sessions (most recent first)
+
+    Returns:
+        SQLAlchemy Select statement
+    """
+    statement = (
+        select(TestSession)
+        .options(
+            selectinload(TestSession.reference_wax),
+            selectinload(TestSession.test_wax),
+            selectinload(TestSession.reference_ski_model),
+            selectinload(TestSession.test_ski_model),
+        )
+        .order_by(TestSession.test_date.desc(), TestSession.id.desc())
+    )
+    if wax_id is not None:
+        statement = statement.where(
+            (TestSession.test_wax_id == wax_id) | (TestSession.reference_wax_id == wax_id)
+        )
+    if min_temperature is not None:
+        statement = statement.where(TestSession.temperature >= min_temperature)
+    if max_temperature is not None:
+        statement = statement.where(TestSession.temperature <= max_temperature)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+
+async def get_test_sessions(db: AsyncSession, **filters) -> list[TestSession]:
+    """Get test sessions with their waxes and skis eagerly loaded.
+
+    Args:
+        db: Async database session
+        **filters: wax_id, min_temperature, max_temperature and limit, as in
+            test_sessions_statement()
+
+    Returns:
+        List of TestSession instances
+    """
+    result = await db.scalars(test_sessions_statement(**filters))
+    return list(result)
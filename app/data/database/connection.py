@@ -1,26 +1,53 @@
 """Database connection management."""
 
+from dataclasses import dataclass
+import functools
 import os
+import threading
+import time
 from typing import Optional
 
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
 
-# Load environment variables
-load_dotenv()
+from app import config
+from app.data.database.profiling import instrument_engine
 
 
-def get_database_url() -> str:
+@functools.cache
+def load_environment():
+    """Load variables from the .env file into os.environ.
+
+    Runs once, on the first settings lookup rather than at import time, so
+    that importing app modules has no side effects. Variables already set
+    in the environment take precedence.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+def _getenv(name: str) -> str | None:
+    load_environment()
+    return os.getenv(name)
+
+
+def get_database_url(readonly: bool = False) -> str:
     """Get database URL from environment variable.
 
+    Args:
+        readonly: If True, prefer DATABASE_READ_URL (a read replica) when set
+
     Returns:
         PostgreSQL connection string
 
     Raises:
         ValueError: If DATABASE_URL is not set
     """
-    database_url = os.getenv("DATABASE_URL")
+    if readonly and _getenv("DATABASE_READ_URL"):
+        return _getenv("DATABASE_READ_URL")
+    database_url = _getenv("DATABASE_URL")
     if not database_url:
         raise ValueError(
             "DATABASE_URL environment variable not set. "
@@ -29,38 +56,203 @@ def get_database_url() -> str:
     return database_url
 
 
-def create_db_engine(connection_string: Optional[str] = None, echo: bool = False) -> Engine:
+def get_setting(name: str):
+    """Get a database setting from the environment, falling back to app.config.
+
+    Args:
+        name: Setting name, e.g. "DB_POOL_SIZE"
+
+    Returns:
+        Value converted to the type of the default in app.config
+    """
+    default = getattr(config, name)
+    value = _getenv(name)
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return type(default)(value)
+
+
+@dataclass
+class PoolMetrics:
+    """Connection pool checkout statistics."""
+
+    checkouts: int = 0
+    timeouts: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.checkouts if self.checkouts else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.checkouts} checkouts, {self.timeouts} timeouts, "
+            f"wait mean {self.mean_wait * 1000:.2f} ms / max {self.max_wait * 1000:.2f} ms"
+        )
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        self._metrics_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self._metrics_lock:
+                self.metrics.checkouts += 1
+                self.metrics.timeouts += timed_out
+                self.metrics.total_wait += wait
+                self.metrics.max_wait = max(self.metrics.max_wait, wait)
+
+
+def create_db_engine(
+    connection_string: Optional[str] = None, echo: bool = False, readonly: bool = False
+) -> Engine:
     """Create SQLAlchemy database engine.
 
+    Pool size, overflow, timeout, recycle, pre-ping and the statement timeout
+    come from the DB_* settings in app.config, overridable via environment
+    variables of the same name. SQLite keeps SQLAlchemy's default pool.
+    With DB_PROFILE set, statements are profiled (see profiling.py).
+
     Args:
         connection_string: Optional PostgreSQL connection string.
-            If not provided, reads from DATABASE_URL environment variable.
+            If not provided, reads from DATABASE_URL (or DATABASE_READ_URL
+            when readonly) environment variable.
         echo: If True, log all SQL statements
+        readonly: If True, open PostgreSQL transactions as read-only
 
     Returns:
         SQLAlchemy Engine instance
     """
     if connection_string is None:
-        connection_string = get_database_url()
+        connection_string = get_database_url(readonly=readonly)
+
+    kwargs = {"echo": echo, "pool_pre_ping": get_setting("DB_POOL_PRE_PING")}
+    backend = make_url(connection_string).get_backend_name()
+    if backend != "sqlite":
+        kwargs.update(
+            poolclass=TimedQueuePool,
+            pool_size=get_setting("DB_POOL_SIZE"),
+            max_overflow=get_setting("DB_MAX_OVERFLOW"),
+            pool_timeout=get_setting("DB_POOL_TIMEOUT"),
+            pool_recycle=get_setting("DB_POOL_RECYCLE"),
+        )
+    if backend == "postgresql":
+        options = []
+        statement_timeout = get_setting("DB_STATEMENT_TIMEOUT_MS")
+        if statement_timeout:
+            options.append(f"-c statement_timeout={statement_timeout}")
+        if readonly:
+            options.append("-c default_transaction_read_only=on")
+        if options:
+            kwargs["connect_args"] = {"options": " ".join(options)}
 
-    engine = create_engine(connection_string, echo=echo)
+    engine = create_engine(connection_string, **kwargs)
+    guard_pool_across_fork(engine)
+    if get_setting("DB_PROFILE"):
+        instrument_engine(
+            engine,
+            n_plus_one_threshold=get_setting("DB_N_PLUS_ONE_THRESHOLD"),
+            log_path=get_setting("DB_PROFILE_LOG") or None,
+        )
     return engine
 
 
-# Global engine instance (lazy loaded)
-_engine: Optional[Engine] = None
+def guard_pool_across_fork(engine: Engine):
+    """Refuse to hand out pooled connections opened by another process.
+
+    A forked child inherits the parent's pool, and its sockets would then be
+    shared by two processes. Connections are tagged with the pid that opened
+    them; checking one out in a different process invalidates it, so the
+    pool opens a fresh connection instead.
+
+    Args:
+        engine: Engine whose pool to guard
+    """
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        connection_record.info["pid"] = os.getpid()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        pid = os.getpid()
+        if connection_record.info["pid"] != pid:
+            connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+            raise exc.DisconnectionError(
+                f"Connection opened in process {connection_record.info['pid']} "
+                f"checked out in process {pid}"
+            )
+
+
+# Global engine instances (lazy loaded), keyed by (readonly, echo)
+_engines: dict[tuple[bool, bool], Engine] = {}
+# Process that created _engines; a forked child starts over with its own
+_engines_pid = os.getpid()
+
 
+def reset_engines_after_fork():
+    """Forget engines inherited from a parent process.
 
-def get_engine(echo: bool = False) -> Engine:
+    Called automatically in children created by os.fork() (multiprocessing,
+    joblib) and again by get_engine() whenever the pid changed. The pools
+    are dropped without closing their connections, which still belong to
+    the parent.
+    """
+    global _engines_pid
+    if _engines_pid == os.getpid():
+        return
+    for engine in _engines.values():
+        engine.dispose(close=False)
+    _engines.clear()
+    _engines_pid = os.getpid()
+
+
+os.register_at_fork(after_in_child=reset_engines_after_fork)
+
+
+def get_engine(echo: bool = False, readonly: bool = False) -> Engine:
     """Get or create the global database engine.
 
     Args:
         echo: If True, log all SQL statements
+        readonly: If True, return the engine for DATABASE_READ_URL. Falls back
+            to the primary engine when no read URL is configured.
 
     Returns:
-        SQLAlchemy Engine instance
+        SQLAlchemy Engine instance, created anew in each process
+    """
+    reset_engines_after_fork()
+    if readonly and not _getenv("DATABASE_READ_URL"):
+        readonly = False
+    key = (readonly, echo)
+    if key not in _engines:
+        _engines[key] = create_db_engine(echo=echo, readonly=readonly)
+    return _engines[key]
+
+
+def get_pool_metrics(readonly: bool = False) -> PoolMetrics | None:
+    """Get checkout wait-time metrics of the global engine's pool.
+
+    Args:
+        readonly: If True, report on the read engine
+
+    Returns:
+        PoolMetrics, or None if the engine does not use a timed pool (SQLite)
     """
-    global _engine
-    if _engine is None:
-        _engine = create_db_engine(echo=echo)
-    return _engine
+    return getattr(get_engine(readonly=readonly).pool, "metrics", None)
@@ -0,0 +1,300 @@
+"""Streaming export of test sessions to season-partitioned Parquet files.
+
+Rows are read with a server-side cursor (yield_per / stream_results) and
+written in fixed-size Arrow record batches, so memory use does not depend on
+the size of the table. Skis and waxes are exported by name next to their ids,
+using the same column names that ingest.py accepts for import.
+
+Layout:
+    EXPORT_DIR/
+        _manifest.json              # Row count, max(updated_at) and catalog per partition
+        season=2024-25/part.parquet
+
+A re-export compares each season's row count and max(updated_at) with the
+manifest and only rewrites partitions that changed. The exported ski and
+wax names are part of that state through a fingerprint of the catalog, so
+renaming a ski or wax rewrites every partition. Season directories without
+rows are deleted. The manifest and temporary files start with "_" or ".",
+so the directory can be read directly with pandas.read_parquet() or
+pyarrow.dataset.
+
+Usage:
+    python -m app.data.database.export [--output DIR] [--batch-size N] [--full]
+"""
+
+import argparse
+from collections.abc import Iterator
+from datetime import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, DateTime, Float, Integer, extract, func, select
+from sqlalchemy.orm import Session, aliased
+
+from app.config import DATA_DIR
+from app.data.data_types import SkiModel, TestSession, WaxProduct
+from app.data.database.session import get_db
+
+EXPORT_DIR = DATA_DIR / "exports" / "test_sessions"
+MANIFEST_FILE = "_manifest.json"
+DEFAULT_BATCH_SIZE = 50_000
+
+# Ski seasons start on this month; a season is named after its start year
+SEASON_START_MONTH = 7
+
+_ARROW_TYPES = [
+    (Boolean, pa.bool_()),
+    (Integer, pa.int64()),
+    (Float, pa.float64()),
+    (DateTime, pa.timestamp("us")),
+]
+
+
+def _arrow_type(column) -> pa.DataType:
+    for sql_type, arrow_type in _ARROW_TYPES:
+        if isinstance(column.type, sql_type):
+            return arrow_type
+    return pa.string()
+
+
+def season_label(start_year: int) -> str:
+    """Name of the season starting in start_year, e.g. 2024 -> "2024-25"."""
+    return f"{start_year}-{(start_year + 1) % 100:02d}"
+
+
+def season_bounds(start_year: int) -> tuple[datetime, datetime]:
+    """Half-open [start, end) test_date range of a season."""
+    return (
+        datetime(start_year, SEASON_START_MONTH, 1),
+        datetime(start_year + 1, SEASON_START_MONTH, 1),
+    )
+
+
+def _season_expression():
+    """SQL expression for the start year of a session's season."""
+    year = extract("year", TestSession.test_date)
+    return year - (extract("month", TestSession.test_date) < SEASON_START_MONTH).cast(Integer)
+
+
+def export_statement():
+    """SELECT of all test_sessions columns plus ski and wax names.
+
+    Returns:
+        Tuple of (Select statement, pyarrow Schema of its columns)
+    """
+    reference_ski, test_ski = aliased(SkiModel), aliased(SkiModel)
+    reference_wax, test_wax = aliased(WaxProduct), aliased(WaxProduct)
+    session_columns = list(TestSession.__table__.columns)
+    name_columns = [
+        reference_ski.brand.label("reference_ski_brand"),
+        reference_ski.model.label("reference_ski_model"),
+        reference_wax.brand.label("reference_wax_brand"),
+        reference_wax.product_name.label("reference_wax_product_name"),
+        test_ski.brand.label("test_ski_brand"),
+        test_ski.model.label("test_ski_model"),
+        test_wax.brand.label("test_wax_brand"),
+        test_wax.product_name.label("test_wax_product_name"),
+    ]
+    statement = (
+        select(*session_columns, *name_columns)
+        .join(reference_ski, TestSession.reference_ski_id == reference_ski.id)
+        .join(test_ski, TestSession.test_ski_id == test_ski.id)
+        .join(reference_wax, TestSession.reference_wax_id == reference_wax.id)
+        .join(test_wax, TestSession.test_wax_id == test_wax.id)
+        .order_by(TestSession.test_date, TestSession.id)
+    )
+    schema = pa.schema(
+        [pa.field(column.name, _arrow_type(column)) for column in session_columns]
+        + [pa.field(column.name, pa.string()) for column in name_columns]
+    )
+    return statement, schema
+
+
+def iter_session_batches(
+    db: Session,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Iterator[pa.RecordBatch]:
+    """Stream test sessions with ski and wax names as Arrow record batches.
+
+    Args:
+        db: Database session
+        batch_size: Rows per batch (and per server-side cursor fetch)
+        start: Only sessions with test_date >= start
+        end: Only sessions with test_date < end
+
+    Yields:
+        pyarrow RecordBatch of up to batch_size rows, ordered by test_date
+
+    Example:
+        with get_db(readonly=True) as db:
+            for batch in iter_session_batches(db):
+                frame = batch.to_pandas()
+    """
+    statement, schema = export_statement()
+    if start is not None:
+        statement = statement.where(TestSession.test_date >= start)
+    if end is not None:
+        statement = statement.where(TestSession.test_date < end)
+    statement = statement.execution_options(stream_results=True, yield_per=batch_size)
+    for rows in db.execute(statement).partitions():
+        columns = zip(*rows)
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema,
+        )
+
+
+def catalog_fingerprint(db: Session) -> str:
+    """Hash of the ski and wax names written next to every session.
+
+    The catalog tables are small and have no updated_at column, so they are
+    hashed in full.
+    """
+    digest = hashlib.sha256()
+    for statement in (
+        select(SkiModel.id, SkiModel.brand, SkiModel.model).order_by(SkiModel.id),
+        select(WaxProduct.id, WaxProduct.brand, WaxProduct.product_name).order_by(WaxProduct.id),
+    ):
+        for row in db.execute(statement):
+            digest.update(repr(tuple(row)).encode())
+        digest.update(b"|")
+    return digest.hexdigest()[:16]
+
+
+def partition_state(db: Session) -> dict[str, dict]:
+    """Row count and max(updated_at) of every season, computed in the database.
+
+    Returns:
+        Season label -> {"start_year", "rows", "max_updated_at", "catalog"}
+    """
+    catalog = catalog_fingerprint(db)
+    season = _season_expression().label("season")
+    rows = db.execute(
+        select(season, func.count(TestSession.id), func.max(TestSession.updated_at)).group_by(
+            season
+        )
+    ).all()
+    return {
+        season_label(int(start_year)): {
+            "start_year": int(start_year),
+            "rows": count,
+            "max_updated_at": max_updated_at.isoformat() if max_updated_at else None,
+            "catalog": catalog,
+        }
+        for start_year, count, max_updated_at in rows
+    }
+
+
+def load_manifest(output_dir: Path) -> dict[str, dict]:
+    path = Path(output_dir) / MANIFEST_FILE
+    return json.loads(path.read_text())["partitions"] if path.exists() else {}
+
+
+def _write_manifest(output_dir: Path, partitions: dict[str, dict]):
+    tmp_path = output_dir / f".{MANIFEST_FILE}.tmp"
+    tmp_path.write_text(json.dumps({"partitions": partitions}, indent=2, sort_keys=True))
+    os.replace(tmp_path, output_dir / MANIFEST_FILE)
+
+
+def write_partition(
+    db: Session, output_dir: Path, start_year: int, batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """Stream one season into output_dir/season=<label>/part.parquet.
+
+    The file is written under a temporary name and moved into place, so
+    readers see either the previous or the new partition.
+
+    Returns:
+        Number of rows written
+    """
+    partition_dir = Path(output_dir) / f"season={season_label(start_year)}"
+    partition_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = partition_dir / ".part.parquet.tmp"
+    _, schema = export_statement()
+    rows = 0
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for batch in iter_session_batches(db, batch_size, *season_bounds(start_year)):
+            writer.write_batch(batch, row_group_size=batch_size)
+            rows += batch.num_rows
+    os.replace(tmp_path, partition_dir / "part.parquet")
+    return rows
+
+
+def export_test_sessions(
+    output_dir: str | Path = EXPORT_DIR,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    full: bool = False,
+    db: Session | None = None,
+) -> dict[str, str]:
+    """Export test sessions to Parquet, rewriting only changed seasons.
+
+    Args:
+        output_dir: Export root directory
+        batch_size: Rows per fetch and per Parquet row group
+        full: If True, rewrite every partition and ignore the manifest
+        db: Optional database session (a read-only one is opened if not given)
+
+    Returns:
+        Season label -> "written", "unchanged" or "removed"
+    """
+    if db is None:
+        with get_db(readonly=True) as session:
+            return export_test_sessions(output_dir, batch_size, full, session)
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {} if full else load_manifest(output_dir)
+    current = partition_state(db)
+
+    status = {}
+    for label, state in sorted(current.items()):
+        if manifest.get(label) == state and (output_dir / f"season={label}").exists():
+            status[label] = "unchanged"
+            continue
+        write_partition(db, output_dir, state["start_year"], batch_size)
+        manifest[label] = state
+        # Record progress so an interrupted export resumes where it stopped
+        _write_manifest(output_dir, manifest)
+        status[label] = "written"
+
+    # Also catches partitions missing from the manifest (e.g. with full=True)
+    on_disk = {path.name.removeprefix("season=") for path in output_dir.glob("season=*")}
+    for label in (set(manifest) | on_disk) - set(current):
+        shutil.rmtree(output_dir / f"season={label}", ignore_errors=True)
+        manifest.pop(label, None)
+        status[label] = "removed"
+    _write_manifest(output_dir, manifest)
+    return status
+
+
+def main():
+    """CLI entry point for the Parquet export."""
+    parser = argparse.ArgumentParser(description="Export test sessions to partitioned Parquet")
+    parser.add_argument(
+        "--output", type=Path, default=EXPORT_DIR, help=f"Output directory (default: {EXPORT_DIR})"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Rows per fetch and row group (default: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument("--full", action="store_true", help="Rewrite every partition")
+    args = parser.parse_args()
+
+    status = export_test_sessions(args.output, batch_size=args.batch_size, full=args.full)
+    for label, state in sorted(status.items()):
+        print(f"{'✓' if state != 'unchanged' else ' '} season={label}: {state}")
+    written = sum(state == "written" for state in status.values())
+    print(f"\n✅ Export complete: {written} of {len(status)} partitions written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
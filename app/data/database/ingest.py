@@ -0,0 +1,258 @@
+"""Bulk ingestion of logged test sessions from CSV/Parquet files."""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+import resource
+import sys
+import time
+
+import pandas as pd
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.config import INGEST_CHUNK_SIZE
+from app.data.aggregates import apply_contributions, session_contributions
+from app.data.change_log import RECORDED_OPTION, record_changes
+from app.data.data_types import SkiModel, TestSession, WaxProduct
+from app.data.database.session import get_db
+from app.data.validation import parse_bool, validate_test_sessions
+
+DEFAULT_CHUNK_SIZE = INGEST_CHUNK_SIZE
+
+# Natural keys accepted in place of the foreign key id columns
+SKI_KEY_COLUMNS = {
+    "reference_ski_id": ("reference_ski_brand", "reference_ski_model"),
+    "test_ski_id": ("test_ski_brand", "test_ski_model"),
+}
+WAX_KEY_COLUMNS = {
+    "reference_wax_id": ("reference_wax_brand", "reference_wax_product_name"),
+    "test_wax_id": ("test_wax_brand", "test_wax_product_name"),
+}
+
+REQUIRED_COLUMNS = [
+    "test_date",
+    "location",
+    "temperature",
+    "snow_type",
+    "test_course_length",
+    "distance_between_skis",
+    "test_ski_won",
+]
+
+_INSERTABLE_COLUMNS = [c.name for c in TestSession.__table__.columns if c.name != "id"]
+
+
+@dataclass
+class ImportReport:
+    """Summary of a bulk import run."""
+
+    rows: int
+    rejected: int
+    chunks: int
+    seconds: float
+    peak_memory_bytes: int
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.rows} rows ({self.rejected} rejected) in {self.chunks} chunks, "
+            f"{self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s), "
+            f"peak memory {self.peak_memory_bytes / 1024**2:.1f} MB"
+        )
+
+
+def iter_file_chunks(
+    path: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """Stream a CSV or Parquet file as DataFrames of at most chunk_size rows.
+
+    Args:
+        path: Path to a .csv or .parquet file
+        chunk_size: Maximum number of rows per chunk
+
+    Yields:
+        pandas DataFrame per chunk
+
+    Raises:
+        ValueError: If the file extension is not supported
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif suffix in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported file type '{suffix}' (expected .csv or .parquet)")
+
+
+def load_key_lookups(db: Session) -> tuple[pd.Series, pd.Series]:
+    """Load natural key -> id lookup maps for ski models and wax products.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Tuple of (ski lookup, wax lookup) Series indexed by (brand, name)
+    """
+    skis = db.execute(select(SkiModel.brand, SkiModel.model, SkiModel.id)).all()
+    waxes = db.execute(select(WaxProduct.brand, WaxProduct.product_name, WaxProduct.id)).all()
+    return _build_lookup(skis), _build_lookup(waxes)
+
+
+def _build_lookup(rows) -> pd.Series:
+    index = pd.MultiIndex.from_tuples(
+        [(brand.strip(), name.strip()) for brand, name, _ in rows], names=["brand", "name"]
+    )
+    return pd.Series([row_id for _, _, row_id in rows], index=index, dtype="Int64")
+
+
+def _resolve_keys(
+    chunk: pd.DataFrame, lookup: pd.Series, key_columns: dict[str, tuple[str, str]], kind: str
+) -> None:
+    """Replace natural key columns in chunk with resolved id columns (in place)."""
+    for id_column, (brand_column, name_column) in key_columns.items():
+        if id_column in chunk.columns:
+            continue
+        if brand_column not in chunk.columns or name_column not in chunk.columns:
+            raise ValueError(
+                f"Missing column '{id_column}' (or '{brand_column}' + '{name_column}')"
+            )
+        keys = pd.MultiIndex.from_arrays(
+            [
+                chunk[brand_column].astype(str).str.strip(),
+                chunk[name_column].astype(str).str.strip(),
+            ]
+        )
+        ids = lookup.reindex(keys).to_numpy()
+        unknown = pd.isna(ids)
+        if unknown.any():
+            missing = sorted(set(keys[unknown]))[:5]
+            raise ValueError(f"Unknown {kind} for '{id_column}': {missing}")
+        chunk[id_column] = ids.astype("int64")
+
+
+def prepare_chunk(
+    chunk: pd.DataFrame,
+    ski_lookup: pd.Series,
+    wax_lookup: pd.Series,
+    skip_invalid: bool = False,
+) -> tuple[list[dict], int]:
+    """Turn a raw input chunk into validated, insertable test_sessions records.
+
+    Args:
+        chunk: DataFrame read from the input file
+        ski_lookup: (brand, model) -> ski_models.id map
+        wax_lookup: (brand, product_name) -> wax_products.id map
+        skip_invalid: If True, drop rows failing validation instead of raising
+
+    Returns:
+        Tuple of (column -> value dicts ready for executemany, number of rejected rows)
+
+    Raises:
+        ValueError: If required columns are missing, natural keys are unknown
+            or rows fail validation (unless skip_invalid is set)
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+
+    _resolve_keys(chunk, ski_lookup, SKI_KEY_COLUMNS, "ski model")
+    _resolve_keys(chunk, wax_lookup, WAX_KEY_COLUMNS, "wax product")
+
+    frame = chunk[[c for c in _INSERTABLE_COLUMNS if c in chunk.columns]].copy()
+    frame["test_date"] = pd.to_datetime(frame["test_date"])
+
+    validation = validate_test_sessions(frame)
+    if not validation.is_valid:
+        if not skip_invalid:
+            first = validation.per_row().head(5)
+            details = "\n".join(f"  row {row}: {message}" for row, message in first.items())
+            raise ValueError(f"{validation.n_invalid} invalid rows in chunk:\n{details}")
+        frame = frame[validation.valid.to_numpy()]
+    # Only rows with a recognized test_ski_won value are left
+    frame = frame.assign(test_ski_won=parse_bool(frame["test_ski_won"]).astype(bool))
+
+    records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+    for record in records:
+        record["test_date"] = record["test_date"].to_pydatetime()
+    return records, validation.n_invalid
+
+
+def insert_records(db: Session, records: list[dict]) -> int:
+    """Insert test session records as a single Core executemany batch.
+
+    Core inserts bypass the ORM session events, so the records' contributions
+    to wax_condition_stats and their change_log entries are written here in
+    the same transaction.
+
+    Args:
+        db: Database session
+        records: Column -> value dicts, as returned by prepare_chunk()
+
+    Returns:
+        Number of inserted rows
+    """
+    if not records:
+        return 0
+    statement = insert(TestSession.__table__).returning(TestSession.__table__.c.id)
+    ids = db.execute(statement, records, execution_options={RECORDED_OPTION: True}).scalars().all()
+    record_changes(db, TestSession.__tablename__, ids, "insert")
+    apply_contributions(db.connection(), session_contributions(pd.DataFrame.from_records(records)))
+    return len(records)
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def import_test_sessions(
+    path: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE, skip_invalid: bool = False
+) -> ImportReport:
+    """Bulk import test sessions from a CSV or Parquet file.
+
+    Rows are streamed in bounded chunks and written with Core-level executemany
+    inserts inside a single transaction. Ski and wax references can be given
+    either as id columns or as natural keys (brand + model / product_name),
+    which are resolved through an in-memory lookup loaded once up front. Each
+    chunk is validated with validate_test_sessions() before it is written.
+
+    Args:
+        path: Path to a .csv or .parquet file
+        chunk_size: Maximum number of rows read and inserted per batch
+        skip_invalid: If True, skip rows failing validation instead of aborting
+
+    Returns:
+        ImportReport with row count, throughput and peak memory
+    """
+    start = time.perf_counter()
+    rows = 0
+    rejected = 0
+    chunks = 0
+
+    with get_db() as db:
+        ski_lookup, wax_lookup = load_key_lookups(db)
+        for chunk in iter_file_chunks(path, chunk_size):
+            records, n_rejected = prepare_chunk(chunk, ski_lookup, wax_lookup, skip_invalid)
+            rows += insert_records(db, records)
+            rejected += n_rejected
+            chunks += 1
+
+    return ImportReport(
+        rows=rows,
+        rejected=rejected,
+        chunks=chunks,
+        seconds=time.perf_counter() - start,
+        peak_memory_bytes=peak_rss_bytes(),
+    )
@@ -3,10 +3,20 @@
 import argparse
 from datetime import datetime
 
+from sqlalchemy import Index, inspect
+
+from app.config import INGEST_CHUNK_SIZE, RANDOM_SEED
+from app.data.aggregates import rebuild_wax_condition_stats
 from app.data.data_types import Base, SkiModel, TestSession, WaxProduct
 from app.data.database.connection import get_engine
 from app.data.database.session import get_db
 
+# Indexes the models no longer define, dropped by create_indexes() (table -> names)
+RETIRED_INDEXES = {
+    # Covered by ix_test_sessions_date_id (test_date, id)
+    "test_sessions": ["ix_test_sessions_test_date"],
+}
+
 
 def create_tables(drop_existing: bool = False):
     """Create all database tables.
@@ -26,6 +36,42 @@ def create_tables(drop_existing: bool = False):
     print("✓ Tables created successfully!")
 
 
+def create_indexes():
+    """Create missing indexes and drop retired ones on existing tables.
+
+    Migration path for databases created before an index was added to or
+    removed from the models: create_tables() only creates indexes together
+    with new tables and never drops any.
+    """
+    engine = get_engine()
+    print("Creating missing indexes...")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    inspector = inspect(engine)
+    for table_name, index_names in RETIRED_INDEXES.items():
+        table = Base.metadata.tables[table_name]
+        for existing in inspector.get_indexes(table_name):
+            if existing["name"] in index_names:
+                columns = [table.c[name] for name in existing["column_names"]]
+                Index(existing["name"], *columns).drop(bind=engine)
+                print(f"✓ Dropped retired index {existing['name']}")
+    print("✓ Indexes up to date!")
+
+
+def rebuild_aggregates():
+    """Recompute the wax_condition_stats aggregate table from test_sessions.
+
+    Needed after backfills or bulk UPDATE/DELETE statements, which bypass the
+    incremental maintenance in app.data.aggregates.
+    """
+    print("Rebuilding wax condition aggregates...")
+    with get_db() as db:
+        n_rows = rebuild_wax_condition_stats(db)
+    print(f"✓ Rebuilt {n_rows} aggregate rows")
+
+
 def add_sample_ski_models(db):
     """Add sample ski models to database."""
     skis = [
@@ -240,6 +286,39 @@ def populate_sample_data():
     print("✓ Sample data populated successfully!")
 
 
+def import_data(path: str, chunk_size: int = INGEST_CHUNK_SIZE, skip_invalid: bool = False):
+    """Bulk import test sessions from a CSV or Parquet file.
+
+    Args:
+        path: Path to the input file
+        chunk_size: Number of rows read and inserted per batch
+        skip_invalid: If True, skip rows failing validation instead of aborting
+    """
+    # pandas and the validation rules are only needed for imports
+    from app.data.database.ingest import import_test_sessions
+
+    print(f"\nImporting test sessions from {path}...")
+    report = import_test_sessions(path, chunk_size=chunk_size, skip_invalid=skip_invalid)
+    print(f"✓ Imported {report}")
+
+
+def populate_synthetic_data(
+    n_sessions: int, seed: int = RANDOM_SEED, chunk_size: int = INGEST_CHUNK_SIZE
+):
+    """Generate synthetic waxes, skis and test sessions for load testing.
+
+    Args:
+        n_sessions: Number of test sessions to generate
+        seed: Random seed
+        chunk_size: Sessions generated and inserted per batch
+    """
+    from app.data.database.synthetic import insert_synthetic_sessions
+
+    print(f"\nGenerating {n_sessions} synthetic test sessions (seed {seed})...")
+    report = insert_synthetic_sessions(n_sessions, seed=seed, chunk_size=chunk_size)
+    print(f"✓ Inserted {report}")
+
+
 def main():
     """CLI entry point for database initialization."""
     parser = argparse.ArgumentParser(
@@ -255,9 +334,31 @@ Examples:
 
   # Reset database (drops and recreates)
   python -m app.data.database.init_db --reset --sample-data
+
+  # Add indexes introduced (and drop ones retired) since the tables were created
+  python -m app.data.database.init_db --create-indexes
+
+  # Recompute aggregates after a backfill
+  python -m app.data.database.init_db --rebuild-aggregates
+
+  # Bulk import logged test sessions
+  python -m app.data.database.init_db --import sessions.csv --chunk-size 20000
+
+  # Generate one million synthetic sessions for load testing
+  python -m app.data.database.init_db --create-tables --synthetic 1000000
         """,
     )
     parser.add_argument("--create-tables", action="store_true", help="Create database tables")
+    parser.add_argument(
+        "--create-indexes",
+        action="store_true",
+        help="Create missing and drop retired indexes on existing tables",
+    )
+    parser.add_argument(
+        "--rebuild-aggregates",
+        action="store_true",
+        help="Recompute the per-wax condition aggregates from all test sessions",
+    )
     parser.add_argument("--sample-data", action="store_true", help="Populate with sample data")
     parser.add_argument(
         "--reset",
@@ -265,9 +366,48 @@ Examples:
         help="Drop existing tables and recreate (WARNING: deletes all data!)",
     )
 
+    parser.add_argument(
+        "--import",
+        dest="import_path",
+        metavar="FILE",
+        help="Bulk import test sessions from a CSV or Parquet file",
+    )
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        metavar="N",
+        help="Generate N synthetic test sessions from a hidden ground-truth wax model",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=RANDOM_SEED,
+        help=f"Random seed for --synthetic (default: {RANDOM_SEED})",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=INGEST_CHUNK_SIZE,
+        help=f"Rows per batch when importing or generating (default: {INGEST_CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--skip-invalid",
+        action="store_true",
+        help="Skip rows that fail validation when importing instead of aborting",
+    )
+
     args = parser.parse_args()
 
-    if not any([args.create_tables, args.sample_data, args.reset]):
+    actions = [
+        args.create_tables,
+        args.create_indexes,
+        args.rebuild_aggregates,
+        args.sample_data,
+        args.reset,
+        args.import_path,
+        args.synthetic,
+    ]
+    if not any(actions):
         parser.print_help()
         return
 
@@ -283,9 +423,23 @@ Examples:
         elif args.create_tables:
             create_tables(drop_existing=False)
 
+        if args.create_indexes:
+            create_indexes()
+
         if args.sample_data:
             populate_sample_data()
 
+        if args.import_path:
+            import_data(
+                args.import_path, chunk_size=args.chunk_size, skip_invalid=args.skip_invalid
+            )
+
+        if args.synthetic:
+            populate_synthetic_data(args.synthetic, seed=args.seed, chunk_size=args.chunk_size)
+
+        if args.rebuild_aggregates:
+            rebuild_aggregates()
+
         print("\n✅ Database initialization complete!")
 
     except Exception as e:
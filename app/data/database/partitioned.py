@@ -0,0 +1,143 @@
+"""Parallel scans of test_sessions split into id or test_date ranges.
+
+A full-table extract through one cursor is bound by a single core decoding
+rows. parallel_scan() instead splits the table into contiguous ranges of a
+partition column and runs a query function on each range concurrently,
+every range in its own get_db() session and thus on its own connection.
+Results come back in range order, ready to be concatenated.
+
+With executor="process" the query function runs in pool workers; it must
+be a module-level function (picklable by reference) and returns picklable
+results. Each worker builds its own engine (see
+connection.reset_engines_after_fork). executor="thread" avoids the pickling
+and suits drivers that release the GIL while fetching.
+
+Example:
+    def fetch_ids(db, column, bounds):
+        statement = select(TestSession.id).where(*range_conditions(column, bounds))
+        return db.scalars(statement).all()
+
+    ids = list(itertools.chain(*parallel_scan(fetch_ids, column="id")))
+"""
+
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+import os
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.data.data_types import TestSession
+from app.data.database.session import get_db
+
+# Columns test_sessions can be partitioned on
+PARTITION_COLUMNS = {"id": TestSession.id, "test_date": TestSession.test_date}
+
+# Ranges are half-open [low, high); high is None for the last range
+Bounds = tuple[Any, Any]
+
+
+def partition_ranges(db: Session, column: str = "id", n_partitions: int = 4) -> list[Bounds]:
+    """Split the value range of a partition column into equal-width ranges.
+
+    Args:
+        db: Database session
+        column: Key of PARTITION_COLUMNS
+        n_partitions: Number of ranges
+
+    Returns:
+        Contiguous (low, high) ranges covering every row; empty if the
+        table is empty
+
+    Raises:
+        ValueError: If column is not a partition column or n_partitions < 1
+    """
+    if column not in PARTITION_COLUMNS:
+        raise ValueError(f"Cannot partition test_sessions on '{column}'")
+    if n_partitions < 1:
+        raise ValueError(f"n_partitions must be at least 1, got {n_partitions}")
+
+    attribute = PARTITION_COLUMNS[column]
+    low, high = db.execute(select(func.min(attribute), func.max(attribute))).one()
+    if low is None:
+        return []
+    if isinstance(low, datetime):
+        step = (high - low) / n_partitions
+        edges = sorted({low + step * i for i in range(n_partitions)})
+    else:
+        step = (high - low + 1) / n_partitions
+        edges = sorted({low + int(step * i) for i in range(n_partitions)})
+    return list(zip(edges, [*edges[1:], None]))
+
+
+def range_conditions(column: str, bounds: Bounds) -> list:
+    """SQL conditions selecting the rows of one partition range.
+
+    Args:
+        column: Key of PARTITION_COLUMNS
+        bounds: (low, high) range from partition_ranges()
+
+    Returns:
+        List of conditions for Select.where()
+    """
+    attribute = PARTITION_COLUMNS[column]
+    low, high = bounds
+    conditions = [attribute >= low]
+    if high is not None:
+        conditions.append(attribute < high)
+    return conditions
+
+
+def _scan_range[T](
+    query: Callable[[Session, str, Bounds], T], column: str, bounds: Bounds, readonly: bool
+) -> T:
+    with get_db(readonly=readonly) as db:
+        return query(db, column, bounds)
+
+
+def parallel_scan[T](
+    query: Callable[[Session, str, Bounds], T],
+    column: str = "id",
+    n_partitions: int | None = None,
+    executor: str = "process",
+    max_workers: int | None = None,
+    readonly: bool = True,
+) -> list[T]:
+    """Run query over every partition range of test_sessions concurrently.
+
+    Only committed data is visible to the partitions, each of which reads in
+    its own transaction.
+
+    Args:
+        query: Function (db, column, bounds) -> result for one range; select
+            its rows with range_conditions(column, bounds)
+        column: Partition column, "id" or "test_date"
+        n_partitions: Number of ranges (defaults to twice the worker count,
+            which evens out ranges of unequal density)
+        executor: "process" or "thread"
+        max_workers: Pool size (defaults to the number of CPUs)
+        readonly: If True, use read-only sessions (see get_db)
+
+    Returns:
+        Results of query, one per range in ascending range order
+
+    Raises:
+        ValueError: If executor is unknown (or see partition_ranges)
+    """
+    pools: dict[str, type[Executor]] = {
+        "process": ProcessPoolExecutor,
+        "thread": ThreadPoolExecutor,
+    }
+    if executor not in pools:
+        raise ValueError(f"Unknown executor '{executor}', expected 'process' or 'thread'")
+    max_workers = max_workers or os.cpu_count() or 1
+    with get_db(readonly=readonly) as db:
+        ranges = partition_ranges(db, column, n_partitions or 2 * max_workers)
+    if len(ranges) <= 1 or max_workers == 1:
+        return [_scan_range(query, column, bounds, readonly) for bounds in ranges]
+
+    with pools[executor](max_workers=min(max_workers, len(ranges))) as pool:
+        futures = [pool.submit(_scan_range, query, column, bounds, readonly) for bounds in ranges]
+        return [future.result() for future in futures]
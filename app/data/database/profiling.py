@@ -0,0 +1,359 @@
+"""Opt-in SQL statement profiling and N+1 query detection.
+
+When DB_PROFILE is enabled, create_db_engine() attaches cursor-execute hooks
+that record every statement's latency, row count and the application call
+site that issued it. Statements are grouped per get_db() block; a block that
+runs the same parametrized SELECT DB_N_PLUS_ONE_THRESHOLD times or more is
+flagged as an N+1 pattern (typically a lazy relationship such as
+TestSession.test_wax accessed in a loop) and logged as a warning.
+
+Aggregates are kept in memory (see get_profiler().summary()). With
+DB_PROFILE_LOG set, each block's statements are also appended to a JSON-lines
+file, which this module summarizes offline:
+
+    python -m app.data.database.profiling db_profile.jsonl [--top N]
+
+Row counts come from the DB-API cursor: exact for writes, and for SELECTs on
+drivers that buffer results (psycopg2); SQLite reports -1 for SELECTs.
+"""
+
+import argparse
+from collections import Counter
+from collections.abc import Iterator
+import contextlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+import itertools
+import json
+import logging
+from pathlib import Path
+import sys
+import threading
+import time
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+
+# Frames from these paths are skipped when looking for the calling code
+_INTERNAL_PATHS = (
+    str(Path(__file__).resolve()),
+    str(Path(__file__).resolve().parent / "session.py"),
+    str(Path(sqlalchemy.__file__).resolve().parent),
+    str(Path(contextlib.__file__).resolve()),
+)
+
+
+@dataclass
+class StatementRecord:
+    """One executed statement."""
+
+    sql: str
+    seconds: float
+    rows: int
+    call_site: str
+    scope: str
+    timestamp: float
+
+
+@dataclass
+class StatementStats:
+    """Aggregated timings of one parametrized statement."""
+
+    sql: str
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    rows: int = 0
+    call_sites: Counter = field(default_factory=Counter)
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+    def add(self, record: StatementRecord):
+        self.count += 1
+        self.total_seconds += record.seconds
+        self.max_seconds = max(self.max_seconds, record.seconds)
+        self.rows += max(record.rows, 0)
+        self.call_sites[record.call_site] += 1
+
+
+@dataclass
+class NPlusOne:
+    """A SELECT repeated within one get_db() block."""
+
+    scope: str
+    sql: str
+    count: int
+    total_seconds: float
+    call_sites: list[str]
+
+    def __str__(self):
+        return (
+            f"N+1 in {self.scope}: {self.count}x ({self.total_seconds * 1000:.1f} ms) "
+            f"from {', '.join(self.call_sites)}: {_shorten(self.sql)}"
+        )
+
+
+@dataclass
+class Scope:
+    """Statements issued inside one get_db() block."""
+
+    name: str
+    records: list[StatementRecord] = field(default_factory=list)
+
+    def n_plus_one(self, threshold: int) -> list[NPlusOne]:
+        """Find SELECTs executed at least threshold times in this scope."""
+        by_sql: dict[str, list[StatementRecord]] = {}
+        for record in self.records:
+            if record.sql.lstrip().upper().startswith("SELECT"):
+                by_sql.setdefault(record.sql, []).append(record)
+        return [
+            NPlusOne(
+                scope=self.name,
+                sql=sql,
+                count=len(records),
+                total_seconds=sum(r.seconds for r in records),
+                call_sites=sorted({r.call_site for r in records}),
+            )
+            for sql, records in by_sql.items()
+            if len(records) >= threshold
+        ]
+
+
+def _shorten(sql: str, width: int = 120) -> str:
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= width else sql[: width - 3] + "..."
+
+
+class Profiler:
+    """Process-wide collector of statement statistics and N+1 findings."""
+
+    def __init__(
+        self,
+        n_plus_one_threshold: int = DEFAULT_N_PLUS_ONE_THRESHOLD,
+        log_path: str | Path | None = None,
+        max_findings: int = 100,
+    ):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.log_path = Path(log_path) if log_path else None
+        self.max_findings = max_findings
+        self.statements: dict[str, StatementStats] = {}
+        self.findings: list[NPlusOne] = []
+        self.n_scopes = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.statements.clear()
+            self.findings.clear()
+            self.n_scopes = 0
+
+    def record(self, record: StatementRecord):
+        with self._lock:
+            stats = self.statements.get(record.sql)
+            if stats is None:
+                stats = self.statements[record.sql] = StatementStats(record.sql)
+            stats.add(record)
+
+    def close_scope(self, scope: Scope):
+        """Check a finished get_db() block for N+1 patterns and log its statements."""
+        findings = scope.n_plus_one(self.n_plus_one_threshold)
+        for finding in findings:
+            logger.warning(str(finding))
+        with self._lock:
+            self.n_scopes += 1
+            self.findings = (self.findings + findings)[-self.max_findings :]
+            if self.log_path is not None and scope.records:
+                with self.log_path.open("a") as log:
+                    for record in scope.records:
+                        log.write(json.dumps(record.__dict__) + "\n")
+
+    def summary(self, top: int = 10) -> str:
+        """Human readable report of the slowest statements and N+1 findings."""
+        with self._lock:
+            statements = list(self.statements.values())
+            findings = list(self.findings)
+        return format_summary(statements, findings, top=top, n_scopes=self.n_scopes)
+
+
+def format_summary(
+    statements: list[StatementStats],
+    findings: list[NPlusOne],
+    top: int = 10,
+    n_scopes: int | None = None,
+) -> str:
+    """Format statement statistics, slowest total time first."""
+    total = sum(s.total_seconds for s in statements)
+    count = sum(s.count for s in statements)
+    header = f"{count} statements, {total * 1000:.1f} ms total"
+    if n_scopes is not None:
+        header += f" in {n_scopes} get_db() blocks"
+    lines = [header, ""]
+    for stats in sorted(statements, key=lambda s: s.total_seconds, reverse=True)[:top]:
+        site, _ = stats.call_sites.most_common(1)[0]
+        lines.append(
+            f"{stats.total_seconds * 1000:9.1f} ms  {stats.count:6d}x  "
+            f"mean {stats.mean_seconds * 1000:7.2f} ms  max {stats.max_seconds * 1000:7.2f} ms  "
+            f"rows {stats.rows:8d}  {site}"
+        )
+        lines.append(f"    {_shorten(stats.sql)}")
+    if findings:
+        lines.append("")
+        lines.append(f"{len(findings)} N+1 patterns:")
+        lines.extend(f"  {finding}" for finding in findings)
+    return "\n".join(lines)
+
+
+_profiler = Profiler()
+_current_scope: ContextVar[Scope | None] = ContextVar("db_profile_scope", default=None)
+_scope_ids = itertools.count(1)
+_enabled = False
+
+
+def get_profiler() -> Profiler:
+    """Get the process-wide profiler."""
+    return _profiler
+
+
+def is_enabled() -> bool:
+    """Whether any engine has been instrumented."""
+    return _enabled
+
+
+def _call_site() -> str:
+    """First stack frame outside SQLAlchemy and the data layer plumbing."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_INTERNAL_PATHS):
+            return f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Stack of (execution context, start time); nested executions are rare but possible
+    conn.info.setdefault("profile_start", []).append((context, time.perf_counter()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _, start = conn.info["profile_start"].pop()
+    seconds = time.perf_counter() - start
+    scope = _current_scope.get()
+    record = StatementRecord(
+        sql=statement,
+        seconds=seconds,
+        rows=cursor.rowcount if cursor.rowcount is not None else -1,
+        call_site=_call_site(),
+        scope=scope.name if scope is not None else "<no get_db() block>",
+        timestamp=time.time(),
+    )
+    _profiler.record(record)
+    if scope is not None:
+        scope.records.append(record)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    connection = exception_context.connection
+    stack = connection.info.get("profile_start") if connection is not None else None
+    if stack and stack[-1][0] is exception_context.execution_context:
+        stack.pop()
+
+
+def instrument_engine(
+    engine: Engine,
+    n_plus_one_threshold: int | None = None,
+    log_path: str | Path | None = None,
+):
+    """Attach statement profiling to an engine.
+
+    Args:
+        engine: Engine to instrument (idempotent)
+        n_plus_one_threshold: Repeats of one SELECT per block flagged as N+1
+        log_path: Optional JSON-lines file receiving every profiled statement
+    """
+    global _enabled
+    if n_plus_one_threshold is not None:
+        _profiler.n_plus_one_threshold = n_plus_one_threshold
+    if log_path:
+        _profiler.log_path = Path(log_path)
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    _enabled = True
+
+
+@contextmanager
+def profile_scope(name: str | None = None) -> Iterator[Scope | None]:
+    """Group the statements issued inside the block (used by get_db()).
+
+    Args:
+        name: Scope name; defaults to the calling code location
+
+    Yields:
+        The Scope, or None when profiling is disabled
+    """
+    if not _enabled:
+        yield None
+        return
+    scope = Scope(name=f"#{next(_scope_ids)} {name or _call_site()}")
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+        _profiler.close_scope(scope)
+
+
+def summarize_jsonl(
+    path: str | Path, top: int = 10, n_plus_one_threshold: int = DEFAULT_N_PLUS_ONE_THRESHOLD
+) -> str:
+    """Summarize a DB_PROFILE_LOG file.
+
+    Args:
+        path: JSON-lines file written by the profiler
+        top: Number of statements to list
+        n_plus_one_threshold: Repeats of one SELECT per block flagged as N+1
+
+    Returns:
+        Report in the same format as Profiler.summary()
+    """
+    statements: dict[str, StatementStats] = {}
+    scopes: dict[str, Scope] = {}
+    with Path(path).open() as log:
+        for line in log:
+            record = StatementRecord(**json.loads(line))
+            statements.setdefault(record.sql, StatementStats(record.sql)).add(record)
+            scopes.setdefault(record.scope, Scope(record.scope)).records.append(record)
+    findings = [f for scope in scopes.values() for f in scope.n_plus_one(n_plus_one_threshold)]
+    return format_summary(list(statements.values()), findings, top=top, n_scopes=len(scopes))
+
+
+def main():
+    """CLI entry point: summarize a profiling log."""
+    parser = argparse.ArgumentParser(description="Summarize a DB_PROFILE_LOG file")
+    parser.add_argument("path", type=Path, help="JSON-lines file written with DB_PROFILE_LOG")
+    parser.add_argument("--top", type=int, default=10, help="Statements to list (default: 10)")
+    parser.add_argument(
+        "--threshold",
+        type=int,
+        default=DEFAULT_N_PLUS_ONE_THRESHOLD,
+        help="Repeats of one SELECT per get_db() block flagged as N+1",
+    )
+    args = parser.parse_args()
+    print(f"Profile of {args.path} ({datetime.fromtimestamp(args.path.stat().st_mtime):%c})\n")
+    print(summarize_jsonl(args.path, top=args.top, n_plus_one_threshold=args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Query-plan regression checks for the canonical test_sessions queries.
+
+Runs EXPLAIN for each hot query and fails if any of them falls back to a
+sequential scan of test_sessions. By default the check runs against a fresh
+in-memory SQLite database seeded with random sessions; --use-database-url
+checks the configured database instead (it must be reasonably large and
+ANALYZEd, or PostgreSQL will rightly prefer sequential scans).
+
+Usage:
+    python -m app.data.database.query_plans [--sessions N] [--use-database-url]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import re
+import sys
+
+import numpy as np
+from sqlalchemy import insert, select, text, tuple_
+from sqlalchemy.engine import Engine
+
+from app.config import SNOW_MOISTURE_CATEGORIES, SNOW_TYPE_CATEGORIES
+from app.data.data_types import Base, SkiModel, TestSession, WaxProduct
+from app.data.database.connection import create_db_engine, get_engine
+
+_START = datetime(2025, 1, 1)
+_END = datetime(2025, 2, 1)
+
+# The access patterns the test_sessions indexes are designed for
+CANONICAL_QUERIES = {
+    "sessions_by_test_wax": select(TestSession.id).where(
+        TestSession.test_wax_id == 2, TestSession.test_date.between(_START, _END)
+    ),
+    "sessions_by_reference_wax": select(TestSession.id).where(
+        TestSession.reference_wax_id == 2, TestSession.test_date.between(_START, _END)
+    ),
+    "sessions_by_either_wax": select(TestSession.id).where(
+        (TestSession.test_wax_id == 2) | (TestSession.reference_wax_id == 2),
+        TestSession.test_date.between(_START, _END),
+    ),
+    "sessions_by_conditions": select(TestSession.id).where(
+        TestSession.snow_moisture == "dry", TestSession.temperature.between(-8.0, -4.0)
+    ),
+    "sessions_by_location": select(TestSession.id).where(
+        TestSession.location == "Location 3", TestSession.test_date.between(_START, _END)
+    ),
+    "session_history_page": select(TestSession.id)
+    .where(tuple_(TestSession.test_date, TestSession.id) < tuple_(_END, 1000))
+    .order_by(TestSession.test_date.desc(), TestSession.id.desc())
+    .limit(50),
+}
+
+# Plan lines that mean a full pass over test_sessions
+_SEQUENTIAL_SCAN = {
+    "sqlite": re.compile(r"\bSCAN test_sessions\b"),
+    "postgresql": re.compile(r"\bSeq Scan on test_sessions\b"),
+}
+
+
+def explain(engine: Engine, statement) -> list[str]:
+    """Return the query plan of statement as a list of lines.
+
+    Args:
+        engine: Engine to explain against (SQLite or PostgreSQL)
+        statement: SQLAlchemy Select statement
+
+    Returns:
+        Plan lines as reported by the database
+    """
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    prefix = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+    with engine.connect() as connection:
+        rows = connection.execute(text(f"{prefix} {compiled}")).all()
+    # SQLite returns (id, parent, notused, detail); PostgreSQL one text column
+    return [str(row[-1]) for row in rows]
+
+
+def uses_sequential_scan(engine: Engine, plan: list[str]) -> bool:
+    """Check whether a plan from explain() scans the whole test_sessions table.
+
+    Raises:
+        ValueError: If the database backend is not supported
+    """
+    pattern = _SEQUENTIAL_SCAN.get(engine.dialect.name)
+    if pattern is None:
+        raise ValueError(f"Query plan checks are not supported for '{engine.dialect.name}'")
+    return any(pattern.search(line) for line in plan)
+
+
+def find_sequential_scans(engine: Engine) -> dict[str, list[str]]:
+    """Explain every canonical query and collect those using a sequential scan.
+
+    Args:
+        engine: Engine to check
+
+    Returns:
+        Query name -> plan lines, for each query that scans test_sessions
+    """
+    failures = {}
+    for name, statement in CANONICAL_QUERIES.items():
+        plan = explain(engine, statement)
+        if uses_sequential_scan(engine, plan):
+            failures[name] = plan
+    return failures
+
+
+def seed_plan_database(engine: Engine, n_sessions: int = 20_000, seed: int = 0):
+    """Create tables on engine and fill them with random sessions, then ANALYZE.
+
+    Args:
+        engine: Empty database engine
+        n_sessions: Number of test sessions to insert
+        seed: Random seed
+    """
+    rng = np.random.default_rng(seed)
+    n_waxes, n_skis, n_locations = 50, 10, 20
+    Base.metadata.create_all(engine)
+    moisture = [*SNOW_MOISTURE_CATEGORIES, None]
+    with engine.begin() as connection:
+        connection.execute(
+            insert(SkiModel),
+            [{"brand": "Brand", "model": f"Model {i}"} for i in range(n_skis)],
+        )
+        connection.execute(
+            insert(WaxProduct),
+            [
+                {"brand": "Brand", "product_name": f"Wax {i}", "wax_type": "glide"}
+                for i in range(n_waxes)
+            ],
+        )
+        n = n_sessions
+        ski = rng.integers(1, n_skis + 1, n).tolist()
+        distance = rng.normal(0, 2, n)
+        columns = {
+            "test_date": [
+                _START + timedelta(hours=h) for h in rng.integers(0, 3 * 8760, n).tolist()
+            ],
+            "location": [f"Location {i}" for i in rng.integers(0, n_locations, n).tolist()],
+            "temperature": rng.normal(-5, 5, n).tolist(),
+            "snow_type": rng.choice(SNOW_TYPE_CATEGORIES, n).tolist(),
+            "snow_moisture": [moisture[i] for i in rng.integers(0, len(moisture), n).tolist()],
+            "test_course_length": [100.0] * n,
+            "reference_ski_id": ski,
+            "reference_wax_id": rng.integers(1, n_waxes + 1, n).tolist(),
+            "test_ski_id": ski,
+            "test_wax_id": rng.integers(1, n_waxes + 1, n).tolist(),
+            "distance_between_skis": distance.tolist(),
+            "test_ski_won": (distance > 0).tolist(),
+        }
+        records = [dict(zip(columns, values)) for values in zip(*columns.values())]
+        connection.execute(insert(TestSession), records)
+        connection.execute(text("ANALYZE"))
+
+
+def main():
+    """CLI entry point for the query-plan regression check."""
+    parser = argparse.ArgumentParser(description="Check test_sessions query plans")
+    parser.add_argument(
+        "--sessions", type=int, default=20_000, help="Sessions to seed (default: 20000)"
+    )
+    parser.add_argument(
+        "--use-database-url",
+        action="store_true",
+        help="Check the database from DATABASE_URL instead of a seeded in-memory SQLite",
+    )
+    args = parser.parse_args()
+
+    if args.use_database_url:
+        engine = get_engine()
+    else:
+        engine = create_db_engine("sqlite://")
+        seed_plan_database(engine, n_sessions=args.sessions)
+
+    failures = find_sequential_scans(engine)
+    for name in CANONICAL_QUERIES:
+        print(f"{'✗' if name in failures else '✓'} {name}")
+        for line in failures.get(name, []):
+            print(f"    {line}")
+
+    if failures:
+        print(f"\n❌ {len(failures)} queries fall back to a sequential scan of test_sessions")
+        sys.exit(1)
+    print("\n✅ All canonical queries use an index")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,110 @@
 """Database session management."""
 
 from contextlib import contextmanager
+import os
 from typing import Generator
 
 from sqlalchemy.orm import Session, sessionmaker
 
+from app.data.aggregates import track_aggregates
+from app.data.change_log import track_changes
+from app.data.data_version import track_data_version
 from app.data.database.connection import get_engine
+from app.data.database.profiling import profile_scope
 
-# Session factory (lazy loaded)
-_SessionLocal: sessionmaker | None = None
+# Session factories (lazy loaded), keyed by readonly
+_session_factories: dict[bool, sessionmaker] = {}
+# Process that created _session_factories (they are bound to its engines)
+_factories_pid = os.getpid()
 
 
-def get_session_factory() -> sessionmaker:
+def reset_session_factories_after_fork():
+    """Forget session factories inherited from a parent process.
+
+    Their engines are replaced in the child (see
+    connection.reset_engines_after_fork), so the factories are rebuilt too.
+    """
+    global _factories_pid
+    if _factories_pid != os.getpid():
+        _session_factories.clear()
+        _factories_pid = os.getpid()
+
+
+os.register_at_fork(after_in_child=reset_session_factories_after_fork)
+
+
+def get_session_factory(readonly: bool = False) -> sessionmaker:
     """Get or create the session factory.
 
+    Sessions from the writable factory keep wax_condition_stats up to date
+    (see app.data.aggregates) and bump the data version on commits that
+    change the dataset (see app.data.data_version).
+
+    Args:
+        readonly: If True, bind to the read-only engine (see get_engine)
+
     Returns:
-        SQLAlchemy sessionmaker instance
+        SQLAlchemy sessionmaker instance, created anew in each process
     """
-    global _SessionLocal
-    if _SessionLocal is None:
-        engine = get_engine()
-        _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    return _SessionLocal
+    reset_session_factories_after_fork()
+    if readonly not in _session_factories:
+        engine = get_engine(readonly=readonly)
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        if not readonly:
+            track_aggregates(factory)
+            track_data_version(factory)
+            track_changes(factory)
+        _session_factories[readonly] = factory
+    return _session_factories[readonly]
 
 
-def get_session() -> Session:
+def get_session(readonly: bool = False) -> Session:
     """Create a new database session.
 
+    Args:
+        readonly: If True, bind to the read-only engine
+
     Returns:
         SQLAlchemy Session instance
 
     Note:
         Remember to close the session when done, or use get_db() context manager
     """
-    SessionLocal = get_session_factory()
+    SessionLocal = get_session_factory(readonly=readonly)
     return SessionLocal()
 
 
 @contextmanager
-def get_db() -> Generator[Session, None, None]:
+def get_db(readonly: bool = False) -> Generator[Session, None, None]:
     """Context manager for database sessions.
 
+    With DB_PROFILE set, the statements issued inside the block are checked
+    for N+1 patterns (see app.data.database.profiling).
+
+    Args:
+        readonly: If True, route queries to DATABASE_READ_URL (when configured)
+            and roll back instead of committing at the end of the block
+
     Yields:
         SQLAlchemy Session instance
 
     Example:
         with get_db() as db:
             skis = db.query(SkiModel).all()
+
+        with get_db(readonly=True) as db:
+            tests = db.query(TestSession).filter(TestSession.temperature < -5.0).all()
     """
-    db = get_session()
-    try:
-        yield db
-        db.commit()
-    except Exception:
-        db.rollback()
-        raise
-    finally:
-        db.close()
+    db = get_session(readonly=readonly)
+    with profile_scope():
+        try:
+            yield db
+            if readonly:
+                db.rollback()
+            else:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
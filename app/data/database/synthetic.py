@@ -0,0 +1,284 @@
+"""Large-scale synthetic test sessions for load and scaling tests.
+
+Conditions are drawn from the categories and temperature bins in app.config.
+Winners and margins come from a hidden ground-truth wax strength model, saved
+next to the data so rankings and model accuracy can be checked against it.
+Sessions are generated vectorized and written in fixed-size chunks, so memory
+use does not grow with the number of sessions.
+"""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+import time
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import (
+    CONFIDENCE_RATING_MAX,
+    CONFIDENCE_RATING_MIN,
+    COURSE_PROFILE_CATEGORIES,
+    DATA_DIR,
+    INGEST_CHUNK_SIZE,
+    MAX_DISTANCE_BETWEEN_SKIS,
+    MAX_TEST_COURSE_LENGTH,
+    MIN_TEST_COURSE_LENGTH,
+    PRECIPITATION_CATEGORIES,
+    RANDOM_SEED,
+    SNOW_MOISTURE_CATEGORIES,
+    SNOW_TYPE_CATEGORIES,
+    TEMPERATURE_BINS,
+    TRACK_CONDITION_CATEGORIES,
+)
+from app.data.change_log import RECORDED_OPTION, record_changes
+from app.data.data_types import SkiModel, WaxProduct
+from app.data.database.ingest import ImportReport, insert_records, peak_rss_bytes
+from app.data.database.session import get_db
+
+GROUND_TRUTH_PATH = DATA_DIR / "synthetic" / "ground_truth.npz"
+DEFAULT_CHUNK_SIZE = INGEST_CHUNK_SIZE
+
+# Outer temperature bins are open-ended; synthetic temperatures stay within these
+TEMPERATURE_LIMITS = (-25.0, 15.0)
+# Meters of glide per unit of ground-truth strength difference
+MARGIN_SCALE = 2.0
+# Measurement noise (meters) at the lowest and highest confidence_rating
+NOISE_AT_MIN_CONFIDENCE = 3.0
+NOISE_AT_MAX_CONFIDENCE = 0.5
+
+SEASON_START = datetime(2020, 11, 1)
+SEASON_DAYS = 150  # November through March
+N_SEASONS = 5
+
+
+@dataclass
+class GroundTruth:
+    """Hidden per-wax strength model behind the synthetic results.
+
+    strength(w, t, m) = base[w] - ((t - optimum[w]) / width[w])**2 / 2 + moisture[w, m]
+    """
+
+    wax_ids: np.ndarray
+    base: np.ndarray
+    optimum: np.ndarray
+    width: np.ndarray
+    moisture: np.ndarray  # (n_waxes, len(SNOW_MOISTURE_CATEGORIES))
+
+    def strength(self, wax_index, temperature, moisture_code) -> np.ndarray:
+        """Vectorized true strength of waxes (by position in wax_ids) in conditions."""
+        wax_index = np.asarray(wax_index)
+        deviation = (np.asarray(temperature) - self.optimum[wax_index]) / self.width[wax_index]
+        return self.base[wax_index] - 0.5 * deviation**2 + self.moisture[wax_index, moisture_code]
+
+    def save(self, path: str | Path = GROUND_TRUTH_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, **self.__dict__)
+
+    @classmethod
+    def load(cls, path: str | Path = GROUND_TRUTH_PATH) -> "GroundTruth":
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+
+def make_ground_truth(n_waxes: int, rng: np.random.Generator) -> tuple[GroundTruth, list[dict]]:
+    """Draw a ground-truth model and matching wax_products rows.
+
+    Each wax gets a temperature range around its optimum, so the rule-based
+    temp_range_low/high information is informative but not the whole story.
+
+    Returns:
+        Tuple of (GroundTruth without wax_ids, wax_products records)
+    """
+    low, high = TEMPERATURE_LIMITS
+    optimum = rng.uniform(low + 5, high - 5, n_waxes)
+    width = rng.uniform(2.0, 8.0, n_waxes)
+    truth = GroundTruth(
+        wax_ids=np.empty(0, dtype="int64"),
+        base=rng.normal(0.0, 0.5, n_waxes),
+        optimum=optimum,
+        width=width,
+        moisture=rng.normal(0.0, 0.3, (n_waxes, len(SNOW_MOISTURE_CATEGORIES))),
+    )
+    waxes = [
+        {
+            "brand": "Synthetic",
+            "product_name": f"Wax {i:05d}",
+            "wax_type": "glide",
+            "temp_range_low": round(float(optimum[i] - width[i] / 2), 1),
+            "temp_range_high": round(float(optimum[i] + width[i] / 2), 1),
+            "application_method": "hot wax",
+        }
+        for i in range(n_waxes)
+    ]
+    return truth, waxes
+
+
+def _draw_temperatures(n: int, rng: np.random.Generator) -> np.ndarray:
+    """Pick a TEMPERATURE_BINS bin uniformly, then a temperature inside it."""
+    edges = np.array([TEMPERATURE_LIMITS[0], *TEMPERATURE_BINS, TEMPERATURE_LIMITS[1]])
+    bins = rng.integers(0, len(edges) - 1, n)
+    return np.round(rng.uniform(edges[bins], edges[bins + 1]), 1)
+
+
+def generate_session_chunks(
+    n_sessions: int,
+    truth: GroundTruth,
+    ski_ids: np.ndarray,
+    seed: int = RANDOM_SEED,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[dict[str, np.ndarray]]:
+    """Generate synthetic sessions as column arrays, chunk by chunk.
+
+    Args:
+        n_sessions: Total number of sessions
+        truth: Ground-truth model (wax_ids must be set)
+        ski_ids: ski_models ids to draw from
+        seed: Random seed; the same seed and chunk_size give the same sessions
+        chunk_size: Sessions per chunk
+
+    Yields:
+        Dict of test_sessions column -> array with up to chunk_size rows
+    """
+    rng = np.random.default_rng(seed)
+    n_waxes = len(truth.wax_ids)
+    for start in range(0, n_sessions, chunk_size):
+        n = min(chunk_size, n_sessions - start)
+
+        temperature = _draw_temperatures(n, rng)
+        # Warmer snow is more likely to be moist or wet
+        wetness = np.clip((temperature + 3.0) / 6.0, 0.0, 1.0)
+        moisture = np.where(
+            rng.random(n) < wetness, rng.integers(1, len(SNOW_MOISTURE_CATEGORIES), n), 0
+        )
+        snow_temperature = np.round(np.minimum(temperature - rng.uniform(0, 2, n), 0.0), 1)
+
+        reference = rng.integers(0, n_waxes, n)
+        test = (reference + rng.integers(1, max(n_waxes, 2), n)) % n_waxes
+        confidence = rng.integers(CONFIDENCE_RATING_MIN, CONFIDENCE_RATING_MAX + 1, n)
+        confidence_fraction = (confidence - CONFIDENCE_RATING_MIN) / max(
+            CONFIDENCE_RATING_MAX - CONFIDENCE_RATING_MIN, 1
+        )
+        noise = NOISE_AT_MIN_CONFIDENCE + confidence_fraction * (
+            NOISE_AT_MAX_CONFIDENCE - NOISE_AT_MIN_CONFIDENCE
+        )
+        advantage = truth.strength(test, temperature, moisture) - truth.strength(
+            reference, temperature, moisture
+        )
+        distance = np.round(
+            np.clip(
+                MARGIN_SCALE * advantage + rng.normal(0, 1, n) * noise,
+                -MAX_DISTANCE_BETWEEN_SKIS,
+                MAX_DISTANCE_BETWEEN_SKIS,
+            ),
+            2,
+        )
+
+        day = rng.integers(0, SEASON_DAYS, n) + 365 * rng.integers(0, N_SEASONS, n)
+        minute = rng.integers(8 * 60, 16 * 60, n)
+        test_date = (
+            np.datetime64(SEASON_START)
+            + day.astype("timedelta64[D]")
+            + minute.astype("timedelta64[m]")
+        )
+        ski = rng.choice(ski_ids, n)
+
+        yield {
+            "test_date": test_date.astype("datetime64[us]"),
+            "location": np.char.add("Synthetic Track ", rng.integers(1, 21, n).astype(str)),
+            "temperature": temperature,
+            "humidity": np.round(np.clip(rng.normal(75, 12, n), 20, 100), 0),
+            "wind_speed": np.round(rng.gamma(2.0, 1.5, n), 1),
+            "precipitation": rng.choice(PRECIPITATION_CATEGORIES, n),
+            "snow_type": rng.choice(SNOW_TYPE_CATEGORIES, n),
+            "snow_age_days": rng.geometric(0.25, n) - 1,
+            "snow_temperature": snow_temperature,
+            "snow_moisture": np.array(SNOW_MOISTURE_CATEGORIES)[moisture],
+            "track_condition": rng.choice(TRACK_CONDITION_CATEGORIES, n),
+            "test_course_length": rng.integers(
+                MIN_TEST_COURSE_LENGTH // 10, MAX_TEST_COURSE_LENGTH // 10 + 1, n
+            ).astype("float64")
+            * 10,
+            "course_profile": rng.choice(COURSE_PROFILE_CATEGORIES, n),
+            "reference_ski_id": ski,
+            "reference_wax_id": truth.wax_ids[reference],
+            "test_ski_id": ski,
+            "test_wax_id": truth.wax_ids[test],
+            "distance_between_skis": distance,
+            "test_ski_won": distance > 0,
+            "confidence_rating": confidence,
+            "tester_name": np.full(n, "Synthetic"),
+        }
+
+
+def columns_to_records(columns: dict[str, np.ndarray]) -> list[dict]:
+    """Convert column arrays to executemany records of plain Python values."""
+    lists = [values.tolist() for values in columns.values()]
+    return [dict(zip(columns, row)) for row in zip(*lists)]
+
+
+def create_synthetic_catalog(
+    db: Session, n_waxes: int, n_skis: int, rng: np.random.Generator
+) -> tuple[GroundTruth, np.ndarray]:
+    """Insert synthetic waxes and skis and return the ground truth and ski ids."""
+    truth, waxes = make_ground_truth(n_waxes, rng)
+    # Bulk inserts are logged as "bulk" by the change feed unless their ids are recorded
+    recorded = {RECORDED_OPTION: True}
+    wax_ids = db.scalars(
+        insert(WaxProduct).returning(WaxProduct.id), waxes, execution_options=recorded
+    ).all()
+    record_changes(db, WaxProduct.__tablename__, wax_ids, "insert")
+    skis = [
+        {"brand": "Synthetic", "model": f"Ski {i:03d}", "category": "skate"} for i in range(n_skis)
+    ]
+    ski_ids = db.scalars(
+        insert(SkiModel).returning(SkiModel.id), skis, execution_options=recorded
+    ).all()
+    record_changes(db, SkiModel.__tablename__, ski_ids, "insert")
+    truth.wax_ids = np.array(wax_ids, dtype="int64")
+    return truth, np.array(ski_ids, dtype="int64")
+
+
+def insert_synthetic_sessions(
+    n_sessions: int,
+    n_waxes: int = 100,
+    n_skis: int = 10,
+    seed: int = RANDOM_SEED,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ground_truth_path: str | Path = GROUND_TRUTH_PATH,
+) -> ImportReport:
+    """Create a synthetic catalog and stream n_sessions synthetic sessions into the database.
+
+    Args:
+        n_sessions: Number of test sessions to generate
+        n_waxes: Number of synthetic wax products
+        n_skis: Number of synthetic ski models
+        seed: Random seed (defaults to RANDOM_SEED)
+        chunk_size: Sessions generated and inserted per batch
+        ground_truth_path: Where to save the hidden wax strength model
+
+    Returns:
+        ImportReport with row count, throughput and peak memory
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    rows = 0
+    chunks = 0
+    with get_db() as db:
+        truth, ski_ids = create_synthetic_catalog(db, n_waxes, n_skis, rng)
+        truth.save(ground_truth_path)
+        for columns in generate_session_chunks(
+            n_sessions, truth, ski_ids, seed=seed + 1, chunk_size=chunk_size
+        ):
+            rows += insert_records(db, columns_to_records(columns))
+            chunks += 1
+    return ImportReport(
+        rows=rows,
+        rejected=0,
+        chunks=chunks,
+        seconds=time.perf_counter() - start,
+        peak_memory_bytes=peak_rss_bytes(),
+    )
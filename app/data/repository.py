@@ -0,0 +1,355 @@
+"""Read-only queries for list and history views.
+
+The functions here select only the columns a view needs, join ski and wax
+names in the same statement, and return frozen slotted dataclasses instead
+of ORM instances. Nothing is added to the session's identity map and no
+relationship is lazy loaded afterwards, so the results are cheap to build,
+small to keep around, and safe to use after the session is closed.
+
+Each query matches one of the test_sessions indexes (see query_plans.py).
+
+History pages use keyset pagination: session_page() takes a SessionFilter and
+an opaque cursor holding the (test_date, id) of the last row shown, and
+continues with a WHERE (test_date, id) < cursor on the (test_date, id) index,
+so page 10,000 costs the same as page 1.
+
+Example:
+    with get_db(readonly=True) as db:
+        rows = sessions_by_wax(db, wax_id=2, limit=50)
+    for row in rows:
+        print(row.test_date, row.test_wax_brand, row.distance_between_skis)
+"""
+
+import base64
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from itertools import starmap
+import json
+
+from sqlalchemy import Select, func, or_, select, text, tuple_
+from sqlalchemy.orm import Session, aliased
+
+from app.data.data_types import SkiModel, TestSession, WaxProduct
+
+
+@dataclass(frozen=True, slots=True)
+class SessionRow:
+    """A test session with the names of its skis and waxes."""
+
+    id: int
+    test_date: datetime
+    location: str
+    temperature: float
+    humidity: float | None
+    wind_speed: float | None
+    precipitation: str | None
+    snow_type: str
+    snow_moisture: str | None
+    track_condition: str | None
+    test_course_length: float
+    reference_ski_id: int
+    reference_ski_brand: str
+    reference_ski_model: str
+    reference_wax_id: int
+    reference_wax_brand: str
+    reference_wax_product_name: str
+    test_ski_id: int
+    test_ski_brand: str
+    test_ski_model: str
+    test_wax_id: int
+    test_wax_brand: str
+    test_wax_product_name: str
+    distance_between_skis: float
+    test_ski_won: bool
+    confidence_rating: int | None
+    tester_name: str | None
+
+
+def session_rows_statement() -> Select:
+    """SELECT of the SessionRow columns, most recent sessions first.
+
+    Returns:
+        SQLAlchemy Select statement to add filters and a limit to
+    """
+    reference_ski, test_ski = aliased(SkiModel), aliased(SkiModel)
+    reference_wax, test_wax = aliased(WaxProduct), aliased(WaxProduct)
+    names = {
+        "reference_ski_brand": reference_ski.brand,
+        "reference_ski_model": reference_ski.model,
+        "reference_wax_brand": reference_wax.brand,
+        "reference_wax_product_name": reference_wax.product_name,
+        "test_ski_brand": test_ski.brand,
+        "test_ski_model": test_ski.model,
+        "test_wax_brand": test_wax.brand,
+        "test_wax_product_name": test_wax.product_name,
+    }
+    columns = [
+        names[field.name] if field.name in names else TestSession.__table__.c[field.name]
+        for field in fields(SessionRow)
+    ]
+    return (
+        select(*columns)
+        .join(reference_ski, TestSession.reference_ski_id == reference_ski.id)
+        .join(test_ski, TestSession.test_ski_id == test_ski.id)
+        .join(reference_wax, TestSession.reference_wax_id == reference_wax.id)
+        .join(test_wax, TestSession.test_wax_id == test_wax.id)
+        .order_by(TestSession.test_date.desc(), TestSession.id.desc())
+    )
+
+
+def fetch_session_rows(db: Session, statement: Select) -> list[SessionRow]:
+    """Execute a (filtered) session_rows_statement() and build SessionRows."""
+    return list(starmap(SessionRow, db.execute(statement).tuples()))
+
+
+def _date_range(statement: Select, start: datetime | None, end: datetime | None) -> Select:
+    if start is not None:
+        statement = statement.where(TestSession.test_date >= start)
+    if end is not None:
+        statement = statement.where(TestSession.test_date < end)
+    return statement
+
+
+def sessions_by_wax(
+    db: Session,
+    wax_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    limit: int | None = None,
+) -> list[SessionRow]:
+    """Sessions where a wax was the test or the reference wax.
+
+    Args:
+        db: Database session
+        wax_id: Wax product id
+        start: Only sessions with test_date >= start
+        end: Only sessions with test_date < end
+        limit: Maximum number of sessions (most recent first)
+
+    Returns:
+        List of SessionRow
+    """
+    statement = session_rows_statement().where(
+        (TestSession.test_wax_id == wax_id) | (TestSession.reference_wax_id == wax_id)
+    )
+    return fetch_session_rows(db, _date_range(statement, start, end).limit(limit))
+
+
+def sessions_by_date_range(
+    db: Session, start: datetime, end: datetime, limit: int | None = None
+) -> list[SessionRow]:
+    """Sessions with start <= test_date < end.
+
+    Args:
+        db: Database session
+        start: Start of the range (inclusive)
+        end: End of the range (exclusive)
+        limit: Maximum number of sessions (most recent first)
+
+    Returns:
+        List of SessionRow
+    """
+    statement = _date_range(session_rows_statement(), start, end)
+    return fetch_session_rows(db, statement.limit(limit))
+
+
+def sessions_by_conditions(
+    db: Session,
+    min_temperature: float | None = None,
+    max_temperature: float | None = None,
+    snow_moisture: str | None = None,
+    snow_type: str | None = None,
+    limit: int | None = None,
+) -> list[SessionRow]:
+    """Sessions in a temperature range and, optionally, snow type and moisture.
+
+    Args:
+        db: Database session
+        min_temperature: Only sessions at or above this temperature (Celsius)
+        max_temperature: Only sessions at or below this temperature (Celsius)
+        snow_moisture: Only sessions with this snow moisture
+        snow_type: Only sessions with this snow type
+        limit: Maximum number of sessions (most recent first)
+
+    Returns:
+        List of SessionRow
+    """
+    statement = session_rows_statement()
+    if snow_moisture is not None:
+        statement = statement.where(TestSession.snow_moisture == snow_moisture)
+    if snow_type is not None:
+        statement = statement.where(TestSession.snow_type == snow_type)
+    if min_temperature is not None:
+        statement = statement.where(TestSession.temperature >= min_temperature)
+    if max_temperature is not None:
+        statement = statement.where(TestSession.temperature <= max_temperature)
+    return fetch_session_rows(db, statement.limit(limit))
+
+
+@dataclass(frozen=True)
+class SessionFilter:
+    """Declarative filter for test session history.
+
+    Every criterion is optional and they are combined with AND. Collections
+    match any of their values; wax_ids and ski_ids match either side of the
+    comparison.
+    """
+
+    start: datetime | None = None  # test_date >= start
+    end: datetime | None = None  # test_date < end
+    min_temperature: float | None = None
+    max_temperature: float | None = None
+    snow_types: tuple[str, ...] = ()
+    snow_moistures: tuple[str, ...] = ()
+    track_conditions: tuple[str, ...] = ()
+    wax_ids: tuple[int, ...] = ()
+    ski_ids: tuple[int, ...] = ()
+    tester_name: str | None = None
+
+    def apply(self, statement: Select) -> Select:
+        """Add the filter's WHERE clauses to a SELECT over test_sessions."""
+        statement = _date_range(statement, self.start, self.end)
+        if self.min_temperature is not None:
+            statement = statement.where(TestSession.temperature >= self.min_temperature)
+        if self.max_temperature is not None:
+            statement = statement.where(TestSession.temperature <= self.max_temperature)
+        for column, values in (
+            (TestSession.snow_type, self.snow_types),
+            (TestSession.snow_moisture, self.snow_moistures),
+            (TestSession.track_condition, self.track_conditions),
+        ):
+            if values:
+                statement = statement.where(column.in_(values))
+        if self.wax_ids:
+            statement = statement.where(
+                or_(
+                    TestSession.test_wax_id.in_(self.wax_ids),
+                    TestSession.reference_wax_id.in_(self.wax_ids),
+                )
+            )
+        if self.ski_ids:
+            statement = statement.where(
+                or_(
+                    TestSession.test_ski_id.in_(self.ski_ids),
+                    TestSession.reference_ski_id.in_(self.ski_ids),
+                )
+            )
+        if self.tester_name is not None:
+            statement = statement.where(TestSession.tester_name == self.tester_name)
+        return statement
+
+
+@dataclass(frozen=True)
+class Page:
+    """One page of session history.
+
+    Attributes:
+        rows: Sessions on this page, most recent first
+        next_cursor: Cursor of the following page, None on the last page
+        total: Number of matching sessions if requested (estimated when
+            total_is_estimate is True)
+        total_is_estimate: Whether total comes from the query planner
+    """
+
+    rows: list[SessionRow] = field(default_factory=list)
+    next_cursor: str | None = None
+    total: int | None = None
+    total_is_estimate: bool = False
+
+
+def encode_cursor(row: SessionRow) -> str:
+    """Opaque cursor pointing just past row."""
+    payload = json.dumps([row.test_date.isoformat(), row.id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor from encode_cursor() into (test_date, id).
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        test_date, session_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(test_date), int(session_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from e
+
+
+def count_sessions(
+    db: Session, filters: SessionFilter, approximate: bool = False
+) -> tuple[int, bool]:
+    """Count the sessions matching filters.
+
+    With approximate=True on PostgreSQL, the planner's row estimate is used
+    instead of running COUNT(*), which has to visit every matching row. Other
+    backends have no usable estimate and always count exactly.
+
+    Args:
+        db: Database session
+        filters: Filter to count
+        approximate: Prefer the planner estimate
+
+    Returns:
+        Tuple of (count, whether it is an estimate)
+    """
+    statement = filters.apply(select(TestSession.id))
+    if approximate and db.get_bind().dialect.name == "postgresql":
+        compiled = statement.compile(
+            dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+        )
+        plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"]), True
+    count = db.scalar(select(func.count()).select_from(statement.subquery()))
+    return count, False
+
+
+def session_page(
+    db: Session,
+    filters: SessionFilter | None = None,
+    cursor: str | None = None,
+    page_size: int = 50,
+    with_total: bool = False,
+    approximate_total: bool = True,
+) -> Page:
+    """Fetch one page of session history, most recent first.
+
+    Args:
+        db: Database session
+        filters: Optional SessionFilter
+        cursor: next_cursor of the previous page, None for the first page
+        page_size: Maximum sessions per page
+        with_total: If True, also count the matching sessions
+        approximate_total: Use the planner's estimate for the total where
+            available (see count_sessions)
+
+    Returns:
+        Page
+
+    Raises:
+        ValueError: If page_size is not positive or the cursor is malformed
+
+    Example:
+        filters = SessionFilter(snow_moistures=("dry",), max_temperature=-5.0)
+        with get_db(readonly=True) as db:
+            page = session_page(db, filters)
+            next_page = session_page(db, filters, cursor=page.next_cursor)
+    """
+    if page_size < 1:
+        raise ValueError(f"page_size must be positive, got {page_size}")
+    filters = filters or SessionFilter()
+    statement = filters.apply(session_rows_statement())
+    if cursor is not None:
+        statement = statement.where(
+            tuple_(TestSession.test_date, TestSession.id) < tuple_(*decode_cursor(cursor))
+        )
+    # One extra row tells whether another page follows
+    rows = fetch_session_rows(db, statement.limit(page_size + 1))
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    total, estimated = (
+        count_sessions(db, filters, approximate_total) if with_total else (None, False)
+    )
+    return Page(rows[:page_size], next_cursor, total, estimated)
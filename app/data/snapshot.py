@@ -0,0 +1,464 @@
+"""Columnar in-memory snapshot of test_sessions, ski_models and wax_products.
+
+Each table is held as one NumPy array per column:
+
+    String columns      dictionary-encoded to the smallest signed int dtype,
+                        -1 for NULL (free-text Text columns are not included)
+    DateTime columns    int64 microseconds since the epoch, NaT (int64 min)
+                        for NULL; decode() returns datetime64[us]
+    Float columns       float64, NaN for NULL
+    Integer columns     int64, or float64 with NaN when nullable
+    Boolean columns     bool
+
+The whole snapshot is saved to a single file (SNAPSHOT_PATH) that loads
+memory-mapped, so processes share its pages and loading does not depend on
+its size. A snapshot is refreshed by fetching only sessions whose updated_at
+is at or after its watermark and upserting them by id; the small ski and wax
+catalogs are reloaded whole. Deleted sessions are only dropped by a full
+rebuild (build_snapshot(use_cache=False)).
+
+Example:
+    snapshot = build_snapshot()
+    sessions = snapshot.sessions
+    dry_cold = sessions.eq("snow_moisture", "dry") & (sessions["temperature"] < -5)
+    sessions.where(dry_cold).group_by(
+        ["test_wax_id"], n=("id", "count"), margin=("distance_between_skis", "mean")
+    )
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Boolean, DateTime, Float, Integer, String, Text, select
+from sqlalchemy.orm import Session
+
+from app.config import DATA_DIR
+from app.data.data_types import SkiModel, TestSession, WaxProduct
+from app.data.database.session import get_db
+
+SNAPSHOT_PATH = DATA_DIR / "snapshot.bin"
+FETCH_CHUNK_SIZE = 50_000
+
+# Snapshot table name -> ORM model
+TABLES = {"sessions": TestSession, "skis": SkiModel, "waxes": WaxProduct}
+
+_MAGIC = b"WAXSNAP1"
+_ALIGNMENT = 64
+_NAT = np.iinfo("int64").min
+_AGGREGATIONS = {"count", "sum", "mean", "min", "max"}
+
+
+def _column_kind(column) -> str | None:
+    """Storage kind of a table column, None for columns left out of snapshots."""
+    if isinstance(column.type, Text):
+        return None
+    if isinstance(column.type, String):
+        return "category"
+    if isinstance(column.type, DateTime):
+        return "datetime"
+    if isinstance(column.type, Boolean):
+        return "bool"
+    if isinstance(column.type, Float) or (isinstance(column.type, Integer) and column.nullable):
+        return "float"
+    if isinstance(column.type, Integer):
+        return "int"
+    raise ValueError(f"Unsupported column type for snapshots: {column.name} {column.type}")
+
+
+def table_kinds(model) -> dict[str, str]:
+    """Column name -> storage kind of the columns a snapshot keeps for model."""
+    kinds = {column.name: _column_kind(column) for column in model.__table__.columns}
+    return {name: kind for name, kind in kinds.items() if kind is not None}
+
+
+def _code_dtype(n_values: int) -> np.dtype:
+    """Smallest signed int dtype holding codes -1..n_values - 1."""
+    for dtype in ("int8", "int16", "int32"):
+        if n_values <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype("int64")
+
+
+def to_microseconds(value) -> np.ndarray:
+    """Convert datetimes (or array-likes of them) to int64 microseconds, NaT for NULL."""
+    return np.asarray(pd.to_datetime(value), dtype="datetime64[us]").view("int64")
+
+
+def _encode(values: list, kind: str, dictionary: list[str] | None = None) -> np.ndarray:
+    """Encode one fetched column; new category values are appended to dictionary."""
+    if kind == "category":
+        index = pd.Index(dictionary, dtype=object)
+        new = pd.unique(pd.Series(values, dtype=object).dropna())
+        dictionary.extend(value for value in new if value not in index)
+        codes = pd.Index(dictionary, dtype=object).get_indexer(values)
+        return codes.astype(_code_dtype(len(dictionary)))
+    if kind == "datetime":
+        return to_microseconds(list(values))
+    if kind == "float":
+        return np.array(values, dtype="float64")
+    return np.array(values, dtype="int64" if kind == "int" else "bool")
+
+
+@dataclass
+class Table:
+    """Columns of one table as NumPy arrays of equal length.
+
+    Attributes:
+        columns: Column name -> array
+        kinds: Column name -> storage kind (see module docstring)
+        dictionaries: Category column name -> values its codes index into
+    """
+
+    columns: dict[str, np.ndarray]
+    kinds: dict[str, str]
+    dictionaries: dict[str, list[str]] = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.columns["id"]) if "id" in self.columns else 0
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.columns.values())
+
+    def code(self, name: str, value: str | None) -> int:
+        """Code of a category value, -1 for NULL or values not in the dictionary."""
+        if value is None or value not in self.dictionaries[name]:
+            return -1
+        return self.dictionaries[name].index(value)
+
+    def _value(self, name: str, value):
+        kind = self.kinds[name]
+        if kind == "category":
+            return self.code(name, value)
+        if kind == "datetime":
+            return to_microseconds(value)
+        return value
+
+    def eq(self, name: str, value) -> np.ndarray:
+        """Boolean mask of rows where column name equals value (None matches NULL)."""
+        if value is None and self.kinds[name] == "float":
+            return np.isnan(self.columns[name])
+        return self.columns[name] == self._value(name, value)
+
+    def isin(self, name: str, values) -> np.ndarray:
+        """Boolean mask of rows where column name is one of values."""
+        return np.isin(self.columns[name], [self._value(name, value) for value in values])
+
+    def between(self, name: str, low=None, high=None) -> np.ndarray:
+        """Boolean mask of rows with low <= column <= high (either bound optional).
+
+        NULLs never match. Datetime bounds may be given as datetimes.
+        """
+        column = self.columns[name]
+        mask = column != _NAT if self.kinds[name] == "datetime" else np.ones(len(self), bool)
+        if low is not None:
+            mask &= column >= self._value(name, low)
+        if high is not None:
+            mask &= column <= self._value(name, high)
+        return mask
+
+    def where(self, mask: np.ndarray) -> "Table":
+        """Rows selected by a boolean mask (or an index array)."""
+        columns = {name: array[mask] for name, array in self.columns.items()}
+        return Table(columns, self.kinds, self.dictionaries)
+
+    def decode(self, name: str) -> np.ndarray:
+        """Column values in their natural type: strings (None for NULL) or datetime64[us]."""
+        kind = self.kinds[name]
+        if kind == "category":
+            values = np.array([*self.dictionaries[name], None], dtype=object)
+            return values[self.columns[name]]  # code -1 picks the trailing None
+        if kind == "datetime":
+            return self.columns[name].view("datetime64[us]")
+        return self.columns[name]
+
+    def to_pandas(self, columns: list[str] | None = None) -> pd.DataFrame:
+        """Decode columns (all by default) into a DataFrame."""
+        return pd.DataFrame({name: self.decode(name) for name in columns or self.columns})
+
+    def group_by(self, keys: list[str], **aggregations: tuple[str, str]) -> pd.DataFrame:
+        """Aggregate rows grouped by one or more columns.
+
+        Grouping works on the stored codes, so category keys cost the same as
+        integer keys. NULL keys form their own group; NaN values are ignored
+        by sum, mean, min and max.
+
+        Args:
+            keys: Columns to group by
+            **aggregations: Output name -> (column, function), function one of
+                count, sum, mean, min, max
+
+        Returns:
+            DataFrame with the decoded key columns and one column per
+            aggregation, one row per non-empty group
+
+        Raises:
+            ValueError: If an aggregation function is unknown
+        """
+        for column, function in aggregations.values():
+            if function not in _AGGREGATIONS:
+                raise ValueError(f"Unknown aggregation '{function}' for column '{column}'")
+
+        key_codes, key_values = [], []
+        for key in keys:
+            unique, inverse = np.unique(self.columns[key], return_inverse=True)
+            key_codes.append(inverse.ravel())
+            key_values.append(Table({key: unique}, self.kinds, self.dictionaries).decode(key))
+        shape = tuple(len(values) for values in key_values)
+        groups, inverse = np.unique(
+            np.ravel_multi_index(key_codes, shape) if keys else np.zeros(len(self), "int64"),
+            return_inverse=True,
+        )
+        inverse = inverse.ravel()
+        n_groups = len(groups)
+        result = {
+            key: values[index]
+            for key, values, index in zip(keys, key_values, np.unravel_index(groups, shape))
+        }
+
+        order = np.argsort(inverse, kind="stable")
+        starts = np.searchsorted(inverse[order], np.arange(n_groups))
+        for name, (column, function) in aggregations.items():
+            if function == "count":
+                result[name] = np.bincount(inverse, minlength=n_groups)
+                continue
+            values = self.columns[column].astype("float64")
+            valid = ~np.isnan(values)
+            if function in ("sum", "mean"):
+                total = np.bincount(
+                    inverse, weights=np.where(valid, values, 0), minlength=n_groups
+                )
+                if function == "mean":
+                    counts = np.bincount(inverse, weights=valid, minlength=n_groups)
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        total = total / counts
+                result[name] = total
+            else:
+                reduce = np.fmin if function == "min" else np.fmax
+                result[name] = reduce.reduceat(values[order], starts) if n_groups else values[:0]
+        return pd.DataFrame(result)
+
+
+def fetch_table(
+    db: Session,
+    model,
+    since: datetime | None = None,
+    dictionaries: dict[str, list[str]] | None = None,
+) -> Table:
+    """Fetch a table into columnar form in bounded chunks.
+
+    Args:
+        db: Database session
+        model: ORM model class (one of TABLES)
+        since: If given, only rows with updated_at >= since
+        dictionaries: Dictionaries to extend, so codes stay compatible with
+            an existing Table; new dictionaries are started otherwise
+
+    Returns:
+        Table sorted by id
+    """
+    kinds = table_kinds(model)
+    dictionaries = {
+        name: list((dictionaries or {}).get(name, []))
+        for name, kind in kinds.items()
+        if kind == "category"
+    }
+    table = model.__table__
+    statement = select(*[table.c[name] for name in kinds]).order_by(table.c.id)
+    if since is not None:
+        statement = statement.where(table.c.updated_at >= since)
+    statement = statement.execution_options(yield_per=FETCH_CHUNK_SIZE)
+
+    parts: dict[str, list[np.ndarray]] = {name: [] for name in kinds}
+    for rows in db.execute(statement).partitions():
+        for (name, kind), values in zip(kinds.items(), zip(*rows)):
+            parts[name].append(_encode(list(values), kind, dictionaries.get(name)))
+    columns = {
+        name: np.concatenate(arrays) if arrays else _encode([], kind, [])
+        for (name, kind), arrays in zip(kinds.items(), parts.values())
+    }
+    for name in dictionaries:
+        # Early chunks may use a smaller code dtype than later ones
+        columns[name] = columns[name].astype(_code_dtype(len(dictionaries[name])))
+    return Table(columns, kinds, dictionaries)
+
+
+def merge_tables(base: Table, update: Table) -> Table:
+    """Upsert update into base by id.
+
+    update must have been fetched with base's dictionaries (see fetch_table),
+    so that base's codes are a prefix of update's.
+
+    Returns:
+        Combined Table sorted by id
+    """
+    keep = ~np.isin(base["id"], update["id"])
+    ids = np.concatenate([base["id"][keep], update["id"]])
+    order = None if len(ids) < 2 or np.all(ids[1:] > ids[:-1]) else np.argsort(ids, kind="stable")
+    columns = {}
+    for name, array in base.columns.items():
+        merged = np.concatenate([array[keep], update[name]])
+        columns[name] = merged if order is None else merged[order]
+    return Table(columns, base.kinds, update.dictionaries)
+
+
+@dataclass
+class Snapshot:
+    """Columnar copy of the dataset.
+
+    Attributes:
+        sessions: test_sessions
+        skis: ski_models
+        waxes: wax_products
+        watermark: Largest test_sessions.updated_at included
+    """
+
+    sessions: Table
+    skis: Table
+    waxes: Table
+    watermark: datetime | None = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.sessions.nbytes + self.skis.nbytes + self.waxes.nbytes
+
+    def tables(self) -> dict[str, Table]:
+        return {name: getattr(self, name) for name in TABLES}
+
+
+def _watermark(sessions: Table, previous: datetime | None = None) -> datetime | None:
+    updated = sessions["updated_at"]
+    updated = updated[updated != _NAT]
+    if len(updated) == 0:
+        return previous
+    return pd.Timestamp(updated.max(), unit="us").to_pydatetime()
+
+
+def fetch_snapshot(db: Session) -> Snapshot:
+    """Load a fresh snapshot of every table from the database."""
+    tables = {name: fetch_table(db, model) for name, model in TABLES.items()}
+    return Snapshot(**tables, watermark=_watermark(tables["sessions"]))
+
+
+def refresh_snapshot(snapshot: Snapshot, db: Session) -> Snapshot:
+    """Bring a snapshot up to date with the database.
+
+    Sessions updated at or after the snapshot's watermark are fetched and
+    upserted by id; skis and waxes are reloaded.
+
+    Args:
+        snapshot: Existing snapshot (may be memory-mapped)
+        db: Database session
+
+    Returns:
+        New Snapshot; the input is not modified
+    """
+    update = fetch_table(db, TestSession, snapshot.watermark, snapshot.sessions.dictionaries)
+    return Snapshot(
+        sessions=merge_tables(snapshot.sessions, update),
+        skis=fetch_table(db, SkiModel),
+        waxes=fetch_table(db, WaxProduct),
+        watermark=_watermark(update, snapshot.watermark),
+    )
+
+
+def save_snapshot(snapshot: Snapshot, path: str | Path = SNAPSHOT_PATH):
+    """Write a snapshot to a single file.
+
+    Layout: magic, uint64 offset of a JSON header at the end of the file,
+    then every column array aligned to 64 bytes. The file is written under
+    a temporary name and moved into place.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    header = {
+        "watermark": snapshot.watermark.isoformat() if snapshot.watermark else None,
+        "tables": {},
+    }
+    with tmp_path.open("wb") as file:
+        file.write(_MAGIC + bytes(8))
+        for name, table in snapshot.tables().items():
+            arrays = {}
+            for column, array in table.columns.items():
+                file.write(bytes(-file.tell() % _ALIGNMENT))
+                arrays[column] = [array.dtype.str, file.tell(), len(array)]
+                file.write(np.ascontiguousarray(array).tobytes())
+            header["tables"][name] = {
+                "kinds": table.kinds,
+                "dictionaries": table.dictionaries,
+                "arrays": arrays,
+            }
+        header_offset = file.tell()
+        file.write(json.dumps(header).encode())
+        file.seek(len(_MAGIC))
+        file.write(header_offset.to_bytes(8, "little"))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str | Path = SNAPSHOT_PATH, mmap: bool = True) -> Snapshot | None:
+    """Load a saved snapshot.
+
+    Args:
+        path: Snapshot file
+        mmap: If True, memory-map the columns read-only instead of reading them
+
+    Returns:
+        Snapshot, or None if the file is missing or was written for another
+        table schema
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    with path.open("rb") as file:
+        if file.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        file.seek(int.from_bytes(file.read(8), "little"))
+        header = json.loads(file.read())
+
+    buffer = np.memmap(path, dtype="uint8", mode="r") if mmap else None
+    tables = {}
+    for name, model in TABLES.items():
+        spec = header["tables"].get(name)
+        if spec is None or spec["kinds"] != table_kinds(model):
+            return None
+        columns = {}
+        for column, (dtype, offset, length) in spec["arrays"].items():
+            if mmap:
+                columns[column] = np.frombuffer(buffer, dtype, count=length, offset=offset)
+            else:
+                columns[column] = np.fromfile(path, dtype, count=length, offset=offset)
+        tables[name] = Table(columns, spec["kinds"], spec["dictionaries"])
+    watermark = header["watermark"]
+    return Snapshot(**tables, watermark=datetime.fromisoformat(watermark) if watermark else None)
+
+
+def build_snapshot(
+    db: Session | None = None, path: str | Path = SNAPSHOT_PATH, use_cache: bool = True
+) -> Snapshot:
+    """Load the saved snapshot, refresh it from the database and save it back.
+
+    Args:
+        db: Optional database session (a read-only one is opened if not given)
+        path: Snapshot file
+        use_cache: If False, rebuild from scratch (the file is still rewritten)
+
+    Returns:
+        Up-to-date Snapshot
+    """
+    if db is None:
+        with get_db(readonly=True) as session:
+            return build_snapshot(session, path=path, use_cache=use_cache)
+
+    cached = load_snapshot(path) if use_cache else None
+    snapshot = fetch_snapshot(db) if cached is None else refresh_snapshot(cached, db)
+    save_snapshot(snapshot, path)
+    return snapshot
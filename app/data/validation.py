@@ -0,0 +1,220 @@
+"""Vectorized validation of test session data against the limits in app.config."""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from app.config import (
+    CONFIDENCE_RATING_MAX,
+    CONFIDENCE_RATING_MIN,
+    MAX_DISTANCE_BETWEEN_SKIS,
+    MAX_TEST_COURSE_LENGTH,
+    MIN_TEST_COURSE_LENGTH,
+)
+from app.data.conditions import CATEGORY_COLUMNS
+
+REQUIRED_COLUMNS = [
+    "test_date",
+    "location",
+    "temperature",
+    "snow_type",
+    "test_course_length",
+    "reference_ski_id",
+    "reference_wax_id",
+    "test_ski_id",
+    "test_wax_id",
+    "distance_between_skis",
+    "test_ski_won",
+]
+
+REPORT_COLUMNS = ["row", "column", "rule", "message"]
+
+# Accepted spellings of booleans in text input (compared lower-case)
+TRUE_VALUES = ["true", "t", "1", "1.0", "yes", "y"]
+FALSE_VALUES = ["false", "f", "0", "0.0", "no", "n"]
+
+
+@dataclass
+class ValidationReport:
+    """Result of validating a batch of test session rows.
+
+    Attributes:
+        errors: One row per violation with columns row, column, rule, message.
+            "row" holds the index label of the offending input row.
+        valid: Boolean mask aligned with the input, True for rows without errors
+    """
+
+    errors: pd.DataFrame
+    valid: pd.Series
+
+    @property
+    def is_valid(self) -> bool:
+        return self.errors.empty
+
+    @property
+    def n_invalid(self) -> int:
+        return int((~self.valid).sum())
+
+    def per_row(self) -> pd.Series:
+        """Return the error messages of each invalid row joined into one string."""
+        return self.errors.groupby("row", sort=False)["message"].agg("; ".join)
+
+    def summary(self) -> pd.Series:
+        """Return the number of violations per rule."""
+        return self.errors.groupby("rule")["row"].count().sort_values(ascending=False)
+
+
+def _numeric(frame: pd.DataFrame, column: str) -> np.ndarray:
+    return pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype="float64")
+
+
+def parse_bool(values: pd.Series) -> pd.Series:
+    """Parse booleans given as bools, 0/1 numbers or strings such as "False" or "yes".
+
+    Args:
+        values: Column to parse
+
+    Returns:
+        Nullable "boolean" Series; missing and unrecognized values are <NA>
+    """
+    if pd.api.types.is_bool_dtype(values):
+        return values.astype("boolean")
+    text = values.astype("string").str.strip().str.lower()
+    parsed = pd.Series(pd.NA, index=values.index, dtype="boolean")
+    parsed[text.isin(TRUE_VALUES).fillna(False).to_numpy(dtype=bool)] = True
+    parsed[text.isin(FALSE_VALUES).fillna(False).to_numpy(dtype=bool)] = False
+    return parsed
+
+
+def _check_range(
+    frame: pd.DataFrame, column: str, low: float | None, high: float | None
+) -> np.ndarray:
+    """Mask of non-null values that are non-numeric or outside [low, high]."""
+    values = _numeric(frame, column)
+    present = frame[column].notna().to_numpy()
+    bad = present & np.isnan(values)
+    with np.errstate(invalid="ignore"):
+        if low is not None:
+            bad |= values < low
+        if high is not None:
+            bad |= values > high
+    return bad
+
+
+def validate_test_sessions(frame: pd.DataFrame) -> ValidationReport:
+    """Validate a batch of candidate test session rows.
+
+    All checks run as column-wise NumPy/pandas operations over the whole batch,
+    so validating millions of rows takes seconds. Columns missing from the
+    frame are only reported when they are required.
+
+    Args:
+        frame: DataFrame with one candidate TestSession per row, using the
+            test_sessions column names
+
+    Returns:
+        ValidationReport with the per-row violations and a validity mask
+    """
+    n = len(frame)
+    index = frame.index.to_numpy()
+    violations: list[pd.DataFrame] = []
+    # Tracked by position, so duplicate index labels do not share a verdict
+    invalid = np.zeros(n, dtype=bool)
+
+    def report(mask: np.ndarray, column: str, rule: str, message: str):
+        invalid[mask] = True
+        rows = np.flatnonzero(mask)
+        if rows.size:
+            violations.append(
+                pd.DataFrame(
+                    {
+                        "row": index[rows],
+                        "column": column,
+                        "rule": rule,
+                        "message": message,
+                    }
+                )
+            )
+
+    for column in REQUIRED_COLUMNS:
+        if column not in frame.columns:
+            report(np.ones(n, dtype=bool), column, "missing_column", f"{column} is missing")
+        else:
+            report(frame[column].isna().to_numpy(), column, "required", f"{column} is required")
+
+    if "distance_between_skis" in frame.columns:
+        report(
+            _check_range(
+                frame,
+                "distance_between_skis",
+                -MAX_DISTANCE_BETWEEN_SKIS,
+                MAX_DISTANCE_BETWEEN_SKIS,
+            ),
+            "distance_between_skis",
+            "distance_range",
+            f"|distance_between_skis| must be <= {MAX_DISTANCE_BETWEEN_SKIS} m",
+        )
+
+    if "test_course_length" in frame.columns:
+        report(
+            _check_range(
+                frame, "test_course_length", MIN_TEST_COURSE_LENGTH, MAX_TEST_COURSE_LENGTH
+            ),
+            "test_course_length",
+            "course_length_range",
+            f"test_course_length must be between {MIN_TEST_COURSE_LENGTH} "
+            f"and {MAX_TEST_COURSE_LENGTH} m",
+        )
+
+    if "confidence_rating" in frame.columns:
+        rating = _numeric(frame, "confidence_rating")
+        bad = _check_range(
+            frame, "confidence_rating", CONFIDENCE_RATING_MIN, CONFIDENCE_RATING_MAX
+        )
+        with np.errstate(invalid="ignore"):
+            bad |= ~np.isnan(rating) & (rating != np.round(rating))
+        report(
+            bad,
+            "confidence_rating",
+            "confidence_range",
+            f"confidence_rating must be an integer from {CONFIDENCE_RATING_MIN} "
+            f"to {CONFIDENCE_RATING_MAX}",
+        )
+
+    # Nulls are allowed in categorical columns unless the column is required
+    for column, categories in CATEGORY_COLUMNS.items():
+        if column not in frame.columns:
+            continue
+        values = frame[column]
+        bad = values.notna().to_numpy() & ~values.isin(categories).to_numpy()
+        report(bad, column, "category", f"{column} must be one of {categories}")
+
+    if "test_ski_won" in frame.columns:
+        won = parse_bool(frame["test_ski_won"])
+        report(
+            frame["test_ski_won"].notna().to_numpy() & won.isna().to_numpy(),
+            "test_ski_won",
+            "boolean",
+            f"test_ski_won must be one of {TRUE_VALUES + FALSE_VALUES}",
+        )
+
+    if "distance_between_skis" in frame.columns and "test_ski_won" in frame.columns:
+        distance = _numeric(frame, "distance_between_skis")
+        known = won.notna().to_numpy()
+        won = won.fillna(False).to_numpy(dtype=bool)
+        inconsistent = known & (((distance > 0) & ~won) | ((distance < 0) & won))
+        report(
+            inconsistent,
+            "test_ski_won",
+            "winner_consistency",
+            "test_ski_won does not match the sign of distance_between_skis",
+        )
+
+    errors = (
+        pd.concat(violations, ignore_index=True)
+        if violations
+        else pd.DataFrame({c: pd.Series(dtype=object) for c in REPORT_COLUMNS})
+    )
+    valid = pd.Series(~invalid, index=frame.index)
+    return ValidationReport(errors=errors, valid=valid)
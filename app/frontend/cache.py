@@ -0,0 +1,184 @@
+"""Result cache for the Streamlit frontend.
+
+Page reruns call the same queries over and over. ResultCache memoizes their
+results in an LRU bounded by an estimated size in bytes. Entries are keyed
+by the query spec plus app.data.data_version.data_version(), which commits
+through get_db() increment whenever they change test_sessions, wax_products
+or ski_models. Reads are therefore served from memory until the data
+actually changes, and the first read after a write misses and refreshes.
+
+Cached results are shared between reruns and users: treat them as
+read-only.
+
+Example:
+    @cached
+    def wax_catalog() -> pd.DataFrame:
+        with get_db(readonly=True) as db:
+            return pd.read_sql(select(WaxProduct), db.connection())
+"""
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+import functools
+import pickle
+import sys
+import threading
+from typing import Any
+
+from app.config import FRONTEND_CACHE_MAX_BYTES
+from app.data.data_version import data_version
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory footprint of a cached result in bytes."""
+    # Values can only be frames or arrays if their library was imported already
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(value, np.ndarray):
+        return value.nbytes
+    try:
+        # Pickled size tracks the payload of nested containers and dataclasses
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return sys.getsizeof(value)
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """Counters of a ResultCache.
+
+    Attributes:
+        hits: Lookups served from the cache
+        misses: Lookups that had to compute the result
+        evictions: Entries dropped to stay within max_bytes
+        invalidations: Entries dropped because the data version changed
+        entries: Entries currently held
+        size_bytes: Estimated size of the entries currently held
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    entries: int
+    size_bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResultCache:
+    """Thread-safe LRU of query results with size-based eviction."""
+
+    def __init__(self, max_bytes: int = FRONTEND_CACHE_MAX_BYTES):
+        """
+        Args:
+            max_bytes: Budget for the estimated size of all entries; results
+                larger than this are returned but not cached
+        """
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[Hashable, int], tuple[Any, int]] = OrderedDict()
+        self._size = 0
+        self._version = data_version()
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = self._invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _sync_version(self, version: int):
+        """Drop every entry once the data version moved on (they can no longer hit)."""
+        if version != self._version:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+            self._size = 0
+            self._version = version
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached result for key, computing and storing it on a miss.
+
+        Args:
+            key: Hashable query spec
+            compute: Zero-argument function producing the result
+
+        Returns:
+            Result of compute() for the current data version
+        """
+        version = data_version()
+        with self._lock:
+            self._sync_version(version)
+            entry = self._entries.get((key, version))
+            if entry is not None:
+                self._entries.move_to_end((key, version))
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        # Computed outside the lock so slow queries do not block cache hits
+        value = compute()
+        size = estimate_size(value)
+        with self._lock:
+            # A write committed while computing may not be reflected in value
+            if data_version() != version or size > self.max_bytes:
+                return value
+            self._sync_version(version)
+            previous = self._entries.pop((key, version), None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[(key, version)] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self._evictions += 1
+        return value
+
+    def clear(self):
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                invalidations=self._invalidations,
+                entries=len(self._entries),
+                size_bytes=self._size,
+            )
+
+
+# Global frontend cache (lazy loaded)
+_cache: ResultCache | None = None
+
+
+def get_cache() -> ResultCache:
+    """Get or create the global frontend result cache."""
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
+
+
+def cached(func: Callable) -> Callable:
+    """Memoize a query function in the global cache.
+
+    The key is the function plus its arguments, which must be hashable
+    (use tuples and frozen dataclasses such as SessionFilter).
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+        return get_cache().get_or_compute(key, lambda: func(*args, **kwargs))
+
+    return wrapper
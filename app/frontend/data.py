@@ -0,0 +1,50 @@
+"""Cached data access for frontend pages.
+
+Every function opens its own read-only session and is memoized in the
+global ResultCache (see cache.py) until the next write to the dataset.
+"""
+
+import pandas as pd
+from sqlalchemy import select
+
+from app.data.aggregates import wax_condition_summary
+from app.data.data_types import SkiModel, WaxProduct
+from app.data.database.session import get_db
+from app.data.repository import Page, SessionFilter, session_page
+from app.frontend.cache import cached
+
+
+@cached
+def wax_catalog() -> pd.DataFrame:
+    """All wax products, ordered by brand and name."""
+    statement = select(WaxProduct.__table__).order_by(WaxProduct.brand, WaxProduct.product_name)
+    with get_db(readonly=True) as db:
+        return pd.read_sql(statement, db.connection())
+
+
+@cached
+def ski_catalog() -> pd.DataFrame:
+    """All ski models, ordered by brand and model."""
+    statement = select(SkiModel.__table__).order_by(SkiModel.brand, SkiModel.model)
+    with get_db(readonly=True) as db:
+        return pd.read_sql(statement, db.connection())
+
+
+@cached
+def history_page(
+    filters: SessionFilter | None = None, cursor: str | None = None, page_size: int = 50
+) -> Page:
+    """One page of test session history (see repository.session_page)."""
+    with get_db(readonly=True) as db:
+        return session_page(db, filters, cursor=cursor, page_size=page_size, with_total=True)
+
+
+@cached
+def condition_summary(
+    temperature: float | None = None,
+    snow_type: str | None = None,
+    snow_moisture: str | None = None,
+) -> pd.DataFrame:
+    """Per-wax results in the given conditions (see aggregates.wax_condition_summary)."""
+    with get_db(readonly=True) as db:
+        return wax_condition_summary(db, temperature, snow_type, snow_moisture)
@@ -0,0 +1,273 @@
+"""Versioned model artifacts in MODELS_DIR.
+
+Each version is a directory of .npy arrays plus a meta.json, named by a hash
+of the training data snapshot and the model-relevant config constants:
+
+    MODELS_DIR/
+        LATEST                  # Name of the promoted version
+        3f9c0a1b2d4e5f60/
+            meta.json           # Feature schema, metrics, arbitrary metadata
+            winner_coef.npy
+            ...
+
+Versions are written to a temporary directory and renamed into place, and
+LATEST is replaced atomically, so readers never see a partial artifact.
+Arrays are loaded memory-mapped: processes serving the same version share
+the pages, and loading does not depend on array size.
+
+This module only needs numpy, so inference processes can load models
+without importing scikit-learn, pandas or SQLAlchemy.
+"""
+
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+import numpy as np
+
+from app import config
+
+LATEST_FILE = "LATEST"
+META_FILE = "meta.json"
+
+# app.config constants that change what a trained model means
+VERSIONED_CONFIG = [
+    "RANDOM_SEED",
+    "TEST_SIZE",
+    "VALIDATION_SIZE",
+    "TEMPERATURE_BINS",
+    "SNOW_TYPE_CATEGORIES",
+    "SNOW_MOISTURE_CATEGORIES",
+    "TRACK_CONDITION_CATEGORIES",
+    "PRECIPITATION_CATEGORIES",
+    "COURSE_PROFILE_CATEGORIES",
+    "MAX_DISTANCE_BETWEEN_SKIS",
+    "MIN_TEST_COURSE_LENGTH",
+    "MAX_TEST_COURSE_LENGTH",
+]
+
+
+def artifact_version(
+    data_arrays: list[np.ndarray], data_metadata: dict | None = None, extra: dict | None = None
+) -> str:
+    """Derive a version key from a training data snapshot and the config.
+
+    Args:
+        data_arrays: Arrays identifying the snapshot, e.g. session ids and labels
+        data_metadata: JSON-serializable description of the snapshot
+            (feature schema, watermark, ...)
+        extra: Further JSON-serializable inputs, e.g. hyperparameter grids
+
+    Returns:
+        16 hex character version key
+    """
+    digest = hashlib.sha256()
+    for array in data_arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.data)
+    settings = {name: getattr(config, name) for name in VERSIONED_CONFIG}
+    digest.update(
+        json.dumps([data_metadata, settings, extra], sort_keys=True, default=str).encode()
+    )
+    return digest.hexdigest()[:16]
+
+
+@dataclass
+class Artifact:
+    """A loaded model version.
+
+    Attributes:
+        version: Version key
+        arrays: Name -> array (memory-mapped, read-only when loaded from disk)
+        metadata: Contents of meta.json
+    """
+
+    version: str
+    arrays: dict[str, np.ndarray]
+    metadata: dict
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+
+class ArtifactStore:
+    """Directory of model versions with an atomically promoted LATEST pointer."""
+
+    def __init__(self, root: str | Path = config.MODELS_DIR):
+        self.root = Path(root)
+
+    def path(self, version: str) -> Path:
+        return self.root / version
+
+    def versions(self) -> list[str]:
+        """All complete versions, oldest first."""
+        if not self.root.exists():
+            return []
+        versions = [p for p in self.root.iterdir() if (p / META_FILE).exists()]
+        return [p.name for p in sorted(versions, key=lambda p: (p / META_FILE).stat().st_mtime)]
+
+    def exists(self, version: str) -> bool:
+        return (self.path(version) / META_FILE).exists()
+
+    def save(
+        self, version: str, arrays: dict[str, np.ndarray], metadata: dict, promote: bool = False
+    ) -> Path:
+        """Write a version, replacing nothing if it already exists.
+
+        Args:
+            version: Version key, e.g. from artifact_version()
+            arrays: Name -> numpy array; names must be valid file names
+            metadata: JSON-serializable metadata (feature schema, metrics, ...)
+            promote: If True, point LATEST at this version afterwards
+
+        Returns:
+            Directory of the version
+        """
+        target = self.path(version)
+        if not self.exists(version):
+            self.root.mkdir(parents=True, exist_ok=True)
+            staging = Path(tempfile.mkdtemp(prefix=f".{version}.", dir=self.root))
+            try:
+                for name, array in arrays.items():
+                    np.save(staging / f"{name}.npy", np.ascontiguousarray(array))
+                meta = {"version": version, "arrays": sorted(arrays), **metadata}
+                (staging / META_FILE).write_text(json.dumps(meta, indent=2, default=str))
+                os.replace(staging, target)
+            except OSError:
+                # Another process published the same version first
+                shutil.rmtree(staging, ignore_errors=True)
+                if not self.exists(version):
+                    raise
+        if promote:
+            self.promote(version)
+        return target
+
+    def promote(self, version: str):
+        """Atomically point LATEST at version.
+
+        Raises:
+            ValueError: If the version does not exist
+        """
+        if not self.exists(version):
+            raise ValueError(f"Model version '{version}' not found in {self.root}")
+        tmp_path = self.root / f".{LATEST_FILE}.{os.getpid()}.tmp"
+        tmp_path.write_text(version)
+        os.replace(tmp_path, self.root / LATEST_FILE)
+
+    def delete(self, version: str):
+        """Remove a version that is not promoted.
+
+        Processes that already memory-mapped its arrays keep reading them.
+
+        Raises:
+            ValueError: If the version is the promoted one
+        """
+        if version == self.latest():
+            raise ValueError(f"Model version '{version}' is promoted and cannot be deleted")
+        shutil.rmtree(self.path(version), ignore_errors=True)
+
+    def latest(self) -> str | None:
+        """Version LATEST points at, or None if nothing was promoted."""
+        try:
+            return (self.root / LATEST_FILE).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def load(self, version: str | None = None, mmap: bool = True) -> Artifact:
+        """Load a version (LATEST by default).
+
+        Args:
+            version: Version key, or None for the promoted version
+            mmap: If True, memory-map arrays read-only instead of reading them
+
+        Returns:
+            Artifact
+
+        Raises:
+            ValueError: If no version is given and none was promoted, or the
+                version does not exist
+        """
+        version = version or self.latest()
+        if version is None:
+            raise ValueError(f"No promoted model in {self.root}; train with --promote first")
+        if not self.exists(version):
+            raise ValueError(f"Model version '{version}' not found in {self.root}")
+        path = self.path(version)
+        metadata = json.loads((path / META_FILE).read_text())
+        arrays = {
+            name: np.load(path / f"{name}.npy", mmap_mode="r" if mmap else None)
+            for name in metadata["arrays"]
+        }
+        return Artifact(version=version, arrays=arrays, metadata=metadata)
+
+
+@dataclass
+class LinearModel:
+    """Linear model with its input standardization folded into the weights.
+
+    decision(X) = X @ coef + intercept, equal to the fitted scaler + estimator.
+    """
+
+    coef: np.ndarray
+    intercept: float
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "LinearModel":
+        """Convert a fitted StandardScaler + linear estimator pipeline."""
+        scaler, estimator = pipeline[0], pipeline[-1]
+        coef = np.ravel(estimator.coef_) / scaler.scale_
+        intercept = float(np.ravel(estimator.intercept_)[0] - scaler.mean_ @ coef)
+        return cls(coef=coef.astype("float32"), intercept=intercept)
+
+    def decision(self, X: np.ndarray) -> np.ndarray:
+        return X @ self.coef + self.intercept
+
+    def probability(self, X: np.ndarray) -> np.ndarray:
+        """Logistic link of decision(), for log-loss classifiers."""
+        return 1.0 / (1.0 + np.exp(-self.decision(X)))
+
+
+@dataclass
+class WaxModels:
+    """Winner classifier and margin regressor of one artifact version."""
+
+    version: str
+    feature_names: list[str]
+    winner: LinearModel
+    margin: LinearModel
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        return {
+            "winner_coef": self.winner.coef,
+            "winner_intercept": np.array([self.winner.intercept]),
+            "margin_coef": self.margin.coef,
+            "margin_intercept": np.array([self.margin.intercept]),
+        }
+
+    @classmethod
+    def from_artifact(cls, artifact: Artifact) -> "WaxModels":
+        return cls(
+            version=artifact.version,
+            feature_names=artifact.metadata["feature_names"],
+            winner=LinearModel(artifact["winner_coef"], float(artifact["winner_intercept"][0])),
+            margin=LinearModel(artifact["margin_coef"], float(artifact["margin_intercept"][0])),
+        )
+
+
+def load_models(version: str | None = None, store: ArtifactStore | None = None) -> WaxModels:
+    """Load the promoted (or a given) model version for inference.
+
+    Args:
+        version: Version key, or None for LATEST
+        store: Artifact store (defaults to MODELS_DIR)
+
+    Returns:
+        WaxModels
+    """
+    store = store or ArtifactStore()
+    return WaxModels.from_artifact(store.load(version))
@@ -0,0 +1,407 @@
+"""Bootstrap confidence intervals of per-wax results in a condition bucket.
+
+The sessions of a bucket (temperature bin x snow_moisture, see
+ratings.condition_buckets) are resampled with replacement. Every resample
+yields each wax's confidence-weighted win probability and mean margin
+(distance_between_skis from the wax's side), and percentiles over the
+resamples give the intervals.
+
+Resamples are drawn in batches as index matrices: a batch of b resamples of
+n sessions is one (b, n) array of session indices, bincounted into per-
+session draw counts. Per-wax sums then come from a single sparse product of
+a (3 * n_waxes, n) contribution matrix with the (n, b) count matrix, so no
+Python loop runs per resample or per session. Batches get child seeds of
+one SeedSequence, which makes results independent of the worker count.
+Buckets of at least BOOTSTRAP_PARALLEL_MIN_SESSIONS sessions spread their
+batches over a process pool.
+
+Results are cached on disk under DATA_DIR, keyed on the bucket, the
+resampling parameters and a watermark (count, max id and max updated_at) of
+the bucket's sessions, so a cached interval is reused until they change.
+
+Usage:
+    python -m app.models.bootstrap --temperature -5 [--snow-moisture dry]
+        [--resamples N] [--workers N] [--no-cache]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import (
+    BOOTSTRAP_CONFIDENCE_LEVEL,
+    BOOTSTRAP_PARALLEL_MIN_SESSIONS,
+    BOOTSTRAP_RESAMPLES,
+    DATA_DIR,
+    RANDOM_SEED,
+)
+from app.data.data_types import TestSession
+from app.data.database.session import get_db
+from app.models.ratings import Comparisons, bucket_filter, condition_buckets, load_comparisons
+
+BOOTSTRAP_CACHE_DIR = DATA_DIR / "bootstrap"
+
+# Upper bound on resamples x sessions drawn at once (about 64 MB of indices)
+BATCH_ELEMENTS = 8_000_000
+
+# WaxIntervals attributes stored as arrays by save()
+_ARRAY_FIELDS = [
+    "wax_ids",
+    "tests",
+    "win_probability",
+    "win_low",
+    "win_high",
+    "margin",
+    "margin_low",
+    "margin_high",
+]
+
+
+@dataclass
+class WaxIntervals:
+    """Per-wax point estimates and bootstrap percentile intervals.
+
+    Attributes:
+        bucket: Condition bucket index
+        watermark: Watermark of the bucket's sessions when computed
+        n_sessions: Sessions in the bucket
+        n_resamples: Bootstrap resamples drawn
+        level: Coverage of the intervals, e.g. 0.95
+        wax_ids: Waxes appearing in the bucket (ascending)
+        tests: Sessions per wax
+        win_probability: Confidence-weighted share of won tests per wax
+        win_low, win_high: Interval bounds of win_probability
+        margin: Confidence-weighted mean margin per wax (meters, + = ahead)
+        margin_low, margin_high: Interval bounds of margin
+    """
+
+    bucket: int
+    watermark: str
+    n_sessions: int
+    n_resamples: int
+    level: float
+    wax_ids: np.ndarray
+    tests: np.ndarray
+    win_probability: np.ndarray
+    win_low: np.ndarray
+    win_high: np.ndarray
+    margin: np.ndarray
+    margin_low: np.ndarray
+    margin_high: np.ndarray
+
+    def __len__(self):
+        return len(self.wax_ids)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Intervals as a DataFrame indexed by wax_id, best waxes first."""
+        frame = pd.DataFrame(
+            {
+                "tests": self.tests,
+                "win_probability": self.win_probability,
+                "win_low": self.win_low,
+                "win_high": self.win_high,
+                "margin": self.margin,
+                "margin_low": self.margin_low,
+                "margin_high": self.margin_high,
+            },
+            index=pd.Index(self.wax_ids, name="wax_id"),
+        )
+        return frame.sort_values(["win_low", "win_probability"], ascending=False)
+
+    def save(self, path: str | Path):
+        """Save the intervals to an .npz file (written to a temporary file first)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.stem}.tmp.npz")
+        meta = [self.bucket, self.watermark, self.n_sessions, self.n_resamples, self.level]
+        np.savez(
+            tmp_path,
+            meta=np.array(json.dumps(meta)),
+            **{name: getattr(self, name) for name in _ARRAY_FIELDS},
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "WaxIntervals":
+        """Load intervals saved with save()."""
+        with np.load(path) as data:
+            bucket, watermark, n_sessions, n_resamples, level = json.loads(str(data["meta"]))
+            return cls(
+                bucket=bucket,
+                watermark=watermark,
+                n_sessions=n_sessions,
+                n_resamples=n_resamples,
+                level=level,
+                **{name: data[name] for name in _ARRAY_FIELDS},
+            )
+
+
+def contribution_matrix(comparisons: Comparisons) -> tuple[np.ndarray, sparse.csr_matrix]:
+    """Map sessions to the per-wax sums the statistics are ratios of.
+
+    Args:
+        comparisons: Sessions of one bucket
+
+    Returns:
+        Tuple of (wax_ids, matrix) where matrix is float32 with shape
+        (len(comparisons), 3 * len(wax_ids)); its column blocks hold each
+        session's weight, weighted win and weighted margin for its test and
+        reference wax
+    """
+    wax_ids, position = np.unique(
+        np.concatenate([comparisons.test_wax, comparisons.reference_wax]), return_inverse=True
+    )
+    n_waxes, n = len(wax_ids), len(comparisons)
+    weight = comparisons.weight
+    won = comparisons.test_won
+    # The reference wax sees the mirror image of the test wax's result
+    values = np.concatenate(
+        [
+            weight,
+            weight,
+            weight * won,
+            weight * (1 - won),
+            weight * comparisons.margin,
+            -weight * comparisons.margin,
+        ]
+    )
+    rows = np.tile(np.arange(n), 6)
+    columns = np.concatenate([position, position + n_waxes, position + 2 * n_waxes])
+    matrix = sparse.csr_matrix((values, (rows, columns)), shape=(n, 3 * n_waxes), dtype="float32")
+    return wax_ids, matrix
+
+
+def _ratios(sums: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Win probabilities and mean margins from per-wax sums stacked on the last axis."""
+    weight, wins, margins = np.split(sums, 3, axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return wins / weight, margins / weight
+
+
+def resample_batch(
+    matrix: sparse.csr_matrix, n_resamples: int, seed: np.random.SeedSequence
+) -> tuple[np.ndarray, np.ndarray]:
+    """Statistics of one batch of bootstrap resamples.
+
+    Args:
+        matrix: Contribution matrix from contribution_matrix()
+        n_resamples: Resamples in the batch
+        seed: Seed of the batch
+
+    Returns:
+        Tuple of (win probabilities, mean margins), each of shape
+        (n_resamples, n_waxes); NaN where a wax was not drawn
+    """
+    n = matrix.shape[0]
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, n, size=(n_resamples, n))
+    # Offsetting each row by resample * n lets one bincount count the draws of
+    # every (resample, session); each row's counts stay within a cache-sized block
+    indices += np.arange(0, n_resamples * n, n)[:, None]
+    counts = np.bincount(indices.ravel(), minlength=n_resamples * n).reshape(n_resamples, n)
+    return _ratios(counts.astype("float32") @ matrix)
+
+
+# Contribution matrix of the current worker process, set by _init_worker
+_worker_matrix: sparse.csr_matrix | None = None
+
+
+def _init_worker(matrix: sparse.csr_matrix):
+    global _worker_matrix
+    _worker_matrix = matrix
+
+
+def _resample_worker(n_resamples: int, seed: np.random.SeedSequence):
+    return resample_batch(_worker_matrix, n_resamples, seed)
+
+
+def bootstrap_intervals(
+    comparisons: Comparisons,
+    n_resamples: int = BOOTSTRAP_RESAMPLES,
+    level: float = BOOTSTRAP_CONFIDENCE_LEVEL,
+    seed: int = RANDOM_SEED,
+    max_workers: int | None = None,
+    bucket: int = -1,
+    watermark: str = "",
+) -> WaxIntervals:
+    """Bootstrap the per-wax statistics of a set of sessions.
+
+    Args:
+        comparisons: Sessions to resample (usually one condition bucket)
+        n_resamples: Number of bootstrap resamples
+        level: Coverage of the percentile intervals
+        seed: Random seed; equal seeds give equal intervals for any max_workers
+        max_workers: Process pool size for buckets of at least
+            BOOTSTRAP_PARALLEL_MIN_SESSIONS sessions (defaults to the number of
+            CPUs; 1 always resamples in this process)
+        bucket: Bucket index recorded in the result
+        watermark: Data watermark recorded in the result
+
+    Returns:
+        WaxIntervals
+
+    Raises:
+        ValueError: If comparisons is empty or level is not in (0, 1)
+    """
+    if not len(comparisons):
+        raise ValueError("No test sessions in these conditions")
+    if not 0 < level < 1:
+        raise ValueError(f"Confidence level must be between 0 and 1, got {level}")
+
+    wax_ids, matrix = contribution_matrix(comparisons)
+    n = len(comparisons)
+    batch_size = max(1, min(n_resamples, BATCH_ELEMENTS // n))
+    sizes = [min(batch_size, n_resamples - start) for start in range(0, n_resamples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    workers = max_workers or os.cpu_count() or 1
+    if n >= BOOTSTRAP_PARALLEL_MIN_SESSIONS and workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(sizes)), initializer=_init_worker, initargs=(matrix,)
+        ) as pool:
+            batches = list(pool.map(_resample_worker, sizes, seeds))
+    else:
+        batches = [resample_batch(matrix, size, s) for size, s in zip(sizes, seeds)]
+
+    win = np.concatenate([batch[0] for batch in batches])
+    margin = np.concatenate([batch[1] for batch in batches])
+    quantiles = [(1 - level) / 2 * 100, (1 + level) / 2 * 100]
+    win_low, win_high = np.nanpercentile(win, quantiles, axis=0)
+    margin_low, margin_high = np.nanpercentile(margin, quantiles, axis=0)
+
+    point_win, point_margin = _ratios(np.ones(n) @ matrix)
+    tests = np.bincount(
+        np.searchsorted(
+            wax_ids, np.concatenate([comparisons.test_wax, comparisons.reference_wax])
+        ),
+        minlength=len(wax_ids),
+    )
+    return WaxIntervals(
+        bucket=bucket,
+        watermark=watermark,
+        n_sessions=n,
+        n_resamples=n_resamples,
+        level=level,
+        wax_ids=wax_ids,
+        tests=tests,
+        win_probability=point_win,
+        win_low=win_low,
+        win_high=win_high,
+        margin=point_margin,
+        margin_low=margin_low,
+        margin_high=margin_high,
+    )
+
+
+def bucket_watermark(db: Session, bucket: int) -> str:
+    """Summary of the sessions that can fall into a bucket; changes with any write to them."""
+    statement = select(
+        func.count(), func.max(TestSession.id), func.max(TestSession.updated_at)
+    ).where(*bucket_filter(bucket))
+    count, max_id, max_updated = db.execute(statement).one()
+    return f"{count}:{max_id}:{max_updated.isoformat() if max_updated else None}"
+
+
+def cache_path(bucket: int, watermark: str, n_resamples: int, level: float, seed: int) -> Path:
+    """On-disk cache file of one bucket's intervals."""
+    key = json.dumps([bucket, watermark, n_resamples, level, seed])
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return BOOTSTRAP_CACHE_DIR / f"bucket-{bucket}-{digest}.npz"
+
+
+def bucket_intervals(
+    db: Session,
+    temperature: float,
+    snow_moisture: str | None = None,
+    n_resamples: int = BOOTSTRAP_RESAMPLES,
+    level: float = BOOTSTRAP_CONFIDENCE_LEVEL,
+    seed: int = RANDOM_SEED,
+    max_workers: int | None = None,
+    use_cache: bool = True,
+) -> WaxIntervals:
+    """Bootstrap intervals for the condition bucket of the given conditions.
+
+    Args:
+        db: Database session
+        temperature: Air temperature (Celsius)
+        snow_moisture: Snow moisture category (None for sessions without one)
+        n_resamples: Number of bootstrap resamples
+        level: Coverage of the percentile intervals
+        seed: Random seed
+        max_workers: Process pool size for large buckets (see bootstrap_intervals)
+        use_cache: If True, reuse intervals cached for the current watermark
+
+    Returns:
+        WaxIntervals
+
+    Raises:
+        ValueError: If the bucket has no test sessions
+    """
+    bucket = int(condition_buckets([temperature], [snow_moisture])[0])
+    watermark = bucket_watermark(db, bucket)
+    path = cache_path(bucket, watermark, n_resamples, level, seed)
+    if use_cache and path.exists():
+        return WaxIntervals.load(path)
+
+    intervals = bootstrap_intervals(
+        load_comparisons(db, bucket=bucket),
+        n_resamples=n_resamples,
+        level=level,
+        seed=seed,
+        max_workers=max_workers,
+        bucket=bucket,
+        watermark=watermark,
+    )
+    if use_cache:
+        for stale in BOOTSTRAP_CACHE_DIR.glob(f"bucket-{bucket}-*.npz"):
+            stale.unlink()
+        intervals.save(path)
+    return intervals
+
+
+def main():
+    """CLI entry point: print bootstrap intervals for one set of conditions."""
+    parser = argparse.ArgumentParser(description="Bootstrap wax confidence intervals")
+    parser.add_argument("--temperature", type=float, required=True, help="Air temperature (C)")
+    parser.add_argument("--snow-moisture", help="Snow moisture category")
+    parser.add_argument(
+        "--resamples", type=int, default=BOOTSTRAP_RESAMPLES, help="Bootstrap resamples"
+    )
+    parser.add_argument("--workers", type=int, help="Process pool size for large buckets")
+    parser.add_argument("--top", type=int, default=10, help="Waxes to show")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached intervals")
+    args = parser.parse_args()
+
+    try:
+        with get_db(readonly=True) as db:
+            intervals = bucket_intervals(
+                db,
+                args.temperature,
+                args.snow_moisture,
+                n_resamples=args.resamples,
+                max_workers=args.workers,
+                use_cache=not args.no_cache,
+            )
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(
+        f"✓ {intervals.n_sessions} sessions, {intervals.n_resamples} resamples, "
+        f"{intervals.level:.0%} intervals"
+    )
+    print(intervals.to_frame().head(args.top).round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+"""Feature engineering: test_sessions -> dense float32 feature matrix.
+
+Built matrices are cached on disk under DATA_DIR. Later builds only fetch and
+encode sessions whose updated_at is at or after the cached watermark, merge
+them into the cached matrix by session id and drop the rows of sessions that
+no longer exist.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+import uuid
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased
+
+from app.config import DATA_DIR
+from app.data.conditions import (
+    CATEGORY_COLUMNS,
+    N_TEMPERATURE_BINS,
+    encode_categories,
+    one_hot,
+    temperature_bin_labels,
+    temperature_bins,
+)
+from app.data.data_types import TestSession, WaxProduct
+from app.data.database.partitioned import Bounds, parallel_scan, range_conditions
+from app.data.database.session import get_db
+
+FEATURE_CACHE_DIR = DATA_DIR / "features"
+FETCH_CHUNK_SIZE = 50_000
+
+# Numeric condition columns; nullable ones also get a missing-value indicator
+NUMERIC_COLUMNS = [
+    "temperature",
+    "snow_temperature",
+    "humidity",
+    "wind_speed",
+    "snow_age_days",
+    "test_course_length",
+]
+NULLABLE_NUMERIC_COLUMNS = ["snow_temperature", "humidity", "wind_speed", "snow_age_days"]
+
+# Wax-vs-conditions features, encoded as test wax minus reference wax
+WAX_FEATURES = ["in_temp_range", "offset_from_range_mid", "temp_range_width"]
+
+
+def _feature_names() -> list[str]:
+    names = list(NUMERIC_COLUMNS)
+    names += [f"{column}_missing" for column in NULLABLE_NUMERIC_COLUMNS]
+    names += [f"temperature_bin={label}" for label in temperature_bin_labels()]
+    for column, categories in CATEGORY_COLUMNS.items():
+        names += [f"{column}={category}" for category in categories]
+    names += [f"wax_diff_{name}" for name in WAX_FEATURES]
+    return names
+
+
+FEATURE_NAMES = _feature_names()
+SCHEMA_VERSION = hashlib.sha256("\n".join(FEATURE_NAMES).encode()).hexdigest()[:16]
+
+
+@dataclass
+class FeatureMatrix:
+    """Encoded test sessions.
+
+    Attributes:
+        X: float32 feature matrix, one row per session, columns as feature_names
+        y_won: float32 label vector, 1.0 where the test ski won
+        y_margin: float32 label vector of distance_between_skis (meters)
+        session_ids: int64 test_sessions.id of each row (sorted ascending)
+        feature_names: Column names of X
+        watermark: Largest updated_at included in the matrix
+    """
+
+    X: np.ndarray
+    y_won: np.ndarray
+    y_margin: np.ndarray
+    session_ids: np.ndarray
+    feature_names: list[str]
+    watermark: datetime | None
+
+    def __len__(self):
+        return len(self.session_ids)
+
+
+def wax_condition_features(temperature, temp_low, temp_high) -> np.ndarray:
+    """Describe how well waxes match the temperature they were used at.
+
+    Args:
+        temperature: Array of air temperatures (Celsius)
+        temp_low: Array of wax temp_range_low (NaN if unknown)
+        temp_high: Array of wax temp_range_high (NaN if unknown)
+
+    All inputs broadcast against each other.
+
+    Returns:
+        float32 array of shape broadcast_shape + (len(WAX_FEATURES),); features
+        of waxes without a known temperature range are zero
+    """
+    temperature = np.asarray(temperature, dtype="float32")
+    low = np.asarray(temp_low, dtype="float32")
+    high = np.asarray(temp_high, dtype="float32")
+    known = ~(np.isnan(low) | np.isnan(high))
+    with np.errstate(invalid="ignore"):
+        in_range = (temperature >= low) & (temperature <= high)
+        offset = temperature - (low + high) / 2
+        width = high - low
+    features = np.stack(np.broadcast_arrays(in_range, offset, width), axis=-1).astype("float32")
+    features[~np.broadcast_to(known, features.shape[:-1])] = 0
+    return np.nan_to_num(features, copy=False)
+
+
+def encode_sessions(frame: pd.DataFrame) -> np.ndarray:
+    """Encode a frame of test sessions into a float32 feature matrix.
+
+    Args:
+        frame: DataFrame with the test_sessions condition columns plus
+            reference/test wax temp_range_low/high columns as produced by
+            session_feature_query()
+
+    Returns:
+        float32 array of shape (len(frame), len(FEATURE_NAMES))
+    """
+    numeric = frame[NUMERIC_COLUMNS].to_numpy(dtype="float32", na_value=np.nan)
+    missing = np.isnan(numeric[:, [NUMERIC_COLUMNS.index(c) for c in NULLABLE_NUMERIC_COLUMNS]])
+    blocks = [
+        np.nan_to_num(numeric),
+        missing.astype("float32"),
+        one_hot(temperature_bins(frame["temperature"]), N_TEMPERATURE_BINS),
+    ]
+    for column, categories in CATEGORY_COLUMNS.items():
+        blocks.append(one_hot(encode_categories(frame[column], categories), len(categories)))
+
+    temperature = frame["temperature"].to_numpy(dtype="float32")
+
+    def wax_side(prefix):
+        return wax_condition_features(
+            temperature,
+            frame[f"{prefix}_temp_low"].to_numpy(dtype="float32", na_value=np.nan),
+            frame[f"{prefix}_temp_high"].to_numpy(dtype="float32", na_value=np.nan),
+        )
+
+    blocks.append(wax_side("test") - wax_side("reference"))
+    return np.hstack(blocks)
+
+
+def session_feature_query(
+    since: datetime | None = None, after_id: int | None = None, where: tuple = ()
+):
+    """Build the SELECT fetching everything needed to encode sessions.
+
+    Args:
+        since: If given, only sessions with updated_at >= since
+        after_id: If given, only sessions with id > after_id
+        where: Additional conditions on TestSession columns
+
+    Returns:
+        SQLAlchemy Select statement
+    """
+    reference_wax = aliased(WaxProduct)
+    test_wax = aliased(WaxProduct)
+    statement = (
+        select(
+            TestSession.id,
+            TestSession.updated_at,
+            *[getattr(TestSession, column) for column in NUMERIC_COLUMNS],
+            *[getattr(TestSession, column) for column in CATEGORY_COLUMNS],
+            TestSession.distance_between_skis,
+            TestSession.test_ski_won,
+            reference_wax.temp_range_low.label("reference_temp_low"),
+            reference_wax.temp_range_high.label("reference_temp_high"),
+            test_wax.temp_range_low.label("test_temp_low"),
+            test_wax.temp_range_high.label("test_temp_high"),
+        )
+        .join(reference_wax, TestSession.reference_wax_id == reference_wax.id)
+        .join(test_wax, TestSession.test_wax_id == test_wax.id)
+        .order_by(TestSession.id)
+    )
+    if since is not None:
+        statement = statement.where(TestSession.updated_at >= since)
+    if after_id is not None:
+        statement = statement.where(TestSession.id > after_id)
+    if where:
+        statement = statement.where(*where)
+    return statement
+
+
+def _empty_feature_matrix(watermark: datetime | None = None) -> FeatureMatrix:
+    return FeatureMatrix(
+        X=np.empty((0, len(FEATURE_NAMES)), dtype="float32"),
+        y_won=np.empty(0, dtype="float32"),
+        y_margin=np.empty(0, dtype="float32"),
+        session_ids=np.empty(0, dtype="int64"),
+        feature_names=FEATURE_NAMES,
+        watermark=watermark,
+    )
+
+
+def fetch_feature_matrix(
+    db: Session, since: datetime | None = None, after_id: int | None = None, where: tuple = ()
+) -> FeatureMatrix:
+    """Fetch and encode sessions from the database in bounded chunks.
+
+    Args:
+        db: Database session
+        since: If given, only sessions with updated_at >= since
+        after_id: If given, only sessions with id > after_id
+        where: Additional conditions on TestSession columns
+
+    Returns:
+        FeatureMatrix with the fetched sessions
+    """
+    statement = session_feature_query(since, after_id, where).execution_options(
+        yield_per=FETCH_CHUNK_SIZE
+    )
+    result = db.execute(statement)
+    columns = list(result.keys())
+    parts = []
+    watermark = since
+    for rows in result.partitions():
+        frame = pd.DataFrame(rows, columns=columns)
+        parts.append(
+            (
+                encode_sessions(frame),
+                frame["test_ski_won"].to_numpy(dtype="float32"),
+                frame["distance_between_skis"].to_numpy(dtype="float32"),
+                frame["id"].to_numpy(dtype="int64"),
+            )
+        )
+        chunk_max = frame["updated_at"].max()
+        if pd.notna(chunk_max) and (watermark is None or chunk_max > watermark):
+            watermark = chunk_max.to_pydatetime()
+
+    if not parts:
+        return _empty_feature_matrix(watermark)
+    X, y_won, y_margin, ids = (np.concatenate(arrays) for arrays in zip(*parts))
+    return FeatureMatrix(X, y_won, y_margin, ids, FEATURE_NAMES, watermark)
+
+
+def _fetch_partition(db: Session, column: str, bounds: Bounds) -> FeatureMatrix:
+    return fetch_feature_matrix(db, where=tuple(range_conditions(column, bounds)))
+
+
+def fetch_feature_matrix_parallel(
+    max_workers: int | None = None, executor: str = "process"
+) -> FeatureMatrix:
+    """Fetch and encode all sessions as concurrent id-range scans.
+
+    Every range is fetched and encoded by its own worker over its own
+    connection (see app.data.database.partitioned); ranges are contiguous
+    and ascending, so concatenating them keeps the rows sorted by id.
+
+    The watermark is read in one query before the fan-out. Partitions read
+    at different moments, so the largest updated_at among them could be
+    newer than an update that an earlier partition missed; with the
+    pre-scan watermark such sessions are fetched again by the next
+    incremental build instead.
+
+    Args:
+        max_workers: Pool size (defaults to the number of CPUs)
+        executor: "process" or "thread"
+
+    Returns:
+        FeatureMatrix with every committed session
+    """
+    with get_db(readonly=True) as db:
+        watermark = db.scalar(select(func.max(TestSession.updated_at)))
+    parts = parallel_scan(
+        _fetch_partition, column="id", executor=executor, max_workers=max_workers
+    )
+    if not parts:
+        return _empty_feature_matrix(watermark)
+    return FeatureMatrix(
+        X=np.concatenate([part.X for part in parts]),
+        y_won=np.concatenate([part.y_won for part in parts]),
+        y_margin=np.concatenate([part.y_margin for part in parts]),
+        session_ids=np.concatenate([part.session_ids for part in parts]),
+        feature_names=FEATURE_NAMES,
+        watermark=watermark,
+    )
+
+
+def merge_feature_matrices(base: FeatureMatrix, update: FeatureMatrix) -> FeatureMatrix:
+    """Merge updated sessions into a matrix, replacing rows with the same id.
+
+    Args:
+        base: Existing matrix
+        update: Newly fetched sessions
+
+    Returns:
+        Combined FeatureMatrix sorted by session id
+    """
+    keep = ~np.isin(base.session_ids, update.session_ids)
+    ids = np.concatenate([base.session_ids[keep], update.session_ids])
+    order = np.argsort(ids, kind="stable")
+
+    def merged(a, b):
+        return np.concatenate([a[keep], b])[order]
+
+    watermarks = [w for w in (base.watermark, update.watermark) if w is not None]
+    return FeatureMatrix(
+        X=merged(base.X, update.X),
+        y_won=merged(base.y_won, update.y_won),
+        y_margin=merged(base.y_margin, update.y_margin),
+        session_ids=ids[order],
+        feature_names=base.feature_names,
+        watermark=max(watermarks) if watermarks else None,
+    )
+
+
+def _is_unchanged(base: FeatureMatrix, update: FeatureMatrix) -> bool:
+    """True if update only re-fetched rows already present in base unchanged.
+
+    The incremental fetch is inclusive of the watermark, so the newest cached
+    rows always come back; this avoids rewriting the cache for them.
+    """
+    if len(update) == 0:
+        return True
+    if len(base) == 0:
+        return False
+    position = np.searchsorted(base.session_ids, update.session_ids)
+    position = np.minimum(position, len(base) - 1)
+    if not np.array_equal(base.session_ids[position], update.session_ids):
+        return False
+    return (
+        np.array_equal(base.X[position], update.X)
+        and np.array_equal(base.y_won[position], update.y_won)
+        and np.array_equal(base.y_margin[position], update.y_margin)
+    )
+
+
+_ARRAYS = ["X", "y_won", "y_margin", "session_ids"]
+
+
+def _cached_meta(cache_dir: Path) -> dict | None:
+    meta_path = Path(cache_dir) / "meta.json"
+    if not meta_path.exists():
+        return None
+    meta = json.loads(meta_path.read_text())
+    if meta.get("schema_version") != SCHEMA_VERSION or "build" not in meta:
+        return None
+    return meta
+
+
+def _array_paths(cache_dir: Path, build: str) -> dict[str, Path]:
+    return {name: Path(cache_dir) / f"{name}.{build}.npy" for name in _ARRAYS}
+
+
+def cached_array_paths(cache_dir: Path = FEATURE_CACHE_DIR) -> dict[str, Path]:
+    """Files of the current cache build, e.g. for workers that memory-map them.
+
+    Returns:
+        FeatureMatrix array name (X, y_won, y_margin, session_ids) -> .npy path
+
+    Raises:
+        ValueError: If there is no valid cache
+    """
+    meta = _cached_meta(cache_dir)
+    if meta is None:
+        raise ValueError(f"No feature cache in {cache_dir}; run build_feature_matrix() first")
+    return _array_paths(cache_dir, meta["build"])
+
+
+def load_cached_features(cache_dir: Path = FEATURE_CACHE_DIR) -> FeatureMatrix | None:
+    """Load a cached feature matrix, or None if missing or built with another schema."""
+    meta = _cached_meta(cache_dir)
+    if meta is None:
+        return None
+    arrays = {name: np.load(path) for name, path in _array_paths(cache_dir, meta["build"]).items()}
+    watermark = meta.get("watermark")
+    return FeatureMatrix(
+        **arrays,
+        feature_names=meta["feature_names"],
+        watermark=datetime.fromisoformat(watermark) if watermark else None,
+    )
+
+
+def save_cached_features(features: FeatureMatrix, cache_dir: Path = FEATURE_CACHE_DIR):
+    """Write a feature matrix to the on-disk cache.
+
+    Every build writes its arrays under file names of its own, which only
+    meta.json refers to. Replacing meta.json switches to the new build in
+    one rename, so a crash never leaves a cache that mixes two builds;
+    the arrays of the replaced build are deleted afterwards.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    previous = _cached_meta(cache_dir)
+    build = uuid.uuid4().hex[:12]
+    for name, path in _array_paths(cache_dir, build).items():
+        np.save(path, getattr(features, name))
+    meta = {
+        "schema_version": SCHEMA_VERSION,
+        "build": build,
+        "feature_names": features.feature_names,
+        "n_rows": len(features),
+        "watermark": features.watermark.isoformat() if features.watermark else None,
+    }
+    tmp_meta = cache_dir / "meta.json.tmp"
+    tmp_meta.write_text(json.dumps(meta, indent=2))
+    os.replace(tmp_meta, cache_dir / "meta.json")
+    if previous is not None:
+        for path in _array_paths(cache_dir, previous["build"]).values():
+            path.unlink(missing_ok=True)
+
+
+def drop_deleted_sessions(features: FeatureMatrix, live_ids: np.ndarray) -> FeatureMatrix:
+    """Remove the rows of sessions whose ids are not in live_ids.
+
+    Args:
+        features: Feature matrix, e.g. a cached one
+        live_ids: Ids of the sessions currently in test_sessions
+
+    Returns:
+        features itself if every session still exists, else the filtered matrix
+    """
+    keep = np.isin(features.session_ids, live_ids)
+    if keep.all():
+        return features
+    return FeatureMatrix(
+        X=features.X[keep],
+        y_won=features.y_won[keep],
+        y_margin=features.y_margin[keep],
+        session_ids=features.session_ids[keep],
+        feature_names=features.feature_names,
+        watermark=features.watermark,
+    )
+
+
+def build_feature_matrix(
+    db: Session | None = None,
+    cache_dir: Path = FEATURE_CACHE_DIR,
+    use_cache: bool = True,
+    max_workers: int = 1,
+) -> FeatureMatrix:
+    """Build the feature matrix for all test sessions, incrementally when cached.
+
+    With a valid cache, only sessions updated at or after the cached watermark
+    are fetched and encoded; they replace their previous rows by id. Rows of
+    deleted sessions are found by comparing the cached ids with the ids in
+    test_sessions (an id-only scan) and dropped.
+
+    Args:
+        db: Optional database session (a new one is opened if not given)
+        cache_dir: Directory holding the cached matrix
+        use_cache: If False, rebuild from scratch (the cache is still refreshed)
+        max_workers: Processes fetching a full rebuild as parallel id-range
+            scans (see fetch_feature_matrix_parallel); these only see
+            committed sessions, not pending changes in db
+
+    Returns:
+        FeatureMatrix covering every test session
+    """
+    if db is None:
+        with get_db(readonly=True) as session:
+            return build_feature_matrix(
+                session, cache_dir=cache_dir, use_cache=use_cache, max_workers=max_workers
+            )
+
+    cached = load_cached_features(cache_dir) if use_cache else None
+    if cached is None and max_workers > 1:
+        features = fetch_feature_matrix_parallel(max_workers=max_workers)
+    elif cached is None:
+        features = fetch_feature_matrix(db)
+    else:
+        update = fetch_feature_matrix(db, since=cached.watermark)
+        live_ids = np.fromiter(db.scalars(select(TestSession.id)), dtype="int64")
+        remaining = drop_deleted_sessions(cached, live_ids)
+        if remaining is cached and _is_unchanged(cached, update):
+            return cached
+        features = merge_feature_matrices(remaining, update)
+
+    save_cached_features(features, cache_dir)
+    return features
@@ -0,0 +1,273 @@
+"""Nearest-neighbour index over the conditions of past test sessions.
+
+Sessions are partitioned by exact match on snow_type, snow_moisture and
+track_condition; inside each partition a KD-tree indexes the normalized
+numeric conditions. New sessions go to a small per-partition buffer that is
+searched by brute force and merged into the tree once it grows, so adding
+sessions never requires rebuilding the whole index.
+"""
+
+import os
+from pathlib import Path
+import pickle
+import warnings
+
+import numpy as np
+from scipy.spatial import cKDTree
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import DATA_DIR
+from app.data.conditions import CATEGORY_COLUMNS, encode_categories
+from app.data.data_types import TestSession
+
+INDEX_PATH = DATA_DIR / "neighbors" / "session_index.pkl"
+
+NUMERIC_COLUMNS = ["temperature", "snow_temperature", "humidity", "wind_speed", "snow_age_days"]
+PARTITION_COLUMNS = ["snow_type", "snow_moisture", "track_condition"]
+
+# Buffered points are merged into the partition tree above this fraction of its size
+MERGE_FRACTION = 0.1
+MIN_MERGE_SIZE = 256
+
+
+class _Partition:
+    """KD-tree plus an append buffer for one combination of categories."""
+
+    def __init__(self):
+        self.tree: cKDTree | None = None
+        self.tree_ids = np.empty(0, dtype="int64")
+        self.buffer_points: list[np.ndarray] = []
+        self.buffer_ids: list[np.ndarray] = []
+        self.n_buffered = 0
+
+    def __len__(self):
+        return len(self.tree_ids) + self.n_buffered
+
+    def add(self, points: np.ndarray, ids: np.ndarray):
+        self.buffer_points.append(points)
+        self.buffer_ids.append(ids)
+        self.n_buffered += len(ids)
+        if self.n_buffered > max(MIN_MERGE_SIZE, MERGE_FRACTION * len(self.tree_ids)):
+            self.merge()
+
+    def merge(self):
+        """Rebuild this partition's tree including the buffered points."""
+        if not self.n_buffered:
+            return
+        points = [self.tree.data] if self.tree is not None else []
+        self.tree = cKDTree(np.vstack(points + self.buffer_points))
+        self.tree_ids = np.concatenate([self.tree_ids, *self.buffer_ids])
+        self.buffer_points, self.buffer_ids, self.n_buffered = [], [], 0
+
+    def query(self, point: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        distances, ids = [], []
+        if self.tree is not None:
+            n = min(k, len(self.tree_ids))
+            d, i = self.tree.query(point, k=n)
+            distances.append(np.atleast_1d(d))
+            ids.append(self.tree_ids[np.atleast_1d(i)])
+        if self.n_buffered:
+            points = np.vstack(self.buffer_points)
+            distances.append(np.sqrt(((points - point) ** 2).sum(axis=1)))
+            ids.append(np.concatenate(self.buffer_ids))
+        return np.concatenate(distances), np.concatenate(ids)
+
+
+def _category_code(column: str, value: str | None) -> int | None:
+    """Partition code of a query value; None means "match any".
+
+    Raises:
+        ValueError: If value is not a known category of column (-1, the code
+            of unknown values, is reserved for sessions where it is NULL)
+    """
+    if value is None:
+        return None
+    categories = CATEGORY_COLUMNS[column]
+    if value not in categories:
+        raise ValueError(f"Unknown {column} '{value}', expected one of {', '.join(categories)}")
+    return categories.index(value)
+
+
+class SessionIndex:
+    """k-NN index of test sessions by weather and snow conditions.
+
+    Attributes:
+        mean: Per-column mean used for normalization (and imputation)
+        scale: Per-column standard deviation used for normalization
+        last_session_id: Largest test_sessions.id in the index
+    """
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean = mean
+        self.scale = scale
+        self.partitions: dict[tuple[int, ...], _Partition] = {}
+        self.last_session_id = 0
+
+    def __len__(self):
+        return sum(len(partition) for partition in self.partitions.values())
+
+    def __repr__(self):
+        return f"<SessionIndex(sessions={len(self)}, partitions={len(self.partitions)})>"
+
+    def _normalize(self, numeric: np.ndarray) -> np.ndarray:
+        points = (np.asarray(numeric, dtype="float64") - self.mean) / self.scale
+        # Missing values sit at the mean, i.e. they neither attract nor repel
+        return np.nan_to_num(points)
+
+    @staticmethod
+    def _partition_keys(categories: dict[str, list]) -> np.ndarray:
+        return np.column_stack(
+            [
+                encode_categories(categories[column], CATEGORY_COLUMNS[column])
+                for column in PARTITION_COLUMNS
+            ]
+        )
+
+    def add(self, ids, numeric, categories: dict[str, list]):
+        """Add sessions to the index.
+
+        Args:
+            ids: test_sessions ids, shape (n,)
+            numeric: Raw values of NUMERIC_COLUMNS, shape (n, len(NUMERIC_COLUMNS))
+            categories: PARTITION_COLUMNS -> sequence of n category values
+        """
+        ids = np.asarray(ids, dtype="int64")
+        if not len(ids):
+            return
+        points = self._normalize(numeric)
+        keys = self._partition_keys(categories)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        for group, key in enumerate(unique_keys):
+            members = np.flatnonzero(inverse.ravel() == group)
+            partition = self.partitions.setdefault(tuple(int(v) for v in key), _Partition())
+            partition.add(points[members], ids[members])
+        self.last_session_id = max(self.last_session_id, int(ids.max()))
+
+    def merge(self):
+        """Merge all buffered sessions into their partition trees."""
+        for partition in self.partitions.values():
+            partition.merge()
+
+    def query(self, k: int = 20, **conditions) -> tuple[np.ndarray, np.ndarray]:
+        """Find the k past sessions with the most similar conditions.
+
+        Args:
+            k: Number of neighbours
+            **conditions: Values for NUMERIC_COLUMNS (missing ones are treated
+                as average) and PARTITION_COLUMNS. Categorical values must match
+                exactly; omitted or None categories match any value.
+
+        Returns:
+            Tuple of (session ids, distances) sorted by increasing distance
+
+        Raises:
+            ValueError: If a categorical value is not a known category
+        """
+        numeric = [conditions.get(column, np.nan) for column in NUMERIC_COLUMNS]
+        point = self._normalize(np.array([np.nan if v is None else v for v in numeric]))
+        wanted = [_category_code(column, conditions.get(column)) for column in PARTITION_COLUMNS]
+
+        if None in wanted:
+            matching = [
+                partition
+                for key, partition in self.partitions.items()
+                if all(w is None or w == v for w, v in zip(wanted, key))
+            ]
+        else:
+            exact = self.partitions.get(tuple(wanted))
+            matching = [exact] if exact is not None else []
+
+        distances, ids = [], []
+        for partition in matching:
+            d, i = partition.query(point, k)
+            distances.append(d)
+            ids.append(i)
+        if not ids:
+            return np.empty(0, dtype="int64"), np.empty(0)
+
+        distances = np.concatenate(distances)
+        ids = np.concatenate(ids)
+        if len(ids) > k:
+            nearest = np.argpartition(distances, k - 1)[:k]
+            distances, ids = distances[nearest], ids[nearest]
+        order = np.argsort(distances, kind="stable")
+        return ids[order], distances[order]
+
+    def update_from_db(self, db: Session):
+        """Add all sessions inserted since the index was built or last updated."""
+        ids, numeric, categories = _load_conditions(db, after_id=self.last_session_id)
+        self.add(ids, numeric, categories)
+        return self
+
+    def save(self, path: str | Path = INDEX_PATH):
+        """Pickle the index (including its trees) so loading needs no rebuild."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str | Path = INDEX_PATH) -> "SessionIndex":
+        """Load an index written by save()."""
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def _load_conditions(db: Session, after_id: int | None = None):
+    statement = select(
+        TestSession.id,
+        *[getattr(TestSession, column) for column in NUMERIC_COLUMNS],
+        *[getattr(TestSession, column) for column in PARTITION_COLUMNS],
+    ).order_by(TestSession.id)
+    if after_id is not None:
+        statement = statement.where(TestSession.id > after_id)
+    rows = db.execute(statement).all()
+    n_numeric = len(NUMERIC_COLUMNS)
+    columns = list(zip(*rows)) if rows else [()] * (1 + n_numeric + len(PARTITION_COLUMNS))
+    ids = np.array(columns[0], dtype="int64")
+    numeric = np.array(columns[1 : 1 + n_numeric], dtype="float64").T.reshape(-1, n_numeric)
+    categories = {
+        column: list(columns[1 + n_numeric + i]) for i, column in enumerate(PARTITION_COLUMNS)
+    }
+    return ids, numeric, categories
+
+
+def build_session_index(db: Session) -> SessionIndex:
+    """Build an index over all test sessions.
+
+    Args:
+        db: Database session
+
+    Returns:
+        SessionIndex with every partition tree built
+    """
+    ids, numeric, categories = _load_conditions(db)
+    mean = np.zeros(len(NUMERIC_COLUMNS))
+    scale = np.ones(len(NUMERIC_COLUMNS))
+    if len(ids):
+        with warnings.catch_warnings():
+            # Columns that are entirely missing fall back to mean 0 / scale 1
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean = np.nan_to_num(np.nanmean(numeric, axis=0))
+            scale = np.nanstd(numeric, axis=0)
+        scale = np.where(np.isnan(scale) | (scale == 0), 1.0, scale)
+    index = SessionIndex(mean, scale)
+    index.add(ids, numeric, categories)
+    index.merge()
+    return index
+
+
+def load_or_build_session_index(db: Session, path: str | Path = INDEX_PATH) -> SessionIndex:
+    """Load the saved index and bring it up to date, or build and save a new one."""
+    if Path(path).exists():
+        index = SessionIndex.load(path)
+        n_before = len(index)
+        if len(index.update_from_db(db)) == n_before:
+            return index
+    else:
+        index = build_session_index(db)
+    index.save(path)
+    return index
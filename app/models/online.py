@@ -0,0 +1,360 @@
+"""Online updates of the winner and margin models as test sessions arrive.
+
+OnlineLearner keeps a StandardScaler plus SGD winner classifier and margin
+regressor (with the hyperparameters selected by train.py). Each update()
+fetches only sessions with an id above the last one it consumed and applies
+partial_fit() on them, which takes milliseconds for a handful of sessions.
+
+The scaler stays fixed between full refits, so incremental steps move the
+same weights a full fit would. A full refit on all sessions runs
+
+* once MIN_SAMPLES_FOR_PREDICTION sessions exist (before that, recommend.py
+  falls back to rule-based selection on the waxes' temperature ranges),
+* every ONLINE_REFIT_INTERVAL new sessions, and
+* when the error on a held-out sample grows more than ONLINE_DRIFT_TOLERANCE
+  (relative) above the error measured right after the last refit.
+
+Edits to already consumed sessions only reach the models at the next refit.
+
+publish() saves the current models as an "online-..." version of the
+ArtifactStore and promotes it, which is how recommend.py picks them up
+without importing scikit-learn. The CLI publishes after every update of a
+fitted learner; only the newest ONLINE_KEPT_VERSIONS online versions are kept.
+
+Usage:
+    python -m app.models.online [--refit] [--watch SECONDS]
+"""
+
+import argparse
+from dataclasses import dataclass, field
+from pathlib import Path
+import pickle
+import time
+
+import numpy as np
+from sklearn import config_context
+from sklearn.preprocessing import StandardScaler
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import (
+    MIN_SAMPLES_FOR_PREDICTION,
+    MODELS_DIR,
+    ONLINE_DRIFT_TOLERANCE,
+    ONLINE_REFIT_INTERVAL,
+    RANDOM_SEED,
+    TEST_SIZE,
+)
+from app.data.data_types import TestSession
+from app.data.database.session import get_db
+from app.models.artifacts import ArtifactStore, LinearModel, WaxModels, artifact_version
+from app.models.features import FEATURE_NAMES, build_feature_matrix, fetch_feature_matrix
+from app.models.train import TARGETS, _primary, make_model
+
+ONLINE_STATE_PATH = MODELS_DIR / "online" / "learner.pkl"
+
+# Maximum number of sessions held out to detect drift between refits
+HOLDOUT_ROWS = 5_000
+
+# Published online versions kept in the ArtifactStore (older ones are deleted)
+ONLINE_KEPT_VERSIONS = 2
+ONLINE_VERSION_PREFIX = "online-"
+
+# Hyperparameters used when no trained artifact records the selected ones
+DEFAULT_PARAMS = {
+    "winner": {"alpha": 1e-4, "penalty": "l2"},
+    "margin": {"alpha": 1e-4, "epsilon": 1.0},
+}
+
+
+def selected_params(store: ArtifactStore | None = None) -> dict[str, dict]:
+    """Hyperparameters of the promoted model version, or DEFAULT_PARAMS."""
+    try:
+        best = (store or ArtifactStore()).load().metadata.get("best_params", {})
+    except ValueError:
+        best = {}
+    return {target: best.get(target, params) for target, params in DEFAULT_PARAMS.items()}
+
+
+@dataclass
+class UpdateResult:
+    """Outcome of OnlineLearner.update()."""
+
+    n_new: int
+    refit_reason: str | None = None  # "initial", "interval", "drift" or "requested"
+    scores: dict[str, dict[str, float]] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    def __str__(self):
+        action = f"full refit ({self.refit_reason})" if self.refit_reason else "partial_fit"
+        scores = "; ".join(
+            f"{target} " + ", ".join(f"{k} {v:.4f}" for k, v in values.items())
+            for target, values in self.scores.items()
+        )
+        return f"{self.n_new} new sessions, {action} in {self.seconds * 1000:.1f} ms  {scores}"
+
+
+class OnlineLearner:
+    """Incrementally updated winner and margin models."""
+
+    def __init__(self, params: dict[str, dict] | None = None):
+        """
+        Args:
+            params: Target -> SGD hyperparameters (default: selected_params())
+        """
+        self.params = params or selected_params()
+        self.scaler: StandardScaler | None = None
+        self.estimators: dict = {}
+        self.feature_names = FEATURE_NAMES
+        self.last_session_id = 0
+        self.n_sessions = 0
+        self.n_since_refit = 0
+        self.holdout_X = np.empty((0, len(FEATURE_NAMES)), dtype="float32")
+        self.holdout_y: dict[str, np.ndarray] = {}
+        self.baseline_scores: dict[str, dict[str, float]] = {}
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.scaler is not None
+
+    def refit(self, db: Session):
+        """Fit scaler and models from scratch on every session.
+
+        A random sample of up to HOLDOUT_ROWS sessions (TEST_SIZE of them at
+        most) is held out to measure drift until the next refit.
+        """
+        features = build_feature_matrix(db)
+        self.n_sessions = len(features)
+        self.last_session_id = int(features.session_ids.max()) if len(features) else 0
+        self.n_since_refit = 0
+        if len(features) < MIN_SAMPLES_FOR_PREDICTION:
+            return
+
+        rng = np.random.default_rng(RANDOM_SEED)
+        n_holdout = min(HOLDOUT_ROWS, int(len(features) * TEST_SIZE))
+        holdout = np.zeros(len(features), dtype=bool)
+        holdout[rng.choice(len(features), n_holdout, replace=False)] = True
+        train = ~holdout
+
+        self.scaler = StandardScaler().fit(features.X[train])
+        X_train = self.scaler.transform(features.X[train])
+        for target, labels in TARGETS.items():
+            estimator = make_model(target, self.params[target])[-1]
+            self.estimators[target] = estimator.fit(X_train, getattr(features, labels)[train])
+        self.holdout_X = features.X[holdout]
+        self.holdout_y = {
+            target: getattr(features, labels)[holdout] for target, labels in TARGETS.items()
+        }
+        self.baseline_scores = self.holdout_scores()
+
+    def partial_fit(self, X: np.ndarray, labels: dict[str, np.ndarray]):
+        """Apply one SGD pass over new sessions to both models.
+
+        Args:
+            X: Feature rows of the new sessions
+            labels: Target -> label array, as in TARGETS
+        """
+        X_scaled = ((X - self.scaler.mean_) / self.scaler.scale_).astype(X.dtype)
+        # Input checks cost more than the SGD step itself for a few rows
+        with config_context(assume_finite=True, skip_parameter_validation=True):
+            for target, estimator in self.estimators.items():
+                estimator.partial_fit(X_scaled, labels[target])
+
+    def holdout_scores(self) -> dict[str, dict[str, float]]:
+        """Scores of the current models on the held-out sessions.
+
+        Same metrics as train.score_model(), computed directly from the
+        folded linear models so that checking after every update stays cheap.
+        """
+        if len(self.holdout_X) == 0:
+            return {}
+        models = self.wax_models()
+        won = self.holdout_y["winner"] > 0.5
+        decision = models.winner.decision(self.holdout_X)
+        # -log(sigmoid(decision)) for wins, -log(1 - sigmoid(decision)) for losses
+        losses = np.logaddexp(0, np.where(won, -decision, decision))
+        error = models.margin.decision(self.holdout_X) - self.holdout_y["margin"]
+        return {
+            "winner": {
+                "log_loss": float(losses.mean()),
+                "accuracy": float(np.mean((decision >= 0) == won)),
+            },
+            "margin": {"rmse": float(np.sqrt(np.mean(error**2)))},
+        }
+
+    def drifted(self, scores: dict[str, dict[str, float]]) -> bool:
+        """Whether any primary metric exceeds its post-refit value by the tolerance."""
+        for target, values in scores.items():
+            metric = _primary(target)
+            baseline = self.baseline_scores[target][metric]
+            if values[metric] > baseline * (1 + ONLINE_DRIFT_TOLERANCE):
+                return True
+        return False
+
+    def update(self, db: Session | None = None, force_refit: bool = False) -> UpdateResult:
+        """Consume sessions committed since the last update.
+
+        Args:
+            db: Optional database session (a read-only one is opened if not given)
+            force_refit: If True, run a full refit regardless of the triggers
+
+        Returns:
+            UpdateResult
+        """
+        if db is None:
+            with get_db(readonly=True) as session:
+                return self.update(session, force_refit=force_refit)
+
+        start = time.perf_counter()
+        if force_refit or not self.is_fitted:
+            # A refit fetches every session itself, so only count the new ones
+            n_new, last_id = db.execute(
+                select(func.count(TestSession.id), func.max(TestSession.id)).where(
+                    TestSession.id > self.last_session_id
+                )
+            ).one()
+            result = UpdateResult(n_new=n_new)
+            if n_new:
+                self.last_session_id = last_id
+                self.n_sessions += n_new
+            if force_refit:
+                result.refit_reason = "requested"
+            elif self.n_sessions >= MIN_SAMPLES_FOR_PREDICTION:
+                result.refit_reason = "initial"
+        else:
+            new = fetch_feature_matrix(db, after_id=self.last_session_id)
+            result = UpdateResult(n_new=len(new))
+            if len(new):
+                self.last_session_id = int(new.session_ids.max())
+                self.n_sessions += len(new)
+                self.n_since_refit += len(new)
+
+            if self.n_since_refit >= ONLINE_REFIT_INTERVAL:
+                result.refit_reason = "interval"
+            elif len(new):
+                self.partial_fit(
+                    new.X, {target: getattr(new, labels) for target, labels in TARGETS.items()}
+                )
+                result.scores = self.holdout_scores()
+                if self.drifted(result.scores):
+                    result.refit_reason = "drift"
+
+        if result.refit_reason:
+            self.refit(db)
+            result.scores = self.baseline_scores
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def wax_models(self) -> WaxModels:
+        """Current models in the form used by recommend.WaxRecommender.
+
+        Raises:
+            ValueError: If fewer than MIN_SAMPLES_FOR_PREDICTION sessions were seen
+        """
+        if not self.is_fitted:
+            raise ValueError(
+                f"Online models need {MIN_SAMPLES_FOR_PREDICTION} sessions, "
+                f"found {self.n_sessions}"
+            )
+        linear = {
+            target: LinearModel.from_pipeline((self.scaler, estimator))
+            for target, estimator in self.estimators.items()
+        }
+        return WaxModels(
+            version=f"{ONLINE_VERSION_PREFIX}{self.last_session_id}",
+            feature_names=self.feature_names,
+            winner=linear["winner"],
+            margin=linear["margin"],
+        )
+
+    def publish(self, store: ArtifactStore | None = None) -> str:
+        """Save the current models to the ArtifactStore and promote them.
+
+        The version records the hyperparameters as best_params, so later
+        learners (see selected_params) keep using them.
+
+        Args:
+            store: Artifact store (defaults to MODELS_DIR)
+
+        Returns:
+            Published version key
+
+        Raises:
+            ValueError: If fewer than MIN_SAMPLES_FOR_PREDICTION sessions were seen
+        """
+        store = store or ArtifactStore()
+        models = self.wax_models()
+        arrays = models.to_arrays()
+        version = ONLINE_VERSION_PREFIX + artifact_version(
+            list(arrays.values()), {"last_session_id": self.last_session_id}
+        )
+        store.save(
+            version,
+            arrays,
+            {
+                "source": "online",
+                "last_session_id": self.last_session_id,
+                "n_sessions": self.n_sessions,
+                "feature_names": models.feature_names,
+                "best_params": self.params,
+                "holdout_scores": self.holdout_scores(),
+            },
+            promote=True,
+        )
+        published = [name for name in store.versions() if name.startswith(ONLINE_VERSION_PREFIX)]
+        for old in published[:-ONLINE_KEPT_VERSIONS]:
+            if old != version:
+                store.delete(old)
+        return version
+
+    def save(self, path: str | Path = ONLINE_STATE_PATH):
+        """Persist the learner (written to a temporary file, then moved into place)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_bytes(pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: str | Path = ONLINE_STATE_PATH) -> "OnlineLearner":
+        """Load a saved learner, or create a new one if none was saved or its
+        feature schema is outdated."""
+        path = Path(path)
+        if path.exists():
+            learner = pickle.loads(path.read_bytes())
+            if learner.feature_names == FEATURE_NAMES:
+                return learner
+        return cls()
+
+
+def main():
+    """CLI entry point: update the saved online models from new sessions."""
+    parser = argparse.ArgumentParser(description="Update the online WAX-AI models")
+    parser.add_argument("--refit", action="store_true", help="Force a full refit")
+    parser.add_argument(
+        "--watch", type=float, metavar="SECONDS", help="Keep polling for new sessions"
+    )
+    args = parser.parse_args()
+
+    learner = OnlineLearner.load()
+    force_refit = args.refit
+    while True:
+        result = learner.update(force_refit=force_refit)
+        force_refit = False
+        if result.n_new or result.refit_reason:
+            learner.save()
+            print(f"✓ {result}")
+            if learner.is_fitted:
+                print(f"✓ Published and promoted model version {learner.publish()}")
+        if args.watch is None:
+            break
+        time.sleep(args.watch)
+    if not learner.is_fitted:
+        print(
+            f"Only {learner.n_sessions} sessions; recommendations use temperature-range rules "
+            f"until {MIN_SAMPLES_FOR_PREDICTION} are recorded"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+"""Pairwise wax ratings from comparative glide tests.
+
+Every test session is a head-to-head between the reference wax and the test
+wax. Ratings are fitted with a weighted Bradley-Terry model (win strengths,
+P(a beats b) = sigmoid(s_a - s_b)) and a least-squares margin model (expected
+distance_between_skis = m_a - m_b), both over a sparse comparison matrix so a
+fit costs a few conjugate-gradient solves of sparse systems.
+
+Strengths can optionally be fitted per condition bucket (temperature bin x
+snow_moisture), shrunk towards the global strength of each wax. New sessions
+are folded in with an Elo-style step scaled by the accumulated Fisher
+information of each wax, so updates do not require a refit.
+
+load_or_fit_ratings() keeps the ratings in RATINGS_PATH current this way;
+recommend.py adds the per-bucket strengths to its model scores.
+"""
+
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import TYPE_CHECKING
+import warnings
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import (
+    CONFIDENCE_RATING_MAX,
+    DATA_DIR,
+    SNOW_MOISTURE_CATEGORIES,
+    TEMPERATURE_BINS,
+)
+from app.data.conditions import N_TEMPERATURE_BINS, encode_categories, temperature_bins
+from app.data.data_types import TestSession
+
+# scipy is only needed to fit, not to score with loaded ratings (recommend.py)
+if TYPE_CHECKING:
+    from scipy import sparse
+
+RATINGS_PATH = DATA_DIR / "ratings" / "wax_ratings.npz"
+
+# Weight of sessions without a confidence_rating (as if rated 3 of 5)
+DEFAULT_CONFIDENCE = 3
+
+# Bucket 0 of each temperature bin collects sessions without snow_moisture
+N_MOISTURE_SLOTS = len(SNOW_MOISTURE_CATEGORIES) + 1
+N_BUCKETS = N_TEMPERATURE_BINS * N_MOISTURE_SLOTS
+
+
+def condition_buckets(temperature, snow_moisture) -> np.ndarray:
+    """Map conditions to bucket indices in [0, N_BUCKETS).
+
+    Args:
+        temperature: Array-like of temperatures (Celsius)
+        snow_moisture: Array-like of snow_moisture values (may contain nulls)
+
+    Returns:
+        int64 array of bucket indices
+    """
+    temperature_bin = temperature_bins(temperature).astype("int64")
+    moisture = encode_categories(snow_moisture, SNOW_MOISTURE_CATEGORIES).astype("int64") + 1
+    return np.maximum(temperature_bin, 0) * N_MOISTURE_SLOTS + moisture
+
+
+@dataclass
+class Comparisons:
+    """Head-to-head results as parallel arrays (one entry per test session)."""
+
+    test_wax: np.ndarray
+    reference_wax: np.ndarray
+    test_won: np.ndarray
+    margin: np.ndarray
+    weight: np.ndarray
+    bucket: np.ndarray
+    session_id: np.ndarray
+
+    def __len__(self):
+        return len(self.test_wax)
+
+    def subset(self, mask: np.ndarray) -> "Comparisons":
+        """Comparisons selected by a boolean mask or index array."""
+        return Comparisons(**{f.name: getattr(self, f.name)[mask] for f in fields(self)})
+
+
+def bucket_filter(bucket: int) -> list:
+    """SQL conditions selecting (a superset of) the sessions of a condition bucket.
+
+    Bucket 0 of a temperature bin also holds unknown snow_moisture values, so
+    it is only restricted by temperature; condition_buckets() decides exactly.
+    """
+    temperature_bin, moisture_slot = divmod(bucket, N_MOISTURE_SLOTS)
+    edges = [None, *TEMPERATURE_BINS, None]
+    low, high = edges[temperature_bin], edges[temperature_bin + 1]
+    conditions = []
+    if low is not None:
+        conditions.append(TestSession.temperature >= low)
+    if high is not None:
+        conditions.append(TestSession.temperature < high)
+    if moisture_slot:
+        conditions.append(TestSession.snow_moisture == SNOW_MOISTURE_CATEGORIES[moisture_slot - 1])
+    return conditions
+
+
+def load_comparisons(
+    db: Session, after_id: int | None = None, bucket: int | None = None
+) -> Comparisons:
+    """Load comparisons from test_sessions.
+
+    Args:
+        db: Database session
+        after_id: If given, only sessions with id > after_id
+        bucket: If given, only sessions in this condition bucket
+
+    Returns:
+        Comparisons ordered by session id
+    """
+    statement = select(
+        TestSession.id,
+        TestSession.test_wax_id,
+        TestSession.reference_wax_id,
+        TestSession.test_ski_won,
+        TestSession.distance_between_skis,
+        TestSession.confidence_rating,
+        TestSession.temperature,
+        TestSession.snow_moisture,
+    ).order_by(TestSession.id)
+    if after_id is not None:
+        statement = statement.where(TestSession.id > after_id)
+    if bucket is not None:
+        statement = statement.where(*bucket_filter(bucket))
+    rows = db.execute(statement).all()
+    columns = list(zip(*rows)) if rows else [()] * 8
+    confidence = np.array(columns[5], dtype="float64")
+    confidence[np.isnan(confidence)] = DEFAULT_CONFIDENCE
+    comparisons = Comparisons(
+        test_wax=np.array(columns[1], dtype="int64"),
+        reference_wax=np.array(columns[2], dtype="int64"),
+        test_won=np.array(columns[3], dtype="float64"),
+        margin=np.array(columns[4], dtype="float64"),
+        weight=confidence / CONFIDENCE_RATING_MAX,
+        bucket=condition_buckets(np.array(columns[6], dtype="float64"), list(columns[7])),
+        session_id=np.array(columns[0], dtype="int64"),
+    )
+    if bucket is not None:
+        comparisons = comparisons.subset(comparisons.bucket == bucket)
+    return comparisons
+
+
+def _design_matrix(test: np.ndarray, reference: np.ndarray, n_players: int) -> "sparse.csr_matrix":
+    """Sparse (comparisons x players) matrix with +1 for the test and -1 for the reference."""
+    from scipy import sparse
+
+    m = len(test)
+    rows = np.repeat(np.arange(m), 2)
+    cols = np.column_stack([test, reference]).ravel()
+    values = np.tile([1.0, -1.0], m)
+    return sparse.csr_matrix((values, (rows, cols)), shape=(m, n_players))
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+def _penalized_log_likelihood(
+    A: "sparse.csr_matrix",
+    won: np.ndarray,
+    weight: np.ndarray,
+    strength: np.ndarray,
+    prior_mean: np.ndarray,
+    l2: float,
+) -> float:
+    logit = A @ strength
+    # log sigmoid(x) = -log(1 + exp(-x)), evaluated without overflow
+    log_likelihood = -(won * np.logaddexp(0, -logit) + (1 - won) * np.logaddexp(0, logit))
+    return float(weight @ log_likelihood - l2 / 2 * np.sum((strength - prior_mean) ** 2))
+
+
+def _fit_bradley_terry(
+    A: "sparse.csr_matrix",
+    won: np.ndarray,
+    weight: np.ndarray,
+    prior_mean: np.ndarray,
+    l2: float,
+    max_iter: int,
+    tol: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Fit weighted Bradley-Terry strengths with damped Newton steps.
+
+    Maximizes sum w * log-likelihood - l2/2 * ||s - prior_mean||^2. Each step
+    solves the full Newton system (weighted comparison Laplacian + l2 * I)
+    with conjugate gradients and is halved until the objective improves.
+
+    Returns:
+        Tuple of (strengths, diagonal Fisher information per player)
+    """
+    from scipy import sparse
+    from scipy.sparse.linalg import cg
+
+    strength = prior_mean.copy()
+    A_abs = abs(A)
+    A_t = A.T.tocsr()
+    ridge = l2 * sparse.identity(A.shape[1], format="csr")
+    objective = _penalized_log_likelihood(A, won, weight, strength, prior_mean, l2)
+    for _ in range(max_iter):
+        p = _sigmoid(A @ strength)
+        gradient = A_t @ (weight * (won - p)) - l2 * (strength - prior_mean)
+        hessian = (A_t @ sparse.diags(weight * p * (1 - p)) @ A + ridge).tocsr()
+        step, _ = cg(hessian, gradient)
+        for _ in range(30):
+            value = _penalized_log_likelihood(A, won, weight, strength + step, prior_mean, l2)
+            if value >= objective:
+                break
+            step = step / 2
+        else:
+            break  # No step improves the objective: optimal up to rounding
+        strength, objective = strength + step, value
+        if np.max(np.abs(step), initial=0.0) < tol:
+            break
+    else:
+        warnings.warn(
+            f"Bradley-Terry fit did not converge in {max_iter} iterations "
+            f"(last step {np.max(np.abs(step), initial=0.0):.2g}, tol {tol:g})",
+            RuntimeWarning,
+            stacklevel=3,
+        )
+    p = _sigmoid(A @ strength)
+    return strength, A_abs.T @ (weight * p * (1 - p)) + l2
+
+
+def _fit_margins(
+    A: "sparse.csr_matrix",
+    margin: np.ndarray,
+    weight: np.ndarray,
+    prior_mean: np.ndarray,
+    l2: float,
+) -> np.ndarray:
+    """Solve the ridge least-squares margin model with conjugate gradients."""
+    from scipy import sparse
+    from scipy.sparse.linalg import cg
+
+    W = sparse.diags(weight)
+    normal = (A.T @ W @ A + l2 * sparse.identity(A.shape[1])).tocsr()
+    rhs = A.T @ (weight * margin) + l2 * prior_mean
+    solution, _ = cg(normal, rhs, x0=prior_mean.copy())
+    return solution
+
+
+class WaxRatings:
+    """Per-wax (and optionally per-condition) strengths.
+
+    Attributes:
+        wax_ids: Sorted wax_products ids covered by the ratings
+        strength: Global Bradley-Terry strength per wax (logit scale)
+        margin: Global margin strength per wax (meters vs. an average wax)
+        bucket_strength: (N_BUCKETS, n_waxes) strengths per condition bucket,
+            or None if fitted without conditions
+        last_session_id: Largest test_sessions.id included in the ratings
+    """
+
+    def __init__(self, l2: float = 1.0, bucket_l2: float = 2.0, by_condition: bool = True):
+        self.l2 = l2
+        self.bucket_l2 = bucket_l2
+        self.by_condition = by_condition
+        self.wax_ids = np.empty(0, dtype="int64")
+        self.strength = np.empty(0)
+        self.information = np.empty(0)
+        self.margin = np.empty(0)
+        self.margin_information = np.empty(0)
+        self.bucket_strength: np.ndarray | None = None
+        self.bucket_information: np.ndarray | None = None
+        self.n_comparisons = 0
+        self.last_session_id = 0
+
+    def __repr__(self):
+        return f"<WaxRatings(waxes={len(self.wax_ids)}, comparisons={self.n_comparisons})>"
+
+    def _index(self, wax_ids: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.wax_ids, wax_ids)
+
+    def fit(self, comparisons: Comparisons, max_iter: int = 100, tol: float = 1e-6):
+        """Fit ratings from scratch.
+
+        Args:
+            comparisons: Head-to-head results
+            max_iter: Maximum Newton iterations (a RuntimeWarning is issued
+                if the fit has not converged by then)
+            tol: Stop when no strength moves more than tol
+
+        Returns:
+            self
+        """
+        self.wax_ids = np.union1d(comparisons.test_wax, comparisons.reference_wax)
+        n_waxes = len(self.wax_ids)
+        test = self._index(comparisons.test_wax)
+        reference = self._index(comparisons.reference_wax)
+        zeros = np.zeros(n_waxes)
+
+        A = _design_matrix(test, reference, n_waxes)
+        self.strength, self.information = _fit_bradley_terry(
+            A, comparisons.test_won, comparisons.weight, zeros, self.l2, max_iter, tol
+        )
+        self.margin = _fit_margins(A, comparisons.margin, comparisons.weight, zeros, self.l2)
+        self.margin_information = abs(A).T @ comparisons.weight + self.l2
+
+        if self.by_condition:
+            # One player per (bucket, wax), shrunk towards the wax's global strength
+            offset = comparisons.bucket * n_waxes
+            A_bucket = _design_matrix(offset + test, offset + reference, N_BUCKETS * n_waxes)
+            prior = np.tile(self.strength, N_BUCKETS)
+            strength, information = _fit_bradley_terry(
+                A_bucket,
+                comparisons.test_won,
+                comparisons.weight,
+                prior,
+                self.bucket_l2,
+                max_iter,
+                tol,
+            )
+            self.bucket_strength = strength.reshape(N_BUCKETS, n_waxes)
+            self.bucket_information = information.reshape(N_BUCKETS, n_waxes)
+
+        self.n_comparisons = len(comparisons)
+        self.last_session_id = int(comparisons.session_id.max(initial=0))
+        return self
+
+    def _add_waxes(self, wax_ids: np.ndarray):
+        """Extend the rating arrays with unseen waxes at the prior (0 strength)."""
+        all_ids = np.union1d(self.wax_ids, wax_ids)
+        if len(all_ids) == len(self.wax_ids):
+            return
+        position = np.searchsorted(all_ids, self.wax_ids)
+
+        def grow(values, fill, axis=-1):
+            shape = list(values.shape)
+            shape[axis] = len(all_ids)
+            grown = np.full(shape, fill, dtype="float64")
+            grown[..., position] = values
+            return grown
+
+        self.strength = grow(self.strength, 0.0)
+        self.information = grow(self.information, self.l2)
+        self.margin = grow(self.margin, 0.0)
+        self.margin_information = grow(self.margin_information, self.l2)
+        if self.bucket_strength is not None:
+            self.bucket_strength = grow(self.bucket_strength, 0.0)
+            self.bucket_information = grow(self.bucket_information, self.bucket_l2)
+        self.wax_ids = all_ids
+
+    def update(self, comparisons: Comparisons):
+        """Fold new comparisons into the ratings without refitting.
+
+        Applies one Elo-style step for the whole batch, where each wax moves by
+        its likelihood gradient divided by its accumulated Fisher information.
+        Waxes with many past comparisons therefore move less than new ones.
+
+        Args:
+            comparisons: Newly added head-to-head results
+
+        Returns:
+            self
+        """
+        if len(comparisons) == 0:
+            return self
+        self._add_waxes(np.union1d(comparisons.test_wax, comparisons.reference_wax))
+        n_waxes = len(self.wax_ids)
+        test = self._index(comparisons.test_wax)
+        reference = self._index(comparisons.reference_wax)
+        weight = comparisons.weight
+
+        A = _design_matrix(test, reference, n_waxes)
+        p = _sigmoid(A @ self.strength)
+        self.information += abs(A).T @ (weight * p * (1 - p))
+        self.strength += (A.T @ (weight * (comparisons.test_won - p))) / self.information
+
+        residual = comparisons.margin - A @ self.margin
+        self.margin_information += abs(A).T @ weight
+        self.margin += (A.T @ (weight * residual)) / self.margin_information
+
+        if self.bucket_strength is not None:
+            offset = comparisons.bucket * n_waxes
+            A_bucket = _design_matrix(offset + test, offset + reference, N_BUCKETS * n_waxes)
+            strength = self.bucket_strength.ravel()
+            information = self.bucket_information.ravel()
+            p = _sigmoid(A_bucket @ strength)
+            information += abs(A_bucket).T @ (weight * p * (1 - p))
+            strength += (A_bucket.T @ (weight * (comparisons.test_won - p))) / information
+            self.bucket_strength = strength.reshape(N_BUCKETS, n_waxes)
+            self.bucket_information = information.reshape(N_BUCKETS, n_waxes)
+
+        self.n_comparisons += len(comparisons)
+        self.last_session_id = max(self.last_session_id, int(comparisons.session_id.max()))
+        return self
+
+    def update_from_db(self, db: Session):
+        """Fold in all sessions inserted since the last fit/update."""
+        return self.update(load_comparisons(db, after_id=self.last_session_id))
+
+    def strengths(self, temperature: float | None = None, snow_moisture: str | None = None):
+        """Return the strength of every wax, for given conditions if available.
+
+        Args:
+            temperature: Air temperature (Celsius); None for global strengths
+            snow_moisture: Snow moisture category
+
+        Returns:
+            Array of strengths aligned with wax_ids
+        """
+        if temperature is None or self.bucket_strength is None:
+            return self.strength
+        bucket = condition_buckets([temperature], [snow_moisture])[0]
+        return self.bucket_strength[bucket]
+
+    def win_probability(self, wax_a: int, wax_b: int, **conditions) -> float:
+        """Probability that wax_a beats wax_b (under optional conditions)."""
+        strength = self.strengths(**conditions)
+        a, b = self._index(np.array([wax_a, wax_b]))
+        return float(_sigmoid(strength[a] - strength[b]))
+
+    def ranking(self, temperature: float | None = None, snow_moisture: str | None = None):
+        """Return (wax_ids, strengths) sorted from strongest to weakest."""
+        strength = self.strengths(temperature, snow_moisture)
+        order = np.argsort(-strength, kind="stable")
+        return self.wax_ids[order], strength[order]
+
+    def save(self, path: str | Path):
+        """Save the ratings to an .npz file."""
+        arrays = {
+            "wax_ids": self.wax_ids,
+            "strength": self.strength,
+            "information": self.information,
+            "margin": self.margin,
+            "margin_information": self.margin_information,
+            "params": np.array([self.l2, self.bucket_l2, self.by_condition]),
+            "counters": np.array([self.n_comparisons, self.last_session_id]),
+        }
+        if self.bucket_strength is not None:
+            arrays["bucket_strength"] = self.bucket_strength
+            arrays["bucket_information"] = self.bucket_information
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "WaxRatings":
+        """Load ratings saved with save()."""
+        with np.load(path) as data:
+            l2, bucket_l2, by_condition = data["params"]
+            ratings = cls(
+                l2=float(l2), bucket_l2=float(bucket_l2), by_condition=bool(by_condition)
+            )
+            for name in ["wax_ids", "strength", "information", "margin", "margin_information"]:
+                setattr(ratings, name, data[name])
+            if "bucket_strength" in data:
+                ratings.bucket_strength = data["bucket_strength"]
+                ratings.bucket_information = data["bucket_information"]
+            ratings.n_comparisons, ratings.last_session_id = (int(v) for v in data["counters"])
+        return ratings
+
+
+def fit_ratings(db: Session, by_condition: bool = True) -> WaxRatings:
+    """Fit wax ratings over all test sessions.
+
+    Args:
+        db: Database session
+        by_condition: Also fit per condition-bucket strengths
+
+    Returns:
+        Fitted WaxRatings
+    """
+    return WaxRatings(by_condition=by_condition).fit(load_comparisons(db))
+
+
+def load_or_fit_ratings(db: Session, path: str | Path = RATINGS_PATH) -> WaxRatings:
+    """Load the saved ratings and fold in new sessions, or fit and save new ones."""
+    path = Path(path)
+    if path.exists():
+        ratings = WaxRatings.load(path)
+        n_before = ratings.n_comparisons
+        if ratings.update_from_db(db).n_comparisons == n_before:
+            return ratings
+    else:
+        ratings = fit_ratings(db)
+        path.parent.mkdir(parents=True, exist_ok=True)
+    ratings.save(path)
+    return ratings
@@ -0,0 +1,380 @@
+"""Wax recommendations for given weather and snow conditions.
+
+Candidate waxes are prefiltered with an interval index over their
+temp_range_low/temp_range_high. All (condition x candidate) pairs are then
+scored in one vectorized pass. Only the wax features of the trained winner
+and margin models differ between the two skis of a comparison, so a wax's
+score for a condition is
+
+    decision = wax_condition_features(condition, wax) @ coef[wax features]
+               (+ the wax's Bradley-Terry strength in that condition bucket)
+
+Confidence is the modelled probability of beating the average candidate, and
+results below CONFIDENCE_THRESHOLD are suppressed.
+
+The models are the promoted artifact version, which online.py replaces as
+sessions arrive between full trainings. Until MIN_SAMPLES_FOR_PREDICTION
+sessions exist (or while no version has been promoted), there is no model to
+trust and candidates are ranked by rules instead: how close the temperature
+is to the middle of the wax's temperature range.
+
+The global recommender behind recommend() also adds each wax's Bradley-Terry
+strength for the condition bucket (see ratings.load_or_fit_ratings), so the
+waxes' own head-to-head results count besides their temperature ranges. It is
+rebuilt when the data version or the promoted version changes.
+"""
+
+from dataclasses import dataclass
+import warnings
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import CONFIDENCE_THRESHOLD, MIN_SAMPLES_FOR_PREDICTION
+from app.data.data_types import SkiModel, TestSession, WaxProduct
+from app.data.data_version import data_version
+from app.data.database.session import get_db
+from app.models.artifacts import ArtifactStore, WaxModels, load_models
+from app.models.features import WAX_FEATURES, wax_condition_features
+from app.models.ratings import WaxRatings, condition_buckets, load_or_fit_ratings
+
+# Waxes whose range misses the temperature by at most this much are still scored
+RANGE_TOLERANCE = 1.0  # Celsius
+
+# Wax types that cannot be used on a ski category
+EXCLUDED_WAX_TYPES = {"skate": {"kick"}}
+
+
+@dataclass(frozen=True)
+class Recommendation:
+    """A suggested wax for one set of conditions."""
+
+    wax_id: int
+    brand: str
+    product_name: str
+    confidence: float  # Probability of beating the average candidate wax
+    expected_margin: float  # Meters ahead of the average candidate wax (NaN for rules)
+    source: str = "model"  # "model", or "rules" below MIN_SAMPLES_FOR_PREDICTION/without a model
+
+
+class WaxIntervalIndex:
+    """Wax products sorted by temp_range_low for fast temperature prefiltering.
+
+    Waxes without a known temperature range are candidates for every
+    temperature.
+    """
+
+    def __init__(self, waxes: pd.DataFrame):
+        """
+        Args:
+            waxes: DataFrame with id, brand, product_name, wax_type,
+                temp_range_low and temp_range_high
+        """
+        known = waxes["temp_range_low"].notna() & waxes["temp_range_high"].notna()
+        ranged = waxes[known].sort_values("temp_range_low", kind="stable")
+        self.waxes = pd.concat([ranged, waxes[~known]], ignore_index=True)
+        self.wax_ids = self.waxes["id"].to_numpy(dtype="int64")
+        self.low = self.waxes["temp_range_low"].to_numpy(dtype="float32", na_value=np.nan)
+        self.high = self.waxes["temp_range_high"].to_numpy(dtype="float32", na_value=np.nan)
+        self.wax_types = self.waxes["wax_type"].to_numpy()
+        self.n_ranged = len(ranged)
+
+    def __len__(self):
+        return len(self.wax_ids)
+
+    @classmethod
+    def from_db(cls, db: Session) -> "WaxIntervalIndex":
+        rows = db.execute(
+            select(
+                WaxProduct.id,
+                WaxProduct.brand,
+                WaxProduct.product_name,
+                WaxProduct.wax_type,
+                WaxProduct.temp_range_low,
+                WaxProduct.temp_range_high,
+            )
+        ).all()
+        columns = ["id", "brand", "product_name", "wax_type", "temp_range_low", "temp_range_high"]
+        return cls(pd.DataFrame(rows, columns=columns))
+
+    def candidates(self, temperature, tolerance: float = RANGE_TOLERANCE) -> np.ndarray:
+        """Boolean (n_conditions, n_waxes) mask of waxes whose range covers each temperature.
+
+        Args:
+            temperature: Array-like of temperatures (Celsius)
+            tolerance: Allowed distance outside the wax's range
+
+        Returns:
+            Mask over waxes in index order
+        """
+        temperature = np.asarray(temperature, dtype="float32")
+        # Ranged waxes before `cut` start at or below the temperature
+        cut = np.searchsorted(self.low[: self.n_ranged], temperature + tolerance, side="right")
+        positions = np.arange(len(self))
+        with np.errstate(invalid="ignore"):
+            covers = self.high >= (temperature - tolerance)[:, None]
+        mask = (positions < cut[:, None]) & covers
+        mask[:, self.n_ranged :] = True
+        return mask
+
+    def range_fit(self, temperature, tolerance: float = RANGE_TOLERANCE) -> np.ndarray:
+        """Rule-based (n_conditions, n_waxes) score of how well each range fits.
+
+        1.0 at the middle of a wax's temperature range, falling linearly to 0
+        at `tolerance` beyond either end; 0 for waxes without a known range.
+        """
+        temperature = np.asarray(temperature, dtype="float32")[:, None]
+        with np.errstate(invalid="ignore"):
+            half_width = (self.high - self.low) / 2 + tolerance
+            fit = 1.0 - np.abs(temperature - (self.low + self.high) / 2) / half_width
+        return np.nan_to_num(np.clip(fit, 0.0, 1.0))
+
+
+class WaxRecommender:
+    """Scores candidate waxes with a trained model version (and optional ratings)."""
+
+    def __init__(
+        self,
+        models: WaxModels | None,
+        index: WaxIntervalIndex,
+        n_sessions: int,
+        ratings: WaxRatings | None = None,
+        ski_categories: dict[int, str] | None = None,
+    ):
+        self.models = models
+        self.index = index
+        self.n_sessions = n_sessions
+        self.ski_categories = ski_categories or {}
+        self.winner_coef = self.margin_coef = None
+        if models is not None:
+            columns = [models.feature_names.index(f"wax_diff_{name}") for name in WAX_FEATURES]
+            self.winner_coef = np.asarray(models.winner.coef[columns], dtype="float32")
+            self.margin_coef = np.asarray(models.margin.coef[columns], dtype="float32")
+
+        self.bucket_strength = None
+        if ratings is not None and len(ratings.wax_ids):
+            strength = (
+                ratings.bucket_strength
+                if ratings.bucket_strength is not None
+                else ratings.strength[None, :]
+            )
+            position = np.minimum(
+                np.searchsorted(ratings.wax_ids, index.wax_ids), len(ratings.wax_ids) - 1
+            )
+            rated = ratings.wax_ids[position] == index.wax_ids
+            # (n_buckets, n_waxes) in index order, 0 for waxes without ratings
+            self.bucket_strength = np.where(rated, strength[:, position], 0.0).astype("float32")
+
+    @classmethod
+    def from_db(
+        cls,
+        db: Session,
+        store: ArtifactStore | None = None,
+        ratings: WaxRatings | None = None,
+    ) -> "WaxRecommender":
+        """Build a recommender from the promoted model and the current catalog.
+
+        Below MIN_SAMPLES_FOR_PREDICTION sessions no model is loaded, and
+        without a promoted version none can be; the recommender then uses
+        rules (with a RuntimeWarning in the latter case).
+        """
+        skis = db.execute(select(SkiModel.id, SkiModel.category)).all()
+        n_sessions = db.scalar(select(func.count(TestSession.id)))
+        models = None
+        if n_sessions >= MIN_SAMPLES_FOR_PREDICTION:
+            try:
+                models = load_models(store=store)
+            except ValueError as error:
+                warnings.warn(f"{error}; recommending by rules", RuntimeWarning, stacklevel=2)
+        return cls(
+            models=models,
+            index=WaxIntervalIndex.from_db(db),
+            n_sessions=n_sessions,
+            ratings=ratings,
+            ski_categories=dict(skis),
+        )
+
+    @property
+    def uses_rules(self) -> bool:
+        """Whether recommendations come from rules instead of the model."""
+        return self.models is None or self.n_sessions < MIN_SAMPLES_FOR_PREDICTION
+
+    def _candidates(self, temperature: np.ndarray, ski_id: int | None) -> np.ndarray:
+        mask = self.index.candidates(temperature)
+        excluded = EXCLUDED_WAX_TYPES.get(self.ski_categories.get(ski_id), set())
+        if excluded:
+            mask &= ~np.isin(self.index.wax_types, list(excluded))
+        return mask
+
+    def score(self, conditions: pd.DataFrame, ski_id: int | None = None):
+        """Score every candidate wax for every condition row with the model.
+
+        Args:
+            conditions: DataFrame with a temperature column (snow_moisture is
+                used by condition-bucketed ratings when present)
+            ski_id: Optional ski; waxes unusable on its category are excluded
+
+        Returns:
+            Tuple of (confidence, expected_margin) arrays of shape
+            (n_conditions, n_waxes) in index order, NaN for non-candidates
+        """
+        temperature = conditions["temperature"].to_numpy(dtype="float32")
+        mask = self._candidates(temperature, ski_id)
+
+        # Wax features depend only on the temperature, so score each distinct
+        # temperature once (inputs are usually rounded to 0.1 degrees)
+        unique, inverse = np.unique(temperature, return_inverse=True)
+        features = wax_condition_features(
+            unique[:, None], self.index.low[None, :], self.index.high[None, :]
+        )
+        decision = (features @ self.winner_coef)[inverse]
+        margin = (features @ self.margin_coef)[inverse]
+        if self.bucket_strength is not None:
+            moisture = conditions.get("snow_moisture", pd.Series([None] * len(conditions)))
+            decision += self.bucket_strength[condition_buckets(temperature, moisture)]
+
+        # Compare each candidate with the average candidate of its condition row
+        n_candidates = np.maximum(mask.sum(axis=1, keepdims=True), 1)
+        decision -= np.where(mask, decision, 0).sum(axis=1, keepdims=True) / n_candidates
+        margin -= np.where(mask, margin, 0).sum(axis=1, keepdims=True) / n_candidates
+        confidence = 1.0 / (1.0 + np.exp(-decision))
+        confidence[~mask] = np.nan
+        margin[~mask] = np.nan
+        return confidence, margin
+
+    def score_rules(self, conditions: pd.DataFrame, ski_id: int | None = None):
+        """Rule-based counterpart of score(): range fit as confidence, no margin.
+
+        Returns:
+            Tuple of (confidence, expected_margin) arrays like score(); waxes
+            without a known temperature range are not candidates
+        """
+        temperature = conditions["temperature"].to_numpy(dtype="float32")
+        mask = self._candidates(temperature, ski_id)
+        confidence = self.index.range_fit(temperature)
+        mask &= confidence > 0
+        confidence[~mask] = np.nan
+        return confidence, np.full(confidence.shape, np.nan, dtype="float32")
+
+    def recommend_batch(
+        self,
+        conditions: pd.DataFrame | list[dict],
+        ski_id: int | None = None,
+        top_k: int = 5,
+        threshold: float = CONFIDENCE_THRESHOLD,
+    ) -> list[list[Recommendation]]:
+        """Recommend up to top_k waxes for each condition row.
+
+        Args:
+            conditions: DataFrame or list of dicts with test_sessions condition columns
+            ski_id: Optional ski the wax is for
+            top_k: Maximum recommendations per row
+            threshold: Minimum confidence; weaker suggestions are dropped
+
+        Returns:
+            One list of Recommendations per condition row, best first. While
+            uses_rules (fewer than MIN_SAMPLES_FOR_PREDICTION sessions, or no
+            promoted model), waxes are ranked by score_rules() and the
+            threshold does not apply.
+        """
+        if not isinstance(conditions, pd.DataFrame):
+            conditions = pd.DataFrame(list(conditions))
+        if len(self.index) == 0 or top_k < 1:
+            return [[] for _ in range(len(conditions))]
+
+        if self.uses_rules:
+            source = "rules"
+            confidence, margin = self.score_rules(conditions, ski_id=ski_id)
+            threshold = 0.0
+        else:
+            source = "model"
+            confidence, margin = self.score(conditions, ski_id=ski_id)
+        with np.errstate(invalid="ignore"):
+            ranked = np.where(confidence >= threshold, confidence, -np.inf)
+        k = min(top_k, ranked.shape[1])
+        top = np.argpartition(-ranked, k - 1, axis=1)[:, :k]
+        rows = np.arange(len(ranked))[:, None]
+        top = np.take_along_axis(top, np.argsort(-ranked[rows, top], axis=1), axis=1)
+
+        found = np.take_along_axis(ranked, top, axis=1) > -np.inf
+        wax_ids = self.index.wax_ids[top].tolist()
+        brands = self.index.waxes["brand"].to_numpy()[top].tolist()
+        names = self.index.waxes["product_name"].to_numpy()[top].tolist()
+        confidences = np.take_along_axis(confidence, top, axis=1).tolist()
+        margins = np.take_along_axis(margin, top, axis=1).tolist()
+        results = []
+        for row, row_found in enumerate(found.tolist()):
+            results.append(
+                [
+                    Recommendation(
+                        wax_ids[row][i],
+                        brands[row][i],
+                        names[row][i],
+                        confidences[row][i],
+                        margins[row][i],
+                        source,
+                    )
+                    for i, is_found in enumerate(row_found)
+                    if is_found
+                ]
+            )
+        return results
+
+    def recommend(
+        self, conditions: dict, ski_id: int | None = None, top_k: int = 5
+    ) -> list[Recommendation]:
+        """Recommend up to top_k waxes for one set of conditions."""
+        return self.recommend_batch([conditions], ski_id=ski_id, top_k=top_k)[0]
+
+
+# Global recommender (lazy loaded) and the (data version, promoted version) it was built from
+_recommender: WaxRecommender | None = None
+_recommender_built_from: tuple | None = None
+
+
+def get_recommender() -> WaxRecommender:
+    """Get the global recommender, rebuilding it if its inputs changed.
+
+    Commits through get_db() bump the data version, so a recommender built
+    below MIN_SAMPLES_FOR_PREDICTION sessions switches from rules to the
+    model once enough sessions are recorded. Versions promoted by training or
+    by the online learner (in any process) replace the model. The saved
+    ratings are brought up to date on each rebuild.
+    """
+    global _recommender, _recommender_built_from
+    state = (data_version(), ArtifactStore().latest())
+    if _recommender is None or state != _recommender_built_from:
+        with get_db(readonly=True) as db:
+            _recommender = WaxRecommender.from_db(db, ratings=load_or_fit_ratings(db))
+        _recommender_built_from = state
+    return _recommender
+
+
+def recommend(conditions: dict, ski_id: int | None = None, top_k: int = 5) -> list[Recommendation]:
+    """Recommend waxes for current conditions.
+
+    Args:
+        conditions: Condition values, at least temperature, e.g.
+            {"temperature": -5.0, "snow_type": "transformed", "snow_moisture": "dry"}
+        ski_id: Optional ski_models id the wax is for
+        top_k: Maximum number of recommendations
+
+    Returns:
+        Recommendations best first; rule-based below MIN_SAMPLES_FOR_PREDICTION
+        sessions or without a promoted model, empty when no wax reaches
+        CONFIDENCE_THRESHOLD
+
+    Example:
+        for suggestion in recommend({"temperature": -5.0, "snow_moisture": "dry"}):
+            print(suggestion.brand, suggestion.product_name, suggestion.confidence)
+    """
+    return get_recommender().recommend(conditions, ski_id=ski_id, top_k=top_k)
+
+
+def recommend_batch(
+    conditions: pd.DataFrame | list[dict], ski_id: int | None = None, top_k: int = 5
+) -> list[list[Recommendation]]:
+    """Recommend waxes for many condition rows at once (see recommend())."""
+    return get_recommender().recommend_batch(conditions, ski_id=ski_id, top_k=top_k)
@@ -0,0 +1,359 @@
+"""Cross-validated training of the winner classifier and margin regressor.
+
+Every (model, grid point, fold) combination is an independent task run on a
+process pool. Workers never receive the feature matrix through pickling: the
+cached .npy files from app.models.features are opened memory-mapped in each
+worker, together with a small fold-assignment array, so a task message is
+just a few integers and the OS page cache holds one copy of the data.
+
+Usage:
+    python -m app.models.train [--workers N] [--folds K] [--max-rows N] [--promote]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import os
+from pathlib import Path
+import time
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.metrics import accuracy_score, log_loss, mean_squared_error
+from sklearn.model_selection import ParameterGrid
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app.config import RANDOM_SEED, TEST_SIZE, VALIDATION_SIZE
+from app.models.artifacts import ArtifactStore, LinearModel, WaxModels, artifact_version
+from app.models.features import (
+    FEATURE_CACHE_DIR,
+    SCHEMA_VERSION,
+    build_feature_matrix,
+    cached_array_paths,
+)
+
+# Fold ids of rows in the held-out test split and rows left out by --max-rows
+TEST_FOLD = -1
+EXCLUDED_FOLD = -2
+
+# Hyperparameter grids per target; every point is cross-validated
+PARAM_GRIDS = {
+    "winner": {"alpha": [1e-5, 1e-4, 1e-3], "penalty": ["l2", "elasticnet"]},
+    "margin": {"alpha": [1e-5, 1e-4, 1e-3], "epsilon": [0.5, 1.0, 2.0]},
+}
+
+# Label array of each target in the feature cache
+TARGETS = {"winner": "y_won", "margin": "y_margin"}
+
+
+def make_model(target: str, params: dict) -> Pipeline:
+    """Create an unfitted model for a target.
+
+    Args:
+        target: "winner" (log-loss classifier) or "margin" (Huber regressor)
+        params: Hyperparameters for the SGD estimator
+
+    Returns:
+        scikit-learn Pipeline of StandardScaler and the estimator
+
+    Raises:
+        ValueError: If target is unknown
+    """
+    if target == "winner":
+        estimator = SGDClassifier(loss="log_loss", random_state=RANDOM_SEED, **params)
+    elif target == "margin":
+        estimator = SGDRegressor(loss="huber", random_state=RANDOM_SEED, **params)
+    else:
+        raise ValueError(f"Unknown target '{target}', expected one of {list(TARGETS)}")
+    return make_pipeline(StandardScaler(), estimator)
+
+
+def score_model(target: str, model: Pipeline, X: np.ndarray, y: np.ndarray) -> dict[str, float]:
+    """Evaluate a fitted model; the first metric is the one to minimize.
+
+    Returns:
+        {"log_loss", "accuracy"} for the winner model, {"rmse"} for the margin model
+    """
+    if target == "winner":
+        probabilities = model.predict_proba(X)[:, 1]
+        return {
+            "log_loss": log_loss(y, probabilities, labels=[0.0, 1.0]),
+            "accuracy": accuracy_score(y, probabilities >= 0.5),
+        }
+    return {"rmse": float(np.sqrt(mean_squared_error(y, model.predict(X))))}
+
+
+def _primary(target: str) -> str:
+    """Name of the metric minimized during model selection."""
+    return "log_loss" if target == "winner" else "rmse"
+
+
+def assign_folds(n_rows: int, n_folds: int, seed: int = RANDOM_SEED) -> np.ndarray:
+    """Randomly hold out TEST_SIZE of the rows and split the rest into folds.
+
+    Args:
+        n_rows: Number of rows in the feature matrix
+        n_folds: Number of cross-validation folds
+        seed: Random seed
+
+    Returns:
+        int8 array with a fold id in [0, n_folds) per row, TEST_FOLD for test rows
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(n_rows)
+    n_test = round(n_rows * TEST_SIZE)
+    folds = np.empty(n_rows, dtype="int8")
+    folds[order[:n_test]] = TEST_FOLD
+    folds[order[n_test:]] = np.arange(n_rows - n_test) % n_folds
+    return folds
+
+
+# Memory-mapped arrays of the current worker process, opened by _init_worker
+_worker_arrays: dict[str, np.ndarray] = {}
+
+
+def _init_worker(paths: dict[str, str]):
+    """Open the shared arrays read-only in a pool worker."""
+    _worker_arrays.clear()
+    for name, path in paths.items():
+        _worker_arrays[name] = np.load(path, mmap_mode="r")
+
+
+def _fit_fold(target: str, params: dict, fold: int) -> dict:
+    """Fit on every training fold except fold and score on fold."""
+    start, cpu_start = time.perf_counter(), time.process_time()
+    folds = _worker_arrays["folds"]
+    train = np.flatnonzero((folds >= 0) & (folds != fold))
+    valid = np.flatnonzero(folds == fold)
+    X, y = _worker_arrays["X"], _worker_arrays[TARGETS[target]]
+    model = make_model(target, params)
+    model.fit(X[train], y[train])
+    return {
+        "target": target,
+        "params": params,
+        "fold": fold,
+        "scores": score_model(target, model, X[valid], y[valid]),
+        "seconds": time.perf_counter() - start,
+        "cpu_seconds": time.process_time() - cpu_start,
+        "pid": os.getpid(),
+    }
+
+
+@dataclass
+class TrainingReport:
+    """Cross-validation results and the selected configuration per target."""
+
+    fold_results: list[dict]
+    best_params: dict[str, dict] = field(default_factory=dict)
+    cv_scores: dict[str, dict[str, float]] = field(default_factory=dict)
+    test_scores: dict[str, dict[str, float]] = field(default_factory=dict)
+    models: dict[str, Pipeline] = field(default_factory=dict)
+    cv_seconds: float = 0.0
+    seconds: float = 0.0
+    version: str | None = None  # Artifact version, when saved
+
+    @property
+    def speedup(self) -> float:
+        """Summed fold CPU time over cross-validation wall-clock time."""
+        busy = sum(result["cpu_seconds"] for result in self.fold_results)
+        return busy / self.cv_seconds if self.cv_seconds > 0 else 0.0
+
+    def __str__(self):
+        lines = []
+        for target in self.best_params:
+            cv = ", ".join(f"{k} {v:.4f}" for k, v in self.cv_scores[target].items())
+            test = ", ".join(f"{k} {v:.4f}" for k, v in self.test_scores[target].items())
+            lines.append(f"{target}: {self.best_params[target]}")
+            lines.append(f"    cv   {cv}")
+            lines.append(f"    test {test}")
+        lines.append(
+            f"{len(self.fold_results)} fold fits in {self.cv_seconds:.1f}s "
+            f"({self.speedup:.1f}x parallel speedup), {self.seconds:.1f}s total"
+        )
+        if self.version:
+            lines.append(f"Saved model version {self.version}")
+        return "\n".join(lines)
+
+
+def _mean_scores(results: list[dict]) -> dict[str, float]:
+    return {
+        name: float(np.mean([r["scores"][name] for r in results])) for name in results[0]["scores"]
+    }
+
+
+def cross_validate(
+    paths: dict[str, str],
+    n_folds: int,
+    targets: list[str],
+    max_workers: int | None = None,
+) -> list[dict]:
+    """Run every (target, grid point, fold) fit on a process pool.
+
+    Args:
+        paths: .npy paths of X, the label arrays and "folds"
+        n_folds: Number of folds in the folds array
+        targets: Targets to train, keys of PARAM_GRIDS
+        max_workers: Pool size (defaults to the number of CPUs)
+
+    Returns:
+        One result dict per fit with target, params, fold, scores, seconds,
+        cpu_seconds and pid
+    """
+    tasks = [
+        (target, params, fold)
+        for target in targets
+        for params in ParameterGrid(PARAM_GRIDS[target])
+        for fold in range(n_folds)
+    ]
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(paths,)
+    ) as pool:
+        futures = [pool.submit(_fit_fold, *task) for task in tasks]
+        return [future.result() for future in futures]
+
+
+def train(
+    n_folds: int | None = None,
+    max_workers: int | None = None,
+    targets: list[str] | None = None,
+    max_rows: int | None = None,
+    cache_dir: Path = FEATURE_CACHE_DIR,
+    store: ArtifactStore | None = None,
+    promote: bool = False,
+) -> TrainingReport:
+    """Grid-search both models with cross-validation and evaluate the best on the test split.
+
+    Args:
+        n_folds: Cross-validation folds (defaults to 1 / VALIDATION_SIZE)
+        max_workers: Process pool size (defaults to the number of CPUs)
+        targets: Subset of "winner" and "margin" (default: both)
+        max_rows: Only use the first max_rows sessions (for quick runs)
+        cache_dir: Feature cache directory; its .npy files are shared with workers
+        store: If given, save both refitted models there as a new artifact version
+        promote: If True, also point the store's LATEST at the saved version
+
+    Returns:
+        TrainingReport with per-fold results, best parameters and refitted models
+
+    Raises:
+        ValueError: If there are too few sessions, or a store is given without
+            training both targets
+    """
+    start = time.perf_counter()
+    n_folds = n_folds or max(2, round(1 / VALIDATION_SIZE))
+    targets = targets or list(PARAM_GRIDS)
+    if store is not None and set(targets) != set(PARAM_GRIDS):
+        raise ValueError("Saving model artifacts requires training both targets")
+
+    features = build_feature_matrix(
+        cache_dir=cache_dir, max_workers=max_workers or os.cpu_count() or 1
+    )
+    n_rows = len(features) if max_rows is None else min(max_rows, len(features))
+    if n_rows < 2 * n_folds:
+        raise ValueError(f"Need at least {2 * n_folds} test sessions to train, found {n_rows}")
+
+    folds = np.full(len(features), EXCLUDED_FOLD, dtype="int8")
+    folds[:n_rows] = assign_folds(n_rows, n_folds)
+    folds_path = Path(cache_dir) / "folds.npy"
+    np.save(folds_path, folds)
+    cached = cached_array_paths(cache_dir)
+    paths = {name: str(cached[name]) for name in ["X", *TARGETS.values()]}
+    paths["folds"] = str(folds_path)
+
+    cv_start = time.perf_counter()
+    results = cross_validate(paths, n_folds, targets, max_workers=max_workers)
+    report = TrainingReport(fold_results=results, cv_seconds=time.perf_counter() - cv_start)
+
+    train_rows = np.flatnonzero(folds >= 0)
+    test_rows = np.flatnonzero(folds == TEST_FOLD)
+    for target in targets:
+        by_params = {}
+        for result in results:
+            if result["target"] == target:
+                by_params.setdefault(repr(result["params"]), []).append(result)
+        best = min(by_params.values(), key=lambda group: _mean_scores(group)[_primary(target)])
+        y = getattr(features, TARGETS[target])
+        model = make_model(target, best[0]["params"])
+        model.fit(features.X[train_rows], y[train_rows])
+        report.best_params[target] = best[0]["params"]
+        report.cv_scores[target] = _mean_scores(best)
+        report.test_scores[target] = score_model(
+            target, model, features.X[test_rows], y[test_rows]
+        )
+        report.models[target] = model
+
+    if store is not None:
+        snapshot = {
+            "schema_version": SCHEMA_VERSION,
+            "watermark": features.watermark,
+            "n_rows": n_rows,
+        }
+        version = artifact_version(
+            [features.session_ids[:n_rows], features.y_won[:n_rows], features.y_margin[:n_rows]],
+            snapshot,
+            extra={"param_grids": PARAM_GRIDS, "n_folds": n_folds},
+        )
+        models = WaxModels(
+            version=version,
+            feature_names=features.feature_names,
+            winner=LinearModel.from_pipeline(report.models["winner"]),
+            margin=LinearModel.from_pipeline(report.models["margin"]),
+        )
+        store.save(
+            version,
+            models.to_arrays(),
+            {
+                **snapshot,
+                "feature_names": features.feature_names,
+                "best_params": report.best_params,
+                "cv_scores": report.cv_scores,
+                "test_scores": report.test_scores,
+            },
+            promote=promote,
+        )
+        report.version = version
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main():
+    """CLI entry point for model training."""
+    parser = argparse.ArgumentParser(description="Train WAX-AI models with cross-validation")
+    parser.add_argument("--workers", type=int, help="Process pool size (default: all CPUs)")
+    parser.add_argument(
+        "--folds", type=int, help="Cross-validation folds (default: 1 / VALIDATION_SIZE)"
+    )
+    parser.add_argument(
+        "--target", choices=list(PARAM_GRIDS), action="append", help="Only train this model"
+    )
+    parser.add_argument("--max-rows", type=int, help="Only use the first N sessions")
+    parser.add_argument("--save", action="store_true", help="Save the best models to MODELS_DIR")
+    parser.add_argument(
+        "--promote", action="store_true", help="Save and make the models the LATEST version"
+    )
+    args = parser.parse_args()
+
+    report = train(
+        n_folds=args.folds,
+        max_workers=args.workers,
+        targets=args.target,
+        max_rows=args.max_rows,
+        store=ArtifactStore() if args.save or args.promote else None,
+        promote=args.promote,
+    )
+
+    print("Per-fold timing:")
+    for result in report.fold_results:
+        scores = ", ".join(f"{k} {v:.4f}" for k, v in result["scores"].items())
+        print(
+            f"  {result['target']:<6} fold {result['fold']} {result['params']} "
+            f"{result['seconds']:.2f}s ({result['cpu_seconds']:.2f}s cpu) "
+            f"[pid {result['pid']}] {scores}"
+        )
+    print(f"\n✅ Best configuration\n{report}")
+
+
+if __name__ == "__main__":
+    main()
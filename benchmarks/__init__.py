@@ -0,0 +1 @@
+"""Performance benchmarks for WAX-AI (run from the project root with python -m)."""
@@ -0,0 +1,159 @@
+"""Benchmark: concurrent async query fan-out vs. sequential sync queries.
+
+Each request runs the same four queries a recommendation page needs (sessions
+for a wax, sessions in a temperature range, wax products, ski models), either
+one after another through get_db() or concurrently through run_concurrently().
+
+Usage:
+    python -m benchmarks.async_queries [--sessions N] [--requests N] [--rtt-ms MS]
+
+Without DATABASE_URL a temporary SQLite database is created and seeded. A local
+SQLite file has no network round trip, so --rtt-ms adds a simulated per-query
+round trip to both variants to model a remote PostgreSQL server.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+import os
+from pathlib import Path
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+
+def seed_database(n_sessions: int):
+    """Create tables, sample skis/waxes and n_sessions random test sessions."""
+    from app.data.database.ingest import insert_records
+    from app.data.database.init_db import create_tables, populate_sample_data
+    from app.data.database.session import get_db
+
+    create_tables()
+    populate_sample_data()
+    rng = np.random.default_rng(0)
+    distance = rng.normal(0, 2, n_sessions)
+    with get_db() as db:
+        records = [
+            {
+                "test_date": datetime(2024, 11, 1) + timedelta(minutes=i),
+                "location": "Benchmark Track",
+                "temperature": float(t),
+                "snow_type": "transformed",
+                "test_course_length": 100.0,
+                "reference_ski_id": 1,
+                "reference_wax_id": int(r),
+                "test_ski_id": 2,
+                "test_wax_id": int(w),
+                "distance_between_skis": float(d),
+                "test_ski_won": bool(d > 0),
+            }
+            for i, t, r, w, d in zip(
+                range(n_sessions),
+                rng.normal(-5, 4, n_sessions),
+                rng.integers(1, 7, n_sessions),
+                rng.integers(1, 7, n_sessions),
+                distance,
+            )
+        ]
+        insert_records(db, records)
+
+
+def sync_request(rtt: float):
+    from sqlalchemy import select
+
+    from app.data.data_types import SkiModel, WaxProduct
+    from app.data.database.async_session import test_sessions_statement
+    from app.data.database.session import get_db
+
+    statements = [
+        test_sessions_statement(wax_id=2, limit=200),
+        test_sessions_statement(min_temperature=-8, max_temperature=-4, limit=200),
+        select(WaxProduct),
+        select(SkiModel),
+    ]
+    with get_db(readonly=True) as db:
+        for statement in statements:
+            time.sleep(rtt)
+            db.scalars(statement).all()
+
+
+async def async_request(rtt: float):
+    from app.data.database.async_session import (
+        get_ski_models,
+        get_test_sessions,
+        get_wax_products,
+        run_concurrently,
+    )
+
+    def with_rtt(query):
+        async def run(db):
+            await asyncio.sleep(rtt)
+            return await query(db)
+
+        return run
+
+    await run_concurrently(
+        with_rtt(lambda db: get_test_sessions(db, wax_id=2, limit=200)),
+        with_rtt(
+            lambda db: get_test_sessions(db, min_temperature=-8, max_temperature=-4, limit=200)
+        ),
+        with_rtt(get_wax_products),
+        with_rtt(get_ski_models),
+    )
+
+
+def summarize(label: str, latencies: list[float]):
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    p50 = statistics.median(latencies_ms)
+    p99 = latencies_ms[min(len(latencies_ms) - 1, int(0.99 * len(latencies_ms)))]
+    print(f"{label:<28} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms")
+
+
+async def run_async(requests: int, rtt: float) -> list[float]:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await async_request(rtt)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50_000, help="Sessions to seed")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per variant")
+    parser.add_argument(
+        "--rtt-ms", type=float, default=0.0, help="Simulated network round trip per query"
+    )
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    if not os.getenv("DATABASE_URL"):
+        path = Path(tempfile.mkdtemp()) / "benchmark.db"
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        print(f"Seeding {args.sessions} sessions into {path}...")
+        seed_database(args.sessions)
+
+    sync_request(rtt)  # warm up pool and mappers
+    latencies = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        sync_request(rtt)
+        latencies.append(time.perf_counter() - start)
+    summarize("sync get_db (sequential)", latencies)
+
+    async def run():
+        await async_request(rtt)  # warm up
+        result = await run_async(args.requests, rtt)
+        from app.data.database.async_session import get_async_engine
+
+        await get_async_engine(readonly=True).dispose()
+        return result
+
+    summarize("async get_async_db (gather)", asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark: bootstrap intervals of one large condition bucket.
+
+Random head-to-head sessions between --waxes waxes with hidden strengths
+are resampled --resamples times with app.models.bootstrap, once in this
+process and once on a process pool, reporting wall-clock time and
+resamples x sessions per second. No database is needed.
+
+Usage:
+    python -m benchmarks.bootstrap [--sessions N] [--waxes N] [--resamples N] [--workers N]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+def random_comparisons(n_sessions: int, n_waxes: int, seed: int = 0):
+    from app.models.ratings import Comparisons
+
+    rng = np.random.default_rng(seed)
+    strength = rng.normal(size=n_waxes)
+    test, reference = rng.integers(0, n_waxes, size=(2, n_sessions))
+    advantage = strength[test] - strength[reference]
+    won = rng.random(n_sessions) < 1 / (1 + np.exp(-advantage))
+    return Comparisons(
+        test_wax=test,
+        reference_wax=reference,
+        test_won=won.astype("float64"),
+        margin=advantage + rng.normal(size=n_sessions),
+        weight=rng.integers(1, 6, n_sessions) / 5,
+        bucket=np.zeros(n_sessions, dtype="int64"),
+        session_id=np.arange(n_sessions),
+    )
+
+
+def main():
+    from app.models.bootstrap import bootstrap_intervals
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100_000, help="Sessions in the bucket")
+    parser.add_argument("--waxes", type=int, default=200, help="Distinct waxes")
+    parser.add_argument("--resamples", type=int, default=2000, help="Bootstrap resamples")
+    parser.add_argument("--workers", type=int, help="Pool size (default: number of CPUs)")
+    args = parser.parse_args()
+
+    comparisons = random_comparisons(args.sessions, args.waxes)
+    print(f"{'mode':<8} {'seconds':>8} {'draws/sec':>14}")
+    for mode, workers in (("serial", 1), ("pool", args.workers)):
+        start = time.perf_counter()
+        intervals = bootstrap_intervals(comparisons, args.resamples, max_workers=workers)
+        seconds = time.perf_counter() - start
+        rate = args.resamples * args.sessions / seconds
+        print(f"{mode:<8} {seconds:>8.2f} {rate:>14,.0f}")
+    width = np.nanmean(intervals.win_high - intervals.win_low)
+    print(f"Mean win probability interval width: {width:.3f} ({intervals.level:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark: import time of the app entry points against a checked-in budget.
+
+Each entry point in import_budget.json is imported in a fresh interpreter
+with -X importtime, and the cumulative time of its top-level import is the
+median of --repeat runs. An entry point fails when that time exceeds its
+budget_ms, or when it imports any of its forbidden packages (heavy ML and
+plotting dependencies belong on the code paths that use them, not at
+module top level).
+
+Usage:
+    python -m benchmarks.import_time [--repeat N] [--budget FILE] [--update]
+
+Exits with status 1 if any entry point is over budget. --update rewrites
+the budgets as the measured times times --headroom instead of checking.
+"""
+
+import argparse
+import json
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+
+BUDGET_PATH = Path(__file__).with_name("import_budget.json")
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure_import(module: str) -> tuple[float, set[str]]:
+    """Import a module in a fresh interpreter.
+
+    Args:
+        module: Dotted module name
+
+    Returns:
+        Tuple of (cumulative import time in ms, top-level packages imported)
+
+    Raises:
+        ValueError: If the import fails
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=False,  # Failures are raised below with the interpreter's stderr
+    )
+    if result.returncode != 0:
+        raise ValueError(f"Importing {module} failed:\n{result.stderr}")
+
+    cumulative_us = None
+    packages = set()
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        packages.add(name.strip().split(".")[0])
+        if name.strip() == module:
+            cumulative_us = int(cumulative)
+    if cumulative_us is None:
+        raise ValueError(f"No -X importtime entry for {module}")
+    return cumulative_us / 1000, packages
+
+
+def check_budget(module: str, spec: dict, repeat: int) -> tuple[float, list[str]]:
+    """Measure one entry point and list its budget violations.
+
+    Args:
+        module: Dotted module name
+        spec: Entry of import_budget.json ({"budget_ms": ..., "forbidden": [...]})
+        repeat: Number of fresh-interpreter imports to take the median of
+
+    Returns:
+        Tuple of (median import time in ms, violation messages)
+    """
+    times = []
+    packages = set()
+    for _ in range(repeat):
+        elapsed, imported = measure_import(module)
+        times.append(elapsed)
+        packages |= imported
+    median = statistics.median(times)
+
+    violations = []
+    if median > spec["budget_ms"]:
+        violations.append(f"{median:.0f} ms exceeds the {spec['budget_ms']} ms budget")
+    forbidden = sorted(packages & set(spec.get("forbidden", [])))
+    if forbidden:
+        violations.append(f"imports {', '.join(forbidden)}")
+    return median, violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Imports per entry point")
+    parser.add_argument("--budget", type=Path, default=BUDGET_PATH, help="Budget JSON file")
+    parser.add_argument(
+        "--update", action="store_true", help="Rewrite the budgets from the measured times"
+    )
+    parser.add_argument(
+        "--headroom", type=float, default=1.5, help="Budget / measured time for --update"
+    )
+    args = parser.parse_args()
+
+    budgets = json.loads(args.budget.read_text())
+    failed = False
+    print(f"{'entry point':<28} {'median ms':>10} {'budget ms':>10}")
+    for module, spec in budgets.items():
+        median, violations = check_budget(module, spec, args.repeat)
+        if args.update:
+            spec["budget_ms"] = int(round(median * args.headroom, -2)) or 100
+            violations = [v for v in violations if not v.endswith("budget")]
+        status = "✓" if not violations else "❌ " + "; ".join(violations)
+        print(f"{module:<28} {median:>10.0f} {spec['budget_ms']:>10}  {status}")
+        failed |= bool(violations)
+
+    if args.update:
+        args.budget.write_text(json.dumps(budgets, indent=2) + "\n")
+        print(f"✓ Budgets written to {args.budget}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark: full feature-matrix extract through one cursor vs. parallel id ranges.
+
+The serial variant is app.models.features.fetch_feature_matrix(); the
+parallel ones split test_sessions into id ranges with
+app.data.database.partitioned and fetch and encode each range on its own
+connection in a process or thread pool. Wall-clock time is the best of
+--repeat runs; the speedup follows the number of cores (and, for remote
+databases, the server's parallel capacity).
+
+Usage:
+    python -m benchmarks.partitioned [--sessions N] [--workers N] [--repeat N]
+
+Without DATABASE_URL a temporary SQLite database is created and seeded.
+"""
+
+import argparse
+import os
+from pathlib import Path
+import tempfile
+import time
+
+
+def best_time(fetch, repeat: int) -> tuple[int, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n_rows = len(fetch())
+        best = min(best, time.perf_counter() - start)
+    return n_rows, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200_000, help="Sessions to seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Pool size")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per variant")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        from benchmarks.async_queries import seed_database
+
+        path = Path(tempfile.mkdtemp()) / "benchmark.db"
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        print(f"Seeding {args.sessions} sessions into {path}...")
+        seed_database(args.sessions)
+
+    from app.data.database.session import get_db
+    from app.models.features import fetch_feature_matrix, fetch_feature_matrix_parallel
+
+    def serial():
+        with get_db(readonly=True) as db:
+            return fetch_feature_matrix(db)
+
+    variants = {
+        "serial": serial,
+        "process": lambda: fetch_feature_matrix_parallel(args.workers, executor="process"),
+        "thread": lambda: fetch_feature_matrix_parallel(args.workers, executor="thread"),
+    }
+    print(f"{'variant':<8} {'rows':>8} {'seconds':>8} {'rows/sec':>12}  ({args.workers} workers)")
+    for name, fetch in variants.items():
+        n_rows, seconds = best_time(fetch, args.repeat)
+        print(f"{name:<8} {n_rows:>8} {seconds:>8.2f} {n_rows / seconds:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
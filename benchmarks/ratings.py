@@ -0,0 +1,102 @@
+"""Benchmark: Bradley-Terry rating fit time and convergence checks.
+
+Fits WaxRatings on random head-to-head sessions between --waxes waxes and on
+two regression cases where diagonal (Jacobi) Newton steps used to diverge:
+two waxes compared only with each other, with 200 and 5,000 sessions in
+which the first wax wins 70%. Every fit must converge without a warning, to
+finite strengths whose penalized log-likelihood gradient is below --gtol;
+the two-wax strengths must favour the first wax by about logit(0.7).
+
+Usage:
+    python -m benchmarks.ratings [--sessions N] [--waxes N] [--gtol G]
+
+Exits with status 1 if any check fails.
+"""
+
+import argparse
+import sys
+import time
+import warnings
+
+import numpy as np
+
+
+def two_wax_comparisons(n_sessions: int, win_rate: float = 0.7, seed: int = 0):
+    from app.models.ratings import Comparisons
+
+    rng = np.random.default_rng(seed)
+    won = (rng.random(n_sessions) < win_rate).astype("float64")
+    return Comparisons(
+        test_wax=np.zeros(n_sessions, dtype="int64"),
+        reference_wax=np.ones(n_sessions, dtype="int64"),
+        test_won=won,
+        margin=2 * won - 1,
+        weight=np.ones(n_sessions),
+        bucket=np.zeros(n_sessions, dtype="int64"),
+        session_id=np.arange(n_sessions),
+    )
+
+
+def max_gradient(ratings, comparisons) -> float:
+    """Largest gradient entry of the global penalized log-likelihood at the fit."""
+    test = ratings._index(comparisons.test_wax)
+    reference = ratings._index(comparisons.reference_wax)
+    strength = ratings.strength
+    p = 0.5 * (1 + np.tanh(0.5 * (strength[test] - strength[reference])))
+    residual = comparisons.weight * (comparisons.test_won - p)
+    n = len(strength)
+    gradient = np.bincount(test, residual, n) - np.bincount(reference, residual, n)
+    return float(np.max(np.abs(gradient - ratings.l2 * strength)))
+
+
+def check_fit(name: str, comparisons, gtol: float) -> tuple[float, list[str]]:
+    """Fit ratings and list the violated convergence checks."""
+    from app.models.ratings import WaxRatings
+
+    problems = []
+    start = time.perf_counter()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        ratings = WaxRatings(by_condition=True).fit(comparisons)
+    seconds = time.perf_counter() - start
+    problems += [str(warning.message) for warning in caught]
+    if not np.all(np.isfinite(ratings.strength)):
+        problems.append("non-finite strengths")
+    gradient = max_gradient(ratings, comparisons)
+    if gradient > gtol:
+        problems.append(f"gradient {gradient:.2g} > {gtol:g}")
+    if name.startswith("two waxes"):
+        observed = comparisons.test_won.mean()
+        difference = ratings.strength[0] - ratings.strength[1]
+        if not 0 < difference < np.log(observed / (1 - observed)) + 0.05:
+            problems.append(f"strength difference {difference:.3f} outside (0, logit(win rate)]")
+    return seconds, problems
+
+
+def main():
+    from benchmarks.bootstrap import random_comparisons
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100_000, help="Random sessions")
+    parser.add_argument("--waxes", type=int, default=100, help="Distinct waxes")
+    parser.add_argument("--gtol", type=float, default=1e-6, help="Maximum final gradient")
+    args = parser.parse_args()
+
+    cases = {
+        "two waxes, 200": two_wax_comparisons(200),
+        "two waxes, 5000": two_wax_comparisons(5000),
+        f"{args.waxes} waxes, {args.sessions}": random_comparisons(args.sessions, args.waxes),
+    }
+    failed = False
+    print(f"{'case':<24} {'seconds':>8}")
+    for name, comparisons in cases.items():
+        seconds, problems = check_fit(name, comparisons, args.gtol)
+        status = "✓" if not problems else "❌ " + "; ".join(problems)
+        print(f"{name:<24} {seconds:>8.2f}  {status}")
+        failed |= bool(problems)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark: repository DTO reads vs. loading TestSession ORM instances.
+
+A list view shows every session with its ski and wax names. These ways to
+load it are compared:
+
+    orm_lazy      db.query(TestSession).all(), names via lazy relationships
+    orm_eager     select(TestSession) with selectinload() of the relationships
+    repository    app.data.repository column-only select into SessionRow
+    snapshot      app.data.snapshot columnar test_sessions (ids, no names)
+
+For each, rows/sec is the best of --repeat runs and memory per row is the
+tracemalloc size of everything still alive after loading (objects plus the
+session's identity map), divided by the number of rows.
+
+Usage:
+    python -m benchmarks.repository [--sessions N] [--repeat N]
+
+Without DATABASE_URL a temporary SQLite database is created and seeded.
+"""
+
+import argparse
+import gc
+import os
+from pathlib import Path
+import tempfile
+import time
+import tracemalloc
+
+
+def orm_lazy(db) -> list:
+    from app.data.data_types import TestSession
+
+    sessions = db.query(TestSession).all()
+    for session in sessions:
+        # Load the names through the lazy relationships
+        _names = (
+            session.reference_ski_model.model,
+            session.reference_wax.brand,
+            session.test_ski_model.model,
+            session.test_wax.brand,
+        )
+    return sessions
+
+
+def orm_eager(db) -> list:
+    from app.data.database.async_session import test_sessions_statement
+
+    return db.scalars(test_sessions_statement()).all()
+
+
+def repository(db) -> list:
+    from app.data.repository import fetch_session_rows, session_rows_statement
+
+    return fetch_session_rows(db, session_rows_statement())
+
+
+def snapshot(db):
+    from app.data.data_types import TestSession
+    from app.data.snapshot import fetch_table
+
+    return fetch_table(db, TestSession)
+
+
+VARIANTS = {
+    "orm_lazy": orm_lazy,
+    "orm_eager": orm_eager,
+    "repository": repository,
+    "snapshot": snapshot,
+}
+
+
+def rows_per_second(load, repeat: int) -> tuple[int, float]:
+    from app.data.database.session import get_db
+
+    best = float("inf")
+    for _ in range(repeat):
+        with get_db(readonly=True) as db:
+            start = time.perf_counter()
+            n_rows = len(load(db))
+            best = min(best, time.perf_counter() - start)
+    return n_rows, n_rows / best
+
+
+def bytes_per_row(load) -> float:
+    from app.data.database.session import get_db
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with get_db(readonly=True) as db:
+            baseline = tracemalloc.get_traced_memory()[0]
+            rows = load(db)
+            gc.collect()
+            retained = tracemalloc.get_traced_memory()[0] - baseline
+            return retained / len(rows)
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50_000, help="Sessions to seed")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per variant")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        from benchmarks.async_queries import seed_database
+
+        path = Path(tempfile.mkdtemp()) / "benchmark.db"
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        print(f"Seeding {args.sessions} sessions into {path}...")
+        seed_database(args.sessions)
+
+    print(f"{'variant':<12} {'rows':>8} {'rows/sec':>12} {'bytes/row':>10}")
+    for name, load in VARIANTS.items():
+        n_rows, rate = rows_per_second(load, args.repeat)
+        print(f"{name:<12} {n_rows:>8} {rate:>12,.0f} {bytes_per_row(load):>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
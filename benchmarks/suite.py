@@ -0,0 +1,400 @@
+"""Benchmark suite: end-to-end data layer stages with regression tracking.
+
+`run` times the main stages of the data layer on a temporary SQLite
+database seeded with --sessions generated test sessions:
+
+* create_tables: drop and recreate the schema with create_tables()
+* read:          pages of TestSession with eager-loaded wax/ski names
+* aggregate:     wax_condition_summary() for random conditions
+* insert:        ORM test session inserts through get_db() (aggregate,
+                 data version and change feed events included)
+
+Every stage runs in a fresh interpreter, so its peak RSS is its own. The
+result (ops/sec, p50/p99 latency per operation, peak RSS) is written as
+JSON to --output. DATABASE_URL is ignored: create_tables drops tables.
+
+`compare` checks a result against a baseline and exits with status 1 if a
+metric regressed by more than its threshold (ops/sec down, latency or RSS
+up). Results are only comparable for the same workload: if --sessions or a
+stage's operation count differ from the baseline, compare refuses and exits
+with status 2. `run --update-baseline` records a new baseline; baselines are
+machine specific, so record one before comparing on a new machine.
+
+Usage:
+    python -m benchmarks.suite run [--sessions N] [--stages a,b] [--output FILE]
+    python -m benchmarks.suite compare RESULT [--baseline FILE] [--threshold F]
+"""
+
+import argparse
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+from datetime import datetime, timedelta
+import io
+import itertools
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+RESULTS_DIR = Path(__file__).with_name("results")
+
+# Metric -> (better direction, default relative regression threshold)
+METRICS = {
+    "ops_per_sec": ("higher", 0.2),
+    "p50_ms": ("lower", 0.2),
+    "p99_ms": ("lower", 0.5),
+    "peak_rss_mb": ("lower", 0.1),
+}
+
+INSERT_BATCH_SIZE = 100  # Sessions added per get_db() transaction by the insert stage
+READ_PAGE_SIZE = 200  # Sessions per page read by the read stage
+
+
+def session_record(rng: np.random.Generator, index: int) -> dict:
+    """Random test_sessions column values referencing the sample skis and waxes."""
+    from app.config import SNOW_TYPE_CATEGORIES
+
+    distance = float(rng.normal(0, 2))
+    return {
+        "test_date": datetime(2024, 11, 1) + timedelta(minutes=index),
+        "location": "Benchmark Track",
+        "temperature": float(rng.normal(-5, 4)),
+        "snow_type": str(rng.choice(SNOW_TYPE_CATEGORIES)),
+        "test_course_length": 100.0,
+        "reference_ski_id": 1,
+        "reference_wax_id": int(rng.integers(1, 7)),
+        "test_ski_id": 2,
+        "test_wax_id": int(rng.integers(1, 7)),
+        "distance_between_skis": distance,
+        "test_ski_won": distance > 0,
+    }
+
+
+def seed_database(n_sessions: int):
+    """Create tables, sample skis/waxes and n_sessions random test sessions."""
+    from app.config import INGEST_CHUNK_SIZE
+    from app.data.database.ingest import insert_records
+    from app.data.database.init_db import create_tables, populate_sample_data
+    from app.data.database.session import get_db
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_tables()
+        populate_sample_data()
+    rng = np.random.default_rng(0)
+    for start in range(0, n_sessions, INGEST_CHUNK_SIZE):
+        stop = min(start + INGEST_CHUNK_SIZE, n_sessions)
+        with get_db() as db:
+            insert_records(db, [session_record(rng, i) for i in range(start, stop)])
+
+
+def create_tables_stage(rng: np.random.Generator) -> Callable[[], None]:
+    from app.data.database.init_db import create_tables
+
+    def operation():
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_tables(drop_existing=True)
+
+    return operation
+
+
+def read_stage(rng: np.random.Generator) -> Callable[[], None]:
+    from app.data.database.async_session import test_sessions_statement
+    from app.data.database.session import get_db
+
+    def operation():
+        low = float(rng.uniform(-15, 5))
+        statement = test_sessions_statement(
+            min_temperature=low, max_temperature=low + 2, limit=READ_PAGE_SIZE
+        )
+        with get_db(readonly=True) as db:
+            for session in db.scalars(statement):
+                # Read the names, as a list view would
+                _names = (
+                    session.reference_wax.brand,
+                    session.test_wax.brand,
+                    session.reference_ski_model.model,
+                    session.test_ski_model.model,
+                )
+
+    return operation
+
+
+def aggregate_stage(rng: np.random.Generator) -> Callable[[], None]:
+    from app.config import SNOW_TYPE_CATEGORIES
+    from app.data.aggregates import wax_condition_summary
+    from app.data.database.session import get_db
+
+    def operation():
+        with get_db(readonly=True) as db:
+            wax_condition_summary(
+                db,
+                temperature=float(rng.uniform(-15, 5)),
+                snow_type=str(rng.choice(SNOW_TYPE_CATEGORIES)),
+            )
+
+    return operation
+
+
+def insert_stage(rng: np.random.Generator) -> Callable[[], None]:
+    from app.data.data_types import TestSession
+    from app.data.database.session import get_db
+
+    index = itertools.count()
+
+    def operation():
+        with get_db() as db:
+            db.add_all(
+                TestSession(**session_record(rng, next(index))) for _ in range(INSERT_BATCH_SIZE)
+            )
+
+    return operation
+
+
+# Stage -> (operation factory, default timed operations, rows per operation)
+STAGES = {
+    "create_tables": (create_tables_stage, 20, None),
+    "read": (read_stage, 200, READ_PAGE_SIZE),
+    "aggregate": (aggregate_stage, 500, None),
+    "insert": (insert_stage, 100, INSERT_BATCH_SIZE),
+}
+
+
+def run_stage(name: str, n_ops: int, warmup: int = 3) -> dict:
+    """Time one stage in this process.
+
+    Args:
+        name: Key of STAGES
+        n_ops: Timed operations
+        warmup: Untimed operations run first
+
+    Returns:
+        Metrics of the stage (see METRICS), plus ops and rows_per_sec
+    """
+    from app.data.database.ingest import peak_rss_bytes
+
+    factory, _, rows_per_op = STAGES[name]
+    operation = factory(np.random.default_rng(list(STAGES).index(name)))
+    for _ in range(warmup):
+        operation()
+    latencies = np.empty(n_ops)
+    for i in range(n_ops):
+        start = time.perf_counter()
+        operation()
+        latencies[i] = time.perf_counter() - start
+
+    metrics = {
+        "ops": n_ops,
+        "ops_per_sec": float(n_ops / latencies.sum()),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "peak_rss_mb": peak_rss_bytes() / 2**20,
+    }
+    if rows_per_op:
+        metrics["rows_per_sec"] = metrics["ops_per_sec"] * rows_per_op
+    return metrics
+
+
+def run_suite(stages: list[str], n_sessions: int, ops_scale: float = 1.0) -> dict:
+    """Seed a temporary SQLite database and run stages, each in a fresh interpreter.
+
+    Args:
+        stages: Keys of STAGES, run in STAGES order
+        n_sessions: Test sessions seeded before the read/aggregate/insert stages
+        ops_scale: Multiplier of every stage's default operation count
+
+    Returns:
+        Result document with environment details and per-stage metrics
+    """
+    os.environ["DATABASE_READ_URL"] = ""
+    spawn = multiprocessing.get_context("spawn")
+    result = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sessions": n_sessions,
+        "stages": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="wax-ai-benchmark-") as tmp:
+        directory = Path(tmp)
+        for name in [stage for stage in STAGES if stage in stages]:
+            # create_tables drops everything, so it gets a database of its own
+            database = "schema.db" if name == "create_tables" else "benchmark.db"
+            os.environ["DATABASE_URL"] = f"sqlite:///{directory / database}"
+            if database == "benchmark.db" and not (directory / database).exists():
+                print(f"Seeding {n_sessions} sessions into {directory / database}...")
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                    pool.submit(seed_database, n_sessions).result()
+            n_ops = max(1, int(STAGES[name][1] * ops_scale))
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                result["stages"][name] = pool.submit(run_stage, name, n_ops).result()
+    return result
+
+
+def workload_mismatches(result: dict, baseline: dict) -> list[str]:
+    """Differences in workload that make a result incomparable with the baseline.
+
+    Args:
+        result: Result document from run_suite()
+        baseline: Baseline result document
+
+    Returns:
+        One description per difference in seeded sessions or in the
+        operations of a stage present in both documents
+    """
+    mismatches = []
+    if result.get("sessions") != baseline.get("sessions"):
+        mismatches.append(
+            f"sessions: baseline {baseline.get('sessions')}, result {result.get('sessions')}"
+        )
+    for stage, expected in baseline["stages"].items():
+        measured = result["stages"].get(stage)
+        if measured is not None and measured.get("ops") != expected.get("ops"):
+            mismatches.append(
+                f"{stage} ops: baseline {expected.get('ops')}, result {measured.get('ops')}"
+            )
+    return mismatches
+
+
+def compare_results(
+    result: dict, baseline: dict, thresholds: dict[str, float]
+) -> list[tuple[str, str, float, float, float, bool]]:
+    """Compare every baseline metric with the result.
+
+    Args:
+        result: Result document from run_suite()
+        baseline: Baseline result document
+        thresholds: Metric -> maximum relative regression
+
+    Returns:
+        Rows of (stage, metric, baseline, result, relative change, regressed);
+        a stage missing from the result counts as regressed
+
+    Raises:
+        ValueError: If the workloads differ (see workload_mismatches)
+    """
+    mismatches = workload_mismatches(result, baseline)
+    if mismatches:
+        raise ValueError(f"Result is not comparable with the baseline: {'; '.join(mismatches)}")
+    rows = []
+    for stage, expected in baseline["stages"].items():
+        measured = result["stages"].get(stage)
+        for metric, (better, _) in METRICS.items():
+            if metric not in expected:
+                continue
+            if measured is None:
+                rows.append((stage, metric, expected[metric], float("nan"), float("nan"), True))
+                continue
+            change = measured[metric] / expected[metric] - 1
+            worse = -change if better == "higher" else change
+            rows.append(
+                (
+                    stage,
+                    metric,
+                    expected[metric],
+                    measured[metric],
+                    change,
+                    worse > thresholds[metric],
+                )
+            )
+    return rows
+
+
+def write_json(path: Path, document: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(document, indent=2) + "\n")
+    print(f"✓ Results written to {path}")
+
+
+def run_command(args):
+    stages = args.stages.split(",") if args.stages else list(STAGES)
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        print(f"❌ Unknown stages: {', '.join(unknown)} (expected {', '.join(STAGES)})")
+        sys.exit(2)
+
+    result = run_suite(stages, args.sessions, args.ops_scale)
+    print(f"{'stage':<14} {'ops/sec':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}")
+    for name, metrics in result["stages"].items():
+        print(
+            f"{name:<14} {metrics['ops_per_sec']:>10,.1f} {metrics['p50_ms']:>9.2f} "
+            f"{metrics['p99_ms']:>9.2f} {metrics['peak_rss_mb']:>12.0f}"
+        )
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    write_json(output, result)
+    if args.update_baseline:
+        write_json(BASELINE_PATH, result)
+
+
+def compare_command(args):
+    result = json.loads(args.result.read_text())
+    baseline = json.loads(args.baseline.read_text())
+    thresholds = {
+        metric: args.threshold if args.threshold is not None else default
+        for metric, (_, default) in METRICS.items()
+    }
+
+    mismatches = workload_mismatches(result, baseline)
+    if mismatches:
+        print(f"❌ Workload differs from {args.baseline}, results are not comparable:")
+        for mismatch in mismatches:
+            print(f"  {mismatch}")
+        print("Run with the baseline's --sessions and --ops-scale, or record a new baseline")
+        sys.exit(2)
+
+    rows = compare_results(result, baseline, thresholds)
+    print(f"{'stage':<14} {'metric':<12} {'baseline':>10} {'result':>10} {'change':>8}")
+    for stage, metric, expected, measured, change, regressed in rows:
+        status = f"❌ over {thresholds[metric]:.0%}" if regressed else "✓"
+        if stage not in result["stages"]:
+            status = "❌ stage missing from the result"
+        print(
+            f"{stage:<14} {metric:<12} {expected:>10.2f} {measured:>10.2f} "
+            f"{change:>+8.1%}  {status}"
+        )
+    regressions = sum(row[-1] for row in rows)
+    if regressions:
+        print(f"❌ {regressions} metric(s) regressed against {args.baseline}")
+        sys.exit(1)
+    print(f"✅ No regressions against {args.baseline}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the suite and write a JSON result")
+    run.add_argument("--sessions", type=int, default=50_000, help="Sessions to seed")
+    run.add_argument("--stages", help=f"Comma-separated subset of {', '.join(STAGES)}")
+    run.add_argument(
+        "--ops-scale", type=float, default=1.0, help="Multiplier of the operations per stage"
+    )
+    run.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/)")
+    run.add_argument(
+        "--update-baseline", action="store_true", help=f"Also write the result to {BASELINE_PATH}"
+    )
+    run.set_defaults(handler=run_command)
+
+    compare = commands.add_parser("compare", help="Fail if a result regressed against a baseline")
+    compare.add_argument("result", type=Path, help="Result file written by run")
+    compare.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline file")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        help="Maximum relative regression of every metric (default: per metric, see METRICS)",
+    )
+    compare.set_defaults(handler=compare_command)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()